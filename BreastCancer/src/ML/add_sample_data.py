@@ -1,21 +1,9 @@
-import mysql.connector
 from datetime import datetime, timedelta
 import random
 
-# Database connection
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host='127.0.0.1',
-            port=3306,
-            user='root',
-            password='',
-            database='breast_cancer_db'
-        )
-        return conn
-    except mysql.connector.Error as err:
-        print(f"❌ Db Connection Error: {err}")
-        return None
+import migrations
+import storage
+from consultation_store import validate_consultation
 
 # Sample patients data
 sample_patients = [
@@ -41,26 +29,22 @@ descriptions = [
 ]
 
 def add_sample_data():
-    conn = get_db_connection()
-    if not conn:
-        print("Failed to connect to database")
-        return
-    
-    cursor = conn.cursor()
+    # STORAGE_BACKEND selects MySQL (default) or the embedded SQLite database
+    repo = storage.get_repository()
+    records = []
     
     try:
+        # Consultations are attributed to the default doctor
+        doctor = repo.find_doctor(migrations.DEFAULT_DOCTOR['username'])
+        if not doctor:
+            print("❌ Default doctor not found: run reset_user.py first")
+            return
+
         # Add patients
         for patient in sample_patients:
             # Check if patient exists
-            cursor.execute("SELECT * FROM patient WHERE id_patient = %s", (patient['id'],))
-            if not cursor.fetchone():
-                cursor.execute(
-                    "INSERT INTO patient (id_patient, nom, age) VALUES (%s, %s, %s)",
-                    (patient['id'], patient['name'], patient['age'])
-                )
-                print(f"✅ Added patient: {patient['name']}")
-                
-                # Add a consultation for this patient
+            if not repo.patient_exists(patient['id']):
+                # Add a consultation for this patient (the patient is created with it)
                 status = random.choice(statuses)
                 risk = random.choice(risk_levels)
                 confidence = random.uniform(75, 99)
@@ -68,25 +52,30 @@ def add_sample_data():
                 days_ago = random.randint(1, 30)
                 visit_date = datetime.now() - timedelta(days=days_ago)
                 
-                cursor.execute("""
-                    INSERT INTO consultation 
-                    (medecin_id, patient_id, description, prediction_status, risk_level, confidence, date)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (2, patient['id'], description, status, risk, confidence, visit_date))
-                
+                records.append(validate_consultation({
+                    'doctor_id': doctor['id'],
+                    'patient_id': patient['id'],
+                    'patient_name': patient['name'],
+                    'patient_age': patient['age'],
+                    'description': description,
+                    'prediction_status': status,
+                    'risk_level': risk,
+                    'confidence': confidence,
+                }, date=visit_date.isoformat(sep=' ', timespec='seconds')))
+                print(f"✅ Added patient: {patient['name']}")
                 print(f"   Added consultation: {status} - Risk: {risk}")
             else:
                 print(f"⚠️ Patient {patient['name']} already exists")
         
-        conn.commit()
+        # Patients, consultations, latest consultations and change log in one transaction
+        repo.save_consultations(records)
         print("\n✅ Sample data added successfully!")
         
+    except storage.StorageUnavailable as e:
+        print(f"❌ Db Connection Error: {e}")
+        print("Failed to connect to database")
     except Exception as e:
         print(f"❌ Error adding sample data: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
 
 if __name__ == "__main__":
     add_sample_data()
@@ -1,18 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, send_file, url_for
 from flask_cors import CORS
-import joblib
-import torch
-import torch.nn as nn
 import numpy as np
-from sklearn.neural_network import MLPClassifier
 import os
 import json
-import mysql.connector
+import asyncio
+import hashlib
+import hmac
 from datetime import datetime
+from batching import BatchTimeout, MicroBatcher
+from db_pool import PoolExhausted
+from model_registry import ModelRegistry, ReloadInProgress
+from jobs import JobRunner, JobStore, QueueFull
+import auth
+import storage
+import patient_queries
+import consultation_store
+import bulk_import
+from consultation_store import InvalidConsultation, WriteBehindQueue
+from storage import RejectedData, ResyncRequired, SchemaOutdated, StorageError, StorageUnavailable
+from upload_store import ThumbnailWorker, UploadRequest, UploadStore, sniff_mimetype
+from image_inference import ImageClassifier, ImageModelUnavailable, default_threads
+from werkzeug.exceptions import HTTPException
+from scoring import feature_cols, features_to_matrix, get_risk_level, softmax_prediction, mlp_prediction
+import process_stats
 
 # Import feature extractor
 try:
-    from feature_extractor import extract_features_from_text
+    from feature_extractor import extract_features_from_text, stream_features_from_text, get_extraction_cache, extraction_flight
+    from llm_client import client_stats
+    from llm_backends import backend_pool_stats
+    from bulk_extract import run_bulk_extraction
     FEATURE_EXTRACTION_AVAILABLE = True
 except ImportError:
     FEATURE_EXTRACTION_AVAILABLE = False
@@ -21,160 +38,172 @@ except ImportError:
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+@app.before_request
+def report_first_request():
+    process_stats.report_first_request()
+
 # =====================
 # Load ML Models and Scalers
 # =====================
-# Define the 30 breast cancer features
-feature_cols = [
-    'radius_mean', 'texture_mean', 'perimeter_mean', 'area_mean', 'smoothness_mean',
-    'compactness_mean', 'concavity_mean', 'concave points_mean', 'symmetry_mean', 'fractal_dimension_mean',
-    'radius_se', 'texture_se', 'perimeter_se', 'area_se', 'smoothness_se',
-    'compactness_se', 'concavity_se', 'concave points_se', 'symmetry_se', 'fractal_dimension_se',
-    'radius_worst', 'texture_worst', 'perimeter_worst', 'area_worst', 'smoothness_worst',
-    'compactness_worst', 'concavity_worst', 'concave points_worst', 'symmetry_worst', 'fractal_dimension_worst'
-]
-
-# Define Softmax Regression Model Class
-class SoftmaxRegression(nn.Module):
-    def __init__(self, input_dim, output_dim):
-        super(SoftmaxRegression, self).__init__()
-        self.linear = nn.Linear(input_dim, output_dim)
-    
-    def forward(self, x):
-        return self.linear(x)
-
-# Load models and scalers
+# Load fused models (scaler folded into the model weights, see compile_models.py).
+# Serving only needs NumPy: torch and scikit-learn are not imported here.
+# The registry hot-reloads new versions published in model_versions/ (see model_registry.py).
 print("Loading ML models...")
 try:
-    # Import sklearn modules to register with joblib
-    import sklearn.preprocessing
-    import sklearn.neural_network
-    import sys
-    
-    # Monkey-patch numpy.random to handle old pickle format
-    import numpy.random
-    if not hasattr(numpy.random, '__RandomState_ctor'):
-        numpy.random.__RandomState_ctor = numpy.random.RandomState
-    
-    # Try to use sklearn's joblib if available, otherwise use standard joblib
-    try:
-        from sklearn.externals import joblib as sk_joblib
-        loader = sk_joblib
-    except ImportError:
-        loader = joblib
-    
-    # Load scalers
-    scaler_dso2 = loader.load('scaler_dso2.joblib')
-    scaler_dso3 = loader.load('scaler_dso3.joblib')
-    
-    # Load Softmax model (PyTorch)
-    softmax_model = SoftmaxRegression(input_dim=30, output_dim=2)
-    softmax_model.load_state_dict(torch.load('softmax_regression_dso2.pth', map_location=torch.device('cpu'), weights_only=False))
-    softmax_model.eval()
-    
-    # Load MLP model (scikit-learn)
-    mlp_dso3 = loader.load('mlp_perfect_dso3_model.joblib')
-    
-    print("✅ All models loaded successfully!")
+    model_registry = ModelRegistry(
+        default_path=os.getenv("MODEL_DIR", "."),
+        versions_dir=os.getenv("MODEL_VERSIONS_DIR", "model_versions"),
+        poll_interval=float(os.getenv("MODEL_POLL_INTERVAL", "5"))
+    )
+    models = model_registry.load_initial()
+    print(f"✅ All models loaded successfully! Version {models.version} "
+          f"({process_stats.format_memory(process_stats.memory_usage())})")
 except Exception as e:
     print(f"⚠️ Error loading models: {e}")
+    print("   Run 'python compile_models.py' to build the fused model files.")
     import traceback
     traceback.print_exc()
     raise
 
 # =====================
-# Database Connection
+# Storage
 # =====================
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host='127.0.0.1',  # Use IP instead of localhost
-            port=3306,
-            user='root',
-            password='',  # Default XAMPP password
-            database='breast_cancer_db'
-        )
-        return conn
-    except mysql.connector.Error as err:
-        print(f"❌ Db Connection Error: {err}")
-        return None
+# STORAGE_BACKEND=mysql (default, pooled per worker process, see mysql_storage.py)
+# or sqlite (embedded WAL database file, see sqlite_storage.py).
+# The schema is created and upgraded by migrations.py, run as a separate
+# deployment step: the server never runs DDL and does not touch the database at import.
+repo = storage.get_repository()
+print(f"✅ Storage backend: {repo.name}")
 
-def init_db():
-    try:
-        print("Attempting to connect to MySQL to initialize DB...")
-        conn = mysql.connector.connect(
-            host='127.0.0.1',
-            port=3306,
-            user='root',
-            password=''
-        )
-        cursor = conn.cursor()
-        
-        # Create database if not exists
-        print("Creating database if not exists...")
-        cursor.execute("CREATE DATABASE IF NOT EXISTS breast_cancer_db")
-        cursor.execute("USE breast_cancer_db")
-        
-        # Create Medecin table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS medecin (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            nom VARCHAR(100) NOT NULL,
-            prenom VARCHAR(100) NOT NULL,
-            username VARCHAR(50) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL
-        )
-        """)
-        
-        # Create Patient table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS patient (
-            id_patient VARCHAR(50) PRIMARY KEY,
-            nom VARCHAR(100) NOT NULL,
-            age INT NOT NULL
-        )
-        """)
-        
-        # Create Consultation table (Many-to-Many relationship)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS consultation (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            medecin_id INT,
-            patient_id VARCHAR(50),
-            description TEXT,
-            image_path VARCHAR(255),
-            prediction_status VARCHAR(20),
-            risk_level VARCHAR(20),
-            confidence FLOAT,
-            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (medecin_id) REFERENCES medecin(id),
-            FOREIGN KEY (patient_id) REFERENCES patient(id_patient)
-        )
-        """)
-        
-        # check if user exists
-        cursor.execute("SELECT * FROM medecin WHERE username = '166JMT8965'")
-        if not cursor.fetchone():
-            print("Creating default doctor account...")
-            cursor.execute("""
-            INSERT INTO medecin (nom, prenom, username, password) 
-            VALUES ('Smith', 'John', '166JMT8965', 'admin123')
-            """)
-        else:
-            print("Default doctor account already exists.")
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("✅ Database initialized successfully!")
-    except Exception as e:
-        print(f"⚠️ Database initialization failed: {e}")
+@app.errorhandler(StorageUnavailable)
+def storage_unavailable(e):
+    print(f"❌ Db Connection Error: {e}")
+    return jsonify({"success": False, "message": "Database connection failed"}), 500
+
+@app.errorhandler(SchemaOutdated)
+def schema_outdated(e):
+    print(f"❌ {e}")
+    return jsonify({"success": False, "message": "Database schema out of date"}), 503
+
+@app.errorhandler(PoolExhausted)
+def db_pool_exhausted(e):
+    print(f"⚠️ {e}")
+    return jsonify({"success": False, "message": "Database busy, retry shortly"}), 503, {"Retry-After": "1"}
 
-# Initialize DB on startup
-init_db()
 
 # ... (omitted code) ...
 
+# =====================
+# Image uploads
+# =====================
+# Consultation images are streamed to disk and hashed while the request is
+# parsed, then stored once under their SHA-256 digest (see upload_store.py)
+upload_store = UploadStore(
+    os.getenv("UPLOAD_DIR", "uploads"),
+    max_bytes=int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024))),
+    thumbnails=ThumbnailWorker(
+        size=int(os.getenv("THUMBNAIL_SIZE", "256")),
+        max_workers=int(os.getenv("THUMBNAIL_WORKERS", "2"))
+    )
+)
+UploadRequest.upload_store = upload_store
+UploadRequest.upload_endpoints = frozenset({"save_consultation", "predict_image"})
+app.request_class = UploadRequest
+if not upload_store.thumbnails.available:
+    print("⚠️ Pillow not installed: image thumbnails disabled")
+
+# =====================
+# Mammogram classification
+# =====================
+# EfficientNet-B3 of Breast_Cancer_computer_vision.ipynb, exported to TorchScript at
+# deployment ('python image_inference.py') and loaded by each worker on its first image
+image_classifier = ImageClassifier(
+    num_threads=int(os.getenv("IMAGE_INFERENCE_THREADS", str(default_threads()))),
+    max_batch_size=int(os.getenv("IMAGE_BATCH_MAX_SIZE", "8")),
+    max_wait_ms=float(os.getenv("IMAGE_BATCH_MAX_WAIT_MS", "10")),
+    timeout_ms=float(os.getenv("IMAGE_BATCH_TIMEOUT_MS", "60000")),
+    export=os.getenv("IMAGE_EXPORT", "torchscript")
+)
+if not image_classifier.available:
+    print(f"⚠️ Image model not available: /predict_image disabled "
+          f"(needs torch, Pillow and {image_classifier.script_path}: run 'python image_inference.py')")
+
+@app.errorhandler(ImageModelUnavailable)
+def image_model_unavailable(e):
+    return jsonify({"success": False, "message": str(e)}), 503
+
+# =====================
+# Consultation writes
+# =====================
+# "sync" writes to the database inside the request; "write_behind" queues the save
+# locally and a background drainer writes batches (see consultation_store.py)
+CONSULTATION_WRITE_MODE = os.getenv("CONSULTATION_WRITE_MODE", "sync")
+consultation_queue = None
+if CONSULTATION_WRITE_MODE == "write_behind":
+    consultation_queue = WriteBehindQueue(
+        os.getenv("CONSULTATION_QUEUE_PATH", "consultation_queue.sqlite3"),
+        repo.save_consultations,
+        batch_size=int(os.getenv("CONSULTATION_BATCH_SIZE", "200")),
+        poll_interval=float(os.getenv("CONSULTATION_DRAIN_INTERVAL", "0.05"))
+    )
+    print(f"✅ Write-behind consultation queue: {consultation_queue.path} ({consultation_queue.pending()} pending)")
+
+@app.before_request
+def start_consultation_drainer():
+    # After a restart the queue is replayed by the first worker to receive a request
+    if consultation_queue is not None:
+        consultation_queue.ensure_started()
+
+# =====================
+# AUTHENTICATION
+# =====================
+# Every endpoint but /login requires the token issued by /login, verified
+# in memory (see auth.py). AUTH_ENABLED=0 turns the check off for local
+# scripts and load tests. Operator endpoints take the ADMIN_TOKEN instead
+# (X-Admin-Token header), whatever AUTH_ENABLED says. Uploaded images also
+# accept a short-lived signed URL, so that <img src> can load them.
+AUTH_ENABLED = os.getenv("AUTH_ENABLED", "1") == "1"
+PUBLIC_ENDPOINTS = {"login", "static"}
+OPERATOR_ENDPOINTS = {"reload_models"}
+SIGNED_URL_ENDPOINTS = {"get_upload", "get_upload_thumbnail"}
+auth.check_secret(AUTH_ENABLED)
+if not AUTH_ENABLED:
+    print("⚠️ AUTH_ENABLED=0: endpoints are served without authentication")
+
+@app.before_request
+def authenticate():
+    # CORS preflight requests carry no credentials
+    if request.method == "OPTIONS" or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    if request.endpoint in OPERATOR_ENDPOINTS:
+        try:
+            auth.verify_admin_token(request.headers.get("X-Admin-Token"))
+        except auth.AdminDisabled as e:
+            return jsonify({"success": False, "message": str(e)}), 403
+        except auth.AuthError as e:
+            return jsonify({"success": False, "message": str(e)}), 401
+        return None
+    if not AUTH_ENABLED:
+        return None
+    if request.endpoint in SIGNED_URL_ENDPOINTS and "sig" in request.args:
+        try:
+            auth.verify_signed_url(f"{request.endpoint}/{request.view_args['digest']}",
+                                   request.args.get("expires"), request.args.get("sig"))
+        except auth.AuthError as e:
+            return jsonify({"success": False, "message": str(e)}), 403
+        return None
+    try:
+        g.doctor = auth.verify_token(auth.bearer_token(request.headers.get("Authorization")))
+    except auth.AuthError as e:
+        return jsonify({"success": False, "message": str(e)}), 401, {"WWW-Authenticate": 'Bearer error="invalid_token"'}
+    return None
+
+@app.errorhandler(auth.RevocationListFull)
+def revocation_list_full(e):
+    # The token stays valid until it expires: the client must not treat the logout as done
+    print(f"❌ Logout refused: {e}")
+    return jsonify({"success": False, "message": "Logout unavailable, retry shortly"}), 503, {"Retry-After": "60"}
+
 # =====================
 # LOGIN ENDPOINT
 # =====================
@@ -185,41 +214,27 @@ def login():
     username = data.get('username', '').strip()
     password = data.get('password', '').strip()
     
-    print(f"----- LOGIN DEBUG -----")
-    print(f"Received Username: '{username}'")
-    print(f"Received Password: '{password}'")
-    
-    conn = get_db_connection()
-    if not conn:
-        print("❌ Login failed: No DB connection")
-        return jsonify({"success": False, "message": "Database connection failed"}), 500
-        
-    cursor = conn.cursor(dictionary=True)
-    
-    # Direct check to see what's in the DB for this username
-    cursor.execute("SELECT * FROM medecin WHERE username = %s", (username,))
-    user_by_name = cursor.fetchone()
-    
-    if user_by_name:
-        print(f"User found by name: {user_by_name['username']}")
-        print(f"DB Password: '{user_by_name['password']}'")
-        print(f"Input Password: '{password}'")
-        print(f"Match? {user_by_name['password'] == password}")
-        
-        if user_by_name['password'] == password:
-            print("✅ Login Successful")
-            cursor.close()
-            conn.close()
-            return jsonify({"success": True, "doctor": {"id": user_by_name['id'], "nom": user_by_name['nom'], "prenom": user_by_name['prenom']}})
-        else:
-            print("❌ Password verification failed")
-    else:
-        print("❌ User not found by username")
+    doctor = repo.find_doctor(username)
+    # Constant-time comparison; credentials are never logged
+    if doctor is None or not hmac.compare_digest(doctor['password'].encode(), password.encode()):
+        print("❌ Login failed: invalid credentials")
+        return jsonify({"success": False, "message": "Identifiants invalides"}), 401
 
-    cursor.close()
-    conn.close()
-    
-    return jsonify({"success": False, "message": "Identifiants invalides"}), 401
+    token, expires_at = auth.issue_token(doctor)
+    print(f"✅ Login successful: doctor {doctor['id']}")
+    return jsonify({
+        "success": True,
+        "doctor": {"id": doctor['id'], "nom": doctor['nom'], "prenom": doctor['prenom']},
+        "token": token,
+        "expires_at": expires_at
+    })
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    doctor = g.get("doctor")
+    if doctor is not None:
+        auth.revoke(doctor)
+    return jsonify({"success": True})
 
 # =====================
 # SAVE CONSULTATION ENDPOINT
@@ -227,121 +242,356 @@ def login():
 @app.route("/save_consultation", methods=["POST"])
 def save_consultation():
     try:
-        # Check if it's multipart (has file)
-        if 'image' in request.files:
-            file = request.files['image']
-            image_path = os.path.join('uploads', file.filename)
-            os.makedirs('uploads', exist_ok=True)
-            file.save(image_path)
-        else:
-            image_path = None
-
         # Get form data (might be JSON or Form)
         if request.is_json:
             data = request.json
         else:
             data = request.form
 
-        doctor_id = data.get('doctor_id')
-        patient_id = data.get('patient_id')
-        patient_name = data.get('patient_name')
-        patient_age = data.get('patient_age')
-        description = data.get('description')
-        prediction_status = data.get('prediction_status')
-        risk_level = data.get('risk_level')
-        confidence = data.get('confidence')
-
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"success": False, "message": "Database error"}), 500
-
-        cursor = conn.cursor()
-
-        # 1. Upsert Patient
-        cursor.execute("SELECT * FROM patient WHERE id_patient = %s", (patient_id,))
-        if cursor.fetchone():
-            cursor.execute("UPDATE patient SET nom = %s, age = %s WHERE id_patient = %s", 
-                           (patient_name, patient_age, patient_id))
-        else:
-            cursor.execute("INSERT INTO patient (id_patient, nom, age) VALUES (%s, %s, %s)", 
-                           (patient_id, patient_name, patient_age))
+        # Check if it's multipart (has file): already on disk and hashed by the time we get here
+        file = request.files.get('image')
+
+        try:
+            record = consultation_store.validate_consultation(data)
+        except InvalidConsultation as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        # Consultations are saved under the authenticated doctor
+        doctor = g.get("doctor")
+        if doctor is not None:
+            if record["doctor_id"] is None:
+                record["doctor_id"] = doctor["id"]
+            elif record["doctor_id"] != doctor["id"]:
+                return jsonify({"success": False, "message": "doctor_id does not match the authenticated doctor"}), 403
 
-        # 2. Insert Consultation
-        cursor.execute("""
-            INSERT INTO consultation (medecin_id, patient_id, description, image_path, prediction_status, risk_level, confidence)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (doctor_id, patient_id, description, image_path, prediction_status, risk_level, confidence))
+        image = None
+        if file:
+            # image_path references the content hash; an identical image is stored only once
+            record["image_path"], _ = upload_store.store(file)
+            image = signed_upload_urls(record["image_path"])
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+        if consultation_queue is not None:
+            # Write-behind: durable in the local queue now, in MySQL once the drainer runs
+            consultation_queue.enqueue(record)
+            return jsonify({"success": True, "queued": True, "write_id": record["write_id"], "image": image,
+                            "message": "Consultation saved successfully"}), 202
 
-        return jsonify({"success": True, "message": "Consultation saved successfully"})
+        # Patient upsert, consultation insert, latest consultation and change log in one transaction
+        repo.save_consultations([record])
+
+        return jsonify({"success": True, "image": image, "message": "Consultation saved successfully"})
     
+    except RejectedData as e:
+        print(f"Consultation rejected by the database: {e}")
+        return jsonify({"success": False, "message": str(e)}), 400
+    except (PoolExhausted, StorageUnavailable, SchemaOutdated, HTTPException):
+        raise
     except Exception as e:
         print(f"Error saving consultation: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+# =====================
+# UPLOADED IMAGES
+# =====================
+def send_upload(path):
+    if not os.path.exists(path):
+        return jsonify({"success": False, "message": "Not found"}), 404
+    # Content-addressed: a digest always names the same bytes
+    response = send_file(path, mimetype=sniff_mimetype(path), conditional=True, max_age=31536000)
+    response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+def signed_upload_urls(digest):
+    """Short-lived URLs of an upload and its thumbnail, loadable without the Authorization header."""
+    urls = {}
+    for key, endpoint in (("url", "get_upload"), ("thumbnail_url", "get_upload_thumbnail")):
+        params = auth.sign_url(f"{endpoint}/{digest}")
+        urls[key] = url_for(endpoint, digest=digest, **params)
+        urls["expires_at"] = params["expires"]
+    return urls
+
+@app.route("/uploads/<digest>/urls", methods=["GET"])
+def get_upload_urls(digest):
+    """Signed URLs for <img src> (the image routes otherwise need the bearer token)."""
+    try:
+        path = upload_store.path_for(digest)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if not os.path.exists(path):
+        return jsonify({"success": False, "message": "Not found"}), 404
+    return jsonify({"success": True, **signed_upload_urls(digest)})
+
+@app.route("/uploads/<digest>", methods=["GET"])
+def get_upload(digest):
+    try:
+        return send_upload(upload_store.path_for(digest))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+@app.route("/uploads/<digest>/thumbnail", methods=["GET"])
+def get_upload_thumbnail(digest):
+    """JPEG thumbnail; 404 until the background worker has made it (or for non-image uploads)."""
+    try:
+        return send_upload(ThumbnailWorker.thumbnail_path(upload_store.path_for(digest)))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
 # =====================
 # GET ALL PATIENTS ENDPOINT
 # =====================
+def format_patient(patient):
+    return {
+        "id": patient['id_patient'],
+        "name": patient['nom'],
+        "age": patient['age'],
+        "lastVisit": patient['last_visit'].strftime('%Y-%m-%d') if patient['last_visit'] else None,
+        "status": patient['prediction_status'],
+        "riskLevel": patient['risk_level'],
+        "confidence": float(patient['confidence']) if patient['confidence'] else None,
+        "description": patient['description']
+    }
+
+def format_consultation(consultation):
+    return {
+        "id": consultation['id'],
+        "patientId": consultation['patient_id'],
+        "doctorId": consultation['medecin_id'],
+        "date": consultation['date'].isoformat() if consultation['date'] else None,
+        "status": consultation['prediction_status'],
+        "riskLevel": consultation['risk_level'],
+        "confidence": float(consultation['confidence']) if consultation['confidence'] else None,
+        "description": consultation['description']
+    }
+
 @app.route("/get_patients", methods=["GET"])
 def get_patients():
+    """
+    Patients with their latest consultation, one page at a time (keyset pagination).
+
+    Query params: limit (default 100, max 500), cursor (next_cursor of the
+    previous page), doctor_id and risk_level (filter on the latest consultation).
+    """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"success": False, "message": "Database connection failed"}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get all patients with their latest consultation
-        cursor.execute("""
-            SELECT 
-                p.id_patient,
-                p.nom,
-                p.age,
-                c.date as last_visit,
-                c.prediction_status,
-                c.risk_level,
-                c.confidence,
-                c.description
-            FROM patient p
-            LEFT JOIN (
-                SELECT patient_id, MAX(date) as max_date
-                FROM consultation
-                GROUP BY patient_id
-            ) latest ON p.id_patient = latest.patient_id
-            LEFT JOIN consultation c ON p.id_patient = c.patient_id AND c.date = latest.max_date
-            ORDER BY p.id_patient
-        """)
-        
-        patients = cursor.fetchall()
-        
-        # Format the response
-        formatted_patients = []
-        for patient in patients:
-            formatted_patients.append({
-                "id": patient['id_patient'],
-                "name": patient['nom'],
-                "age": patient['age'],
-                "lastVisit": patient['last_visit'].strftime('%Y-%m-%d') if patient['last_visit'] else None,
-                "status": patient['prediction_status'],
-                "riskLevel": patient['risk_level'],
-                "confidence": float(patient['confidence']) if patient['confidence'] else None,
-                "description": patient['description']
+        page = patient_queries.parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Invalid pagination parameters: {e}"}), 400
+
+    try:
+        # The change sequence versions the whole list: an unchanged page answers 304 without querying it
+        change_seq = repo.change_seq()
+        etag = "patients-%d-%s" % (
+            change_seq, hashlib.sha1(json.dumps(page, sort_keys=True).encode()).hexdigest()[:16]
+        )
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            patients, next_cursor = repo.patients_page(**page)
+            response = jsonify({
+                "success": True,
+                "patients": [format_patient(p) for p in patients],
+                "next_cursor": next_cursor,
+                # Pass to /patients/changes to receive only what changes from now on
+                "change_seq": change_seq
             })
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({"success": True, "patients": formatted_patients})
+        response.set_etag(etag)
+        # Revalidate every time: the browser sends If-None-Match itself
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
     
+    except (PoolExhausted, StorageUnavailable, SchemaOutdated):
+        raise
     except Exception as e:
         print(f"Error fetching patients: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "message": str(e)}), 500
 
+# =====================
+# PATIENT CHANGE FEED
+# =====================
+@app.route("/patients/changes", methods=["GET"])
+def patient_changes():
+    """
+    Patients and consultations changed after change sequence `since`.
+
+    Query params: since (change_seq of /get_patients, or next_cursor of the
+    previous call), limit (max 1000). Answers 204 when nothing changed and
+    410 when `since` is outside the retained log (reload the full list).
+    """
+    try:
+        since = int(request.args.get("since", ""))
+        limit = min(int(request.args.get("limit", patient_queries.MAX_CHANGES)), patient_queries.MAX_CHANGES)
+        if since < 0 or limit < 1:
+            raise ValueError("since must be >= 0 and limit >= 1")
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Invalid change cursor: {e}"}), 400
+
+    try:
+        try:
+            changes = repo.changes(since, limit)
+        except ResyncRequired as e:
+            return jsonify({"success": False, "resync": True, "message": str(e)}), 410
+
+        if changes["next_cursor"] == since:
+            return Response(status=204)
+        return jsonify({
+            "success": True,
+            "patients": [format_patient(p) for p in changes["patients"]],
+            "consultations": [format_consultation(c) for c in changes["consultations"]],
+            "next_cursor": changes["next_cursor"],
+            "has_more": changes["has_more"]
+        })
+
+    except (PoolExhausted, StorageUnavailable, SchemaOutdated):
+        raise
+    except Exception as e:
+        print(f"Error fetching patient changes: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# =====================
+# SCORING HELPERS
+# =====================
+# Upper bound on rows accepted by the batch endpoints in a single request
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "10000"))
+
+def softmax_proba(X):
+    """
+    Run the Softmax (DSO2) model on a raw (N, 30) feature matrix.
+
+    Returns:
+        ((N, 2) array of class probabilities, model version)
+    """
+    models = model_registry.current()
+    return models.softmax.predict_proba(X), models.version
+
+def mlp_proba(X):
+    """
+    Run the MLP (DSO3) model on a raw (N, 30) feature matrix.
+
+    Returns:
+        ((N, 2) array of class probabilities, model version)
+    """
+    models = model_registry.current()
+    return models.mlp.predict_proba(X), models.version
+
+def tag_rows(scored):
+    """Split a (proba, version) batch result into per-row (proba_row, version) pairs."""
+    proba, version = scored
+    return [(row, version) for row in proba]
+
+# Micro-batching: concurrent single-row requests are coalesced into one forward pass
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "1") == "1"
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2"))
+MICROBATCH_TIMEOUT_MS = float(os.getenv("MICROBATCH_TIMEOUT_MS", "5000"))
+
+softmax_batcher = MicroBatcher("softmax_dso2", lambda X: tag_rows(softmax_proba(X)),
+                               MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS, MICROBATCH_TIMEOUT_MS)
+mlp_batcher = MicroBatcher("mlp_dso3", lambda X: tag_rows(mlp_proba(X)),
+                           MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS, MICROBATCH_TIMEOUT_MS)
+
+@app.errorhandler(BatchTimeout)
+def batch_timeout(e):
+    print(f"⚠️ {e}")
+    return jsonify({"success": False, "message": "Model busy, retry shortly"}), 503, {"Retry-After": "1"}
+
+def softmax_proba_row(values):
+    """
+    Score a single (1, 30) row with the Softmax model, through the micro-batcher when enabled.
+
+    Returns:
+        (probabilities, model version)
+    """
+    if MICROBATCH_ENABLED:
+        return softmax_batcher.submit(values[0])
+    return tag_rows(softmax_proba(values))[0]
+
+def mlp_proba_row(values):
+    """
+    Score a single (1, 30) row with the MLP model, through the micro-batcher when enabled.
+
+    Returns:
+        (probabilities, model version)
+    """
+    if MICROBATCH_ENABLED:
+        return mlp_batcher.submit(values[0])
+    return tag_rows(mlp_proba(values))[0]
+
+def parse_feature_batch(data, fill_missing=True):
+    """
+    Build a raw (N, 30) feature matrix from a batch payload.
+
+    Accepted payloads:
+        - a list of feature records: [{"radius_mean": ..., ...}, ...]
+        - {"records": [...]} with the same list of records
+        - a column-oriented dict keyed by feature_cols: {"radius_mean": [...], ...}
+
+    Args:
+        data: Decoded JSON body
+        fill_missing: Replace missing/null features by 0 (predict2 behaviour)
+            instead of rejecting the row (predict3 behaviour)
+
+    Returns:
+        (X, row_indices, errors) where X holds only the valid rows, row_indices
+        maps each row of X back to its input position and errors is a list of
+        {"index": i, "error": message} for rejected rows.
+    """
+    if isinstance(data, dict) and "records" in data:
+        data = data["records"]
+
+    if isinstance(data, list):
+        records = data
+    elif isinstance(data, dict) and any(col in data for col in feature_cols):
+        columns = {col: data.get(col) for col in feature_cols}
+        lengths = {len(v) for v in columns.values() if isinstance(v, list)}
+        if len(lengths) != 1 or any(v is not None and not isinstance(v, list) for v in columns.values()):
+            raise ValueError("column-oriented payload must map each feature to a list of the same length")
+        n_rows = lengths.pop()
+        records = [
+            {col: values[i] for col, values in columns.items() if values is not None}
+            for i in range(n_rows)
+        ]
+    else:
+        raise ValueError("expected a list of records, {'records': [...]} or a column-oriented payload")
+
+    if len(records) > BATCH_MAX_ROWS:
+        raise ValueError(f"batch too large: {len(records)} rows (max {BATCH_MAX_ROWS})")
+
+    X = np.empty((len(records), len(feature_cols)), dtype=np.float32)
+    row_indices = []
+    errors = []
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({"index": i, "error": "record must be a JSON object"})
+            continue
+        row = X[len(row_indices)]
+        try:
+            for j, col in enumerate(feature_cols):
+                value = record.get(col)
+                if value is None:
+                    if not fill_missing:
+                        raise ValueError(f"missing field '{col}'")
+                    value = 0
+                try:
+                    row[j] = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"invalid value for '{col}': {value!r}")
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        row_indices.append(i)
+
+    return X[:len(row_indices)], row_indices, errors
+
+def merge_batch_results(n_rows, row_indices, rows, errors):
+    """Interleave scored rows and per-row errors back into input order."""
+    results = [None] * n_rows
+    for i, row in zip(row_indices, rows):
+        results[i] = {"index": i, **row}
+    for err in errors:
+        results[err["index"]] = err
+    return results
+
 # =====================
 # EXISTING ML ENDPOINTS (Keep them as is)
 # =====================
@@ -353,17 +603,14 @@ def predict2():
     except Exception as e:
         return jsonify({"error": f"missing or invalid fields: {str(e)}"}), 400
 
-    X_scaled = scaler_dso2.transform(values)
-    X_tensor = torch.tensor(X_scaled, dtype=torch.float32)
-
-    logits = softmax_model(X_tensor)
-    proba = torch.softmax(logits, dim=1).detach().numpy()[0]
+    proba, model_version = softmax_proba_row(values)
     pred_class = int(np.argmax(proba))
 
     return jsonify({
         "prediction": pred_class,
         "probability_class0": float(proba[0]),
-        "probability_class1": float(proba[1])
+        "probability_class1": float(proba[1]),
+        "model_version": model_version
     })
 
 @app.route("/predict3", methods=["POST"])
@@ -374,26 +621,9 @@ def predict3():
     except:
         return jsonify({"error": "missing or invalid fields"}), 400
 
-    X_scaled = scaler_dso3.transform(values)
-    pred = mlp_dso3.predict(X_scaled)[0]
-    proba = mlp_dso3.predict_proba(X_scaled)[0]
+    proba, model_version = mlp_proba_row(values)
     risk_score = proba[1]
-
-    if risk_score <= 0.3:
-      risk_level = "Low"
-      french_level = "Faible risque"
-      recommendation = "Pas d'urgence – suivi standard recommandé"
-      color = "green"
-    elif risk_score < 0.7:
-      risk_level = "Medium"
-      french_level = "Risque intermédiaire"
-      recommendation = "Évaluation complémentaire conseillée rapidement"
-      color = "orange"
-    else:
-      risk_level = "High"
-      french_level = "Risque élevé"
-      recommendation = "Urgence – prise en charge rapide recommandée"
-      color = "red"
+    risk_level, french_level, recommendation, color = get_risk_level(risk_score)
 
     response = jsonify({
     "prediction": float(risk_score),
@@ -402,10 +632,318 @@ def predict3():
     "recommendation_fr": recommendation,
     "color": color,
     "probability_class0": float(proba[0]),
-    "probability_class1": float(proba[1])
+    "probability_class1": float(proba[1]),
+    "model_version": model_version
     })
     return response
 
+# =====================
+# BATCH ML ENDPOINTS
+# =====================
+@app.route("/predict2_batch", methods=["POST"])
+def predict2_batch():
+    data = request.get_json(silent=True)
+    try:
+        X, row_indices, errors = parse_feature_batch(data, fill_missing=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = []
+    model_version = model_registry.current().version
+    if len(X):
+        proba, model_version = softmax_proba(X)
+        pred_class = np.argmax(proba, axis=1)
+        rows = [{
+            "prediction": int(pred_class[k]),
+            "probability_class0": float(proba[k, 0]),
+            "probability_class1": float(proba[k, 1])
+        } for k in range(len(X))]
+
+    n_rows = len(row_indices) + len(errors)
+    return jsonify({
+        "model": "Softmax (DSO2)",
+        "model_version": model_version,
+        "count": n_rows,
+        "scored": len(row_indices),
+        "rejected": len(errors),
+        "results": merge_batch_results(n_rows, row_indices, rows, errors)
+    })
+
+@app.route("/predict3_batch", methods=["POST"])
+def predict3_batch():
+    data = request.get_json(silent=True)
+    try:
+        X, row_indices, errors = parse_feature_batch(data, fill_missing=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = []
+    model_version = model_registry.current().version
+    if len(X):
+        proba, model_version = mlp_proba(X)
+        for k in range(len(X)):
+            risk_score = proba[k, 1]
+            risk_level, french_level, recommendation, color = get_risk_level(risk_score)
+            rows.append({
+                "prediction": float(risk_score),
+                "risk_level_en": risk_level,
+                "risk_level_fr": french_level,
+                "recommendation_fr": recommendation,
+                "color": color,
+                "probability_class0": float(proba[k, 0]),
+                "probability_class1": float(proba[k, 1])
+            })
+
+    n_rows = len(row_indices) + len(errors)
+    return jsonify({
+        "model": "MLP (DSO3)",
+        "model_version": model_version,
+        "count": n_rows,
+        "scored": len(row_indices),
+        "rejected": len(errors),
+        "results": merge_batch_results(n_rows, row_indices, rows, errors)
+    })
+
+# =====================
+# MAMMOGRAM IMAGE ENDPOINT
+# =====================
+@app.route("/predict_image", methods=["POST"])
+def predict_image():
+    """
+    Classify a mammogram as Normal, Benign or Cancer.
+
+    Send the image as multipart field "image", or the digest of an already
+    stored upload as "image_id" (JSON or form field). Concurrent requests are
+    classified together in one forward pass.
+    """
+    file = request.files.get("image")
+    data = request.get_json(silent=True) or request.form
+    image_id = data.get("image_id")
+    try:
+        if file:
+            # Already spooled to disk by UploadRequest: decode it from there
+            file.stream.seek(0)
+            source = file.stream
+        elif image_id:
+            source = upload_store.path_for(image_id)
+            if not os.path.exists(source):
+                return jsonify({"success": False, "message": "Unknown image_id"}), 404
+        else:
+            return jsonify({"success": False, "message": "Send an 'image' file or an 'image_id'"}), 400
+        return jsonify({"success": True, **image_classifier.predict(source)})
+    except ValueError as e:
+        # InvalidImage, or an image_id that is not a digest
+        return jsonify({"success": False, "message": str(e)}), 400
+
+# =====================
+# BULK CONSULTATION IMPORT
+# =====================
+@app.route("/import_consultations", methods=["POST"])
+def import_consultations():
+    """
+    Import historical consultations from a CSV or JSONL upload (see bulk_import.py).
+
+    Send the file as multipart field "file", or as the raw request body with
+    ?format=csv|jsonl (or a text/csv / application/x-ndjson Content-Type).
+    Query params: score=1 to fill missing predictions of rows with features,
+    batch_size (rows per transaction).
+
+    Rows are imported under the authenticated doctor: a missing doctor_id
+    defaults to theirs and a row naming another doctor is rejected.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, fmt = upload.stream, bulk_import.detect_format(upload.filename or "", request.args.get("format"))
+    else:
+        stream, fmt = request.stream, bulk_import.detect_format("", request.args.get("format") or request.mimetype)
+    try:
+        batch_size = int(request.args.get("batch_size", bulk_import.BATCH_SIZE))
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    score = request.args.get("score", "0").lower() in ("1", "true", "yes")
+
+    try:
+        summary = bulk_import.run_import(
+            bulk_import.iter_rows(bulk_import.iter_text_lines(stream), fmt),
+            repo.save_consultations,
+            model_registry=model_registry if score else None,
+            batch_size=batch_size,
+            doctor_id=g.doctor["id"] if g.get("doctor") is not None else None
+        )
+    except (PoolExhausted, StorageUnavailable, SchemaOutdated):
+        raise
+    except (StorageError, UnicodeDecodeError) as e:
+        print(f"❌ Bulk import failed: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+    print(f"✅ Bulk import: {summary['imported']}/{summary['rows']} rows in {summary['elapsed_s']} s "
+          f"({summary['rows_per_s']} rows/s)")
+    return jsonify({"success": True, "format": fmt, **summary})
+
+# =====================
+# METRICS ENDPOINTS
+# =====================
+@app.route("/metrics/batching", methods=["GET"])
+def batching_metrics():
+    return jsonify({
+        "enabled": MICROBATCH_ENABLED,
+        "softmax_dso2": softmax_batcher.stats(),
+        "mlp_dso3": mlp_batcher.stats()
+    })
+
+@app.route("/metrics/db_pool", methods=["GET"])
+@app.route("/metrics/storage", methods=["GET"])
+def storage_metrics():
+    # MySQL: connection pool of this worker; SQLite: database file sizes
+    return jsonify(repo.stats())
+
+@app.route("/metrics/uploads", methods=["GET"])
+def upload_metrics():
+    return jsonify(upload_store.stats())
+
+@app.route("/metrics/image_inference", methods=["GET"])
+def image_inference_metrics():
+    return jsonify(image_classifier.stats())
+
+@app.route("/metrics/auth", methods=["GET"])
+def auth_metrics():
+    return jsonify({"enabled": AUTH_ENABLED, **auth.stats()})
+
+@app.route("/metrics/consultation_queue", methods=["GET"])
+def consultation_queue_metrics():
+    if consultation_queue is None:
+        return jsonify({"enabled": False, "mode": CONSULTATION_WRITE_MODE})
+    return jsonify({"enabled": True, "mode": CONSULTATION_WRITE_MODE, **consultation_queue.stats()})
+
+@app.route("/metrics/extraction_cache", methods=["GET"])
+def extraction_cache_metrics():
+    cache = get_extraction_cache() if FEATURE_EXTRACTION_AVAILABLE else None
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+@app.route("/metrics/extraction_dedup", methods=["GET"])
+def extraction_dedup_metrics():
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"enabled": False})
+    cache = get_extraction_cache()
+    return jsonify({
+        "enabled": True,
+        "single_flight": extraction_flight.stats(),
+        # Waits on another worker's in-flight extraction (needs the extraction cache)
+        "cross_worker_waits": cache.stats()["claim_waits"] if cache is not None else None
+    })
+
+@app.route("/metrics/extraction_backends", methods=["GET"])
+def extraction_backends_metrics():
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"enabled": False})
+    # Empty until the first LLM call builds the pool
+    return jsonify({"enabled": True, "pools": backend_pool_stats()})
+
+@app.route("/metrics/extraction_client", methods=["GET"])
+def extraction_client_metrics():
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **client_stats()})
+
+# =====================
+# MODEL REGISTRY ENDPOINTS
+# =====================
+@app.route("/models", methods=["GET"])
+def list_models():
+    return jsonify(model_registry.status())
+
+@app.route("/models/reload", methods=["POST"])
+def reload_models():
+    """Load a version in the background and swap it in (all workers follow CURRENT). Operators only."""
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    try:
+        if version:
+            model_registry.activate(version)
+            started = True
+        else:
+            started = model_registry.reload_async()
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    except ReloadInProgress:
+        started = False
+    if not started:
+        return jsonify({"success": False, "message": "A reload is already in progress"}), 409
+    return jsonify({"success": True, "message": "Reload started", "current": model_registry.current().version}), 202
+
+
+def features_to_row(features):
+    """Convert an extracted feature dict into a (1, 30) matrix (missing features -> 0)."""
+    return features_to_matrix([features])
+
+def extraction_block(features, details=None):
+    block = {
+        "features_extracted": len([v for v in features.values() if v is not None]),
+        "total_features": len(features),
+        "features": features
+    }
+    if details:
+        block.update({
+            "resolved_locally": details["resolved_locally"],
+            "llm_called": details["llm_called"],
+            "deduplicated": details["deduplicated"],
+            "llm_timing": details["timing"],
+            "confidence": details["confidence"],
+            "source": details["source"]
+        })
+    return block
+
+# Models available to /extract_and_predict_all: name -> (row scorer, prediction builder)
+EXTRACTION_MODELS = {
+    "softmax": (softmax_proba_row, softmax_prediction),
+    "mlp": (mlp_proba_row, mlp_prediction),
+}
+
+def select_extraction_models(data):
+    """Model names requested in an extraction body ("models": list or string, default all)."""
+    selected = data.get('models') or list(EXTRACTION_MODELS)
+    if isinstance(selected, str):
+        selected = [selected]
+    unknown = [name for name in selected if name not in EXTRACTION_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown models: {unknown}. Available: {list(EXTRACTION_MODELS)}")
+    return selected
+
+def run_extraction(report_text, selected):
+    """
+    Extract the features of a report once and score them with the selected models.
+
+    Returns:
+        The /extract_and_predict_all response body (also the result of extraction jobs)
+    """
+    details = {}
+    features = extract_features_from_text(report_text, details=details)
+    values = features_to_row(features)
+
+    predictions = {}
+    model_versions = set()
+    for name in selected:
+        score_row, build_prediction = EXTRACTION_MODELS[name]
+        proba, model_version = score_row(values)
+        predictions[name] = build_prediction(proba)
+        model_versions.add(model_version)
+
+    return {
+        "status": "success",
+        # Both models normally come from the same registry version; a hot swap
+        # between the two scoring calls is reported as a comma-separated list
+        "model_version": ",".join(sorted(model_versions)),
+        "extraction": extraction_block(features, details),
+        "predictions": predictions
+    }
+
+def sse_event(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 
 @app.route("/extract_and_predict", methods=["POST"])
 def extract_and_predict():
@@ -418,34 +956,21 @@ def extract_and_predict():
         if not report_text or not report_text.strip():
             return jsonify({"error": "report_description is required"}), 400
         
-        features = extract_features_from_text(report_text)
+        details = {}
+        features = extract_features_from_text(report_text, details=details)
         
         try:
-            values = np.array([[features.get(col, 0) if features.get(col) is not None else 0 for col in feature_cols]], dtype=np.float32)
+            values = features_to_row(features)
         except Exception as e:
             return jsonify({"error": f"Invalid features: {str(e)}"}), 400
         
-        X_scaled = scaler_dso2.transform(values)
-        X_tensor = torch.tensor(X_scaled, dtype=torch.float32)
-        
-        logits = softmax_model(X_tensor)
-        proba = torch.softmax(logits, dim=1).detach().numpy()[0]
-        pred_class = int(np.argmax(proba))
+        proba, model_version = softmax_proba_row(values)
         
         return jsonify({
             "status": "success",
-            "extraction": {
-                "features_extracted": len([v for v in features.values() if v is not None]),
-                "total_features": len(features),
-                "features": features
-            },
-            "prediction": {
-                "class": pred_class,
-                "diagnosis": "Benign" if pred_class == 0 else "Malignant",
-                "probability_class0": float(proba[0]),
-                "probability_class1": float(proba[1]),
-                "confidence": float(max(proba[0], proba[1]) * 100)
-            }
+            "model_version": model_version,
+            "extraction": extraction_block(features, details),
+            "prediction": softmax_prediction(proba)
         })
     except Exception as e:
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
@@ -462,52 +987,215 @@ def extract_and_predict_mlp():
         if not report_text or not report_text.strip():
             return jsonify({"error": "report_description is required"}), 400
         
-        features = extract_features_from_text(report_text)
+        details = {}
+        features = extract_features_from_text(report_text, details=details)
         
         try:
-            values = np.array([[features.get(col, 0) if features.get(col) is not None else 0 for col in feature_cols]], dtype=np.float32)
+            values = features_to_row(features)
         except Exception as e:
             return jsonify({"error": f"Invalid features: {str(e)}"}), 400
         
-        X_scaled = scaler_dso3.transform(values)
-        pred = mlp_dso3.predict(X_scaled)[0]
-        proba = mlp_dso3.predict_proba(X_scaled)[0]
-        risk_score = proba[1]
-        
-        if risk_score <= 0.3:
-            risk_level = "Low"
-            french_level = "Faible risque"
-            recommendation = "Pas d'urgence – suivi standard recommandé"
-            color = "green"
-        elif risk_score < 0.7:
-            risk_level = "Medium"
-            french_level = "Risque intermédiaire"
-            recommendation = "Évaluation complémentaire conseillée rapidement"
-            color = "orange"
-        else:
-            risk_level = "High"
-            french_level = "Risque élevé"
-            recommendation = "Urgence – prise en charge rapide recommandée"
-            color = "red"
+        proba, model_version = mlp_proba_row(values)
         
         return jsonify({
             "status": "success",
             "model": "MLP (DSO3)",
-            "prediction": {
-                "class": int(pred),
-                "diagnosis": "Benign" if pred == 0 else "Malignant",
-                "risk_score": float(risk_score),
-                "risk_level_en": risk_level,
-                "risk_level_fr": french_level,
-                "recommendation_fr": recommendation,
-                "color": color,
-                "probability_class0": float(proba[0]),
-                "probability_class1": float(proba[1]),
-                "confidence": float(max(proba[0], proba[1]) * 100)
-            }
+            "model_version": model_version,
+            "prediction": mlp_prediction(proba)
         })
     except Exception as e:
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
+
+@app.route("/extract_and_predict_all", methods=["POST"])
+def extract_and_predict_all():
+    """
+    Extract the features of a report once and score them with several models.
+
+    Body: {"report_description": "...", "models": ["softmax", "mlp"]}  (models optional, default all)
+    """
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"error": "Feature extraction not available."}), 503
+    
+    data = request.json
+    try:
+        report_text = data.get('report_description', '')
+        if not report_text or not report_text.strip():
+            return jsonify({"error": "report_description is required"}), 400
+        
+        try:
+            selected = select_extraction_models(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify(run_extraction(report_text, selected))
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route("/extract_and_predict_stream", methods=["POST"])
+def extract_and_predict_stream():
+    """
+    Streaming /extract_and_predict_all over Server-Sent Events.
+
+    Body: same as /extract_and_predict_all. Events, in order:
+        feature     {"name", "value", "source"} as soon as each feature is known
+        extraction  the extraction block once the JSON answer is complete
+        prediction  {"model", "model_version", "prediction"} per model
+        result      the full /extract_and_predict_all response
+        error       {"error"} if anything fails mid-stream
+    """
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"error": "Feature extraction not available."}), 503
+
+    data = request.get_json(silent=True) or {}
+    report_text = data.get('report_description', '')
+    if not report_text or not report_text.strip():
+        return jsonify({"error": "report_description is required"}), 400
+    try:
+        selected = select_extraction_models(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        try:
+            features, details = None, None
+            for event, payload in stream_features_from_text(report_text):
+                if event == "feature":
+                    yield sse_event("feature", payload)
+                else:
+                    features, details = payload["features"], payload["details"]
+
+            # Scoring starts as soon as the closing brace of the LLM answer is parsed
+            extraction = extraction_block(features, details)
+            yield sse_event("extraction", extraction)
+            values = features_to_row(features)
+            predictions = {}
+            model_versions = set()
+            for name in selected:
+                score_row, build_prediction = EXTRACTION_MODELS[name]
+                proba, model_version = score_row(values)
+                predictions[name] = build_prediction(proba)
+                model_versions.add(model_version)
+                yield sse_event("prediction", {"model": name, "model_version": model_version, "prediction": predictions[name]})
+
+            yield sse_event("result", {
+                "status": "success",
+                "model_version": ",".join(sorted(model_versions)),
+                "extraction": extraction,
+                "predictions": predictions
+            })
+        except Exception as e:
+            yield sse_event("error", {"error": f"Unexpected error: {str(e)}"})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# =====================
+# EXTRACTION JOBS
+# =====================
+# Submit a report, get a job id at once, poll / long-poll GET /jobs/<id> for the result.
+# The extraction runs on a bounded background pool, so the request thread is freed immediately.
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", "30"))
+
+job_runner = JobRunner(
+    JobStore(path=os.getenv("JOB_DB_PATH", "jobs.sqlite3"), ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", "3600")),
+             stale_seconds=float(os.getenv("JOB_STALE_SECONDS", "900"))),
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "100"))
+)
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Queue an extraction + scoring job.
+
+    Body: same as /extract_and_predict_all. Returns 202 with the job id.
+    """
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"error": "Feature extraction not available."}), 503
+
+    data = request.get_json(silent=True) or {}
+    report_text = data.get('report_description', '')
+    if not report_text or not report_text.strip():
+        return jsonify({"error": "report_description is required"}), 400
+    try:
+        selected = select_extraction_models(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job_id = job_runner.submit("extract_and_predict", run_extraction, report_text, selected)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    return jsonify({"job_id": job_id, "status": "queued", "poll_url": f"/jobs/{job_id}"}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Job status and, once done, its result.
+
+    Query: wait=<seconds> to long-poll until the job finishes (capped at JOB_MAX_WAIT_SECONDS).
+    """
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0.0), JOB_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    job = job_runner.store.wait(job_id, wait) if wait else job_runner.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
+
+@app.route("/metrics/jobs", methods=["GET"])
+def jobs_metrics():
+    return jsonify(job_runner.stats())
+
+# Upper bound on reports accepted by /bulk_extract in one request (use bulk_extract.py for archives)
+BULK_MAX_REPORTS = int(os.getenv("BULK_MAX_REPORTS", "500"))
+
+def run_bulk_job(pairs, score):
+    """
+    Extract and score (report_id, text) pairs on a job thread.
+
+    Returns:
+        The bulk summary with its results in input order (the /bulk_extract job result)
+    """
+    results = []
+    summary = asyncio.run(run_bulk_extraction(
+        pairs, results.extend,
+        model_registry=model_registry if score else None
+    ))
+    # Results are produced in completion order: return them in input order
+    order = {report_id: i for i, (report_id, _) in enumerate(pairs)}
+    results.sort(key=lambda record: order.get(record["id"], len(order)))
+    return {"status": "success", **summary, "results": results}
+
+@app.route("/bulk_extract", methods=["POST"])
+def bulk_extract():
+    """
+    Queue a job extracting and scoring a batch of reports concurrently (rate limited, with retries).
+
+    Body: {"reports": [{"id": "...", "report_description": "..."}, ...], "score": true}
+    Returns 202 with the job id; GET /jobs/<id> gives the summary and per-report results.
+    """
+    if not FEATURE_EXTRACTION_AVAILABLE:
+        return jsonify({"error": "Feature extraction not available."}), 503
+
+    data = request.get_json(silent=True) or {}
+    reports = data.get("reports")
+    if not isinstance(reports, list) or not reports:
+        return jsonify({"error": "reports must be a non-empty list"}), 400
+    if len(reports) > BULK_MAX_REPORTS:
+        return jsonify({"error": f"too many reports: {len(reports)} (max {BULK_MAX_REPORTS})"}), 400
+    if not all(isinstance(report, dict) for report in reports):
+        return jsonify({"error": "each report must be a JSON object"}), 400
+
+    pairs = [(str(report.get("id", i)), report.get("report_description", "")) for i, report in enumerate(reports)]
+    try:
+        job_id = job_runner.submit("bulk_extract", run_bulk_job, pairs, bool(data.get("score", True)))
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    return jsonify({"job_id": job_id, "status": "queued", "reports": len(pairs),
+                    "poll_url": f"/jobs/{job_id}"}), 202
+
 if __name__ == "__main__":
     app.run(port=5000)
@@ -0,0 +1,264 @@
+"""
+Stateless signed-token sessions (JWT, HS256).
+
+/login checks the doctor's credentials once and issues a token carrying the
+doctor's id and name, signed with JWT_SECRET and expiring after
+JWT_TTL_SECONDS. Every other request is authenticated by verify_token():
+one HMAC-SHA256 over the token, a few claim checks and a dict lookup in the
+revocation list, all in memory. No database round trip, and the cost does
+not depend on the number of doctors or sessions.
+
+    Authorization: Bearer <token>
+
+/logout revokes the token's id (jti) in a small in-process RevocationList.
+Entries whose token has expired are dropped on every revocation, so the
+list only ever holds live tokens. A live revocation is never dropped: when
+REVOCATION_MAX_ENTRIES live tokens are already revoked, /logout fails with
+503 (RevocationListFull) instead of silently re-enabling another logged-out
+token. Each worker process keeps its own list: a
+token revoked by one worker stays valid on the others until it expires,
+which JWT_TTL_SECONDS bounds (the frontend discards the token on logout).
+
+Set JWT_SECRET to the same value on every worker and host: with
+authentication enabled the server refuses to start without it. Only
+AUTH_DEV_MODE=1 (a single local process) falls back to a random secret,
+which other processes do not share and which is lost on restart.
+
+Uploaded images are loaded by <img src>, which cannot send the header:
+/uploads/<digest> and its thumbnail also accept a short-lived signed URL
+(sign_url / verify_signed_url, HMAC-SHA256 with JWT_SECRET, valid
+UPLOAD_URL_TTL_SECONDS), minted for an authenticated doctor.
+
+Operator actions (POST /models/reload) are not doctor actions: they take
+the ADMIN_TOKEN shared secret instead of a login (verify_admin_token), and
+are disabled while ADMIN_TOKEN is unset.
+"""
+import hmac
+import os
+import secrets
+import threading
+import time
+import uuid
+
+import jwt
+
+JWT_ALGORITHM = "HS256"
+JWT_TTL_SECONDS = int(os.getenv("JWT_TTL_SECONDS", str(8 * 3600)))
+# Clock skew tolerated between hosts when checking exp / iat
+JWT_LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "30"))
+REVOCATION_MAX_ENTRIES = int(os.getenv("REVOCATION_MAX_ENTRIES", "10000"))
+UPLOAD_URL_TTL_SECONDS = int(os.getenv("UPLOAD_URL_TTL_SECONDS", "300"))
+
+JWT_SECRET = os.getenv("JWT_SECRET")
+# Local development only: allows a random per-process secret when JWT_SECRET is unset
+AUTH_DEV_MODE = os.getenv("AUTH_DEV_MODE", "0") == "1"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+class AuthError(Exception):
+    """The request carries no valid token (served as 401)."""
+
+
+class AdminDisabled(AuthError):
+    """Operator endpoints are turned off: ADMIN_TOKEN is not set (served as 403)."""
+
+
+class RevocationListFull(RuntimeError):
+    """Too many live revocations to record another one (served as 503)."""
+
+
+def check_secret(auth_enabled):
+    """
+    Make sure tokens are signed with a secret every worker shares.
+
+    Called once at startup. Without JWT_SECRET, each process that does not
+    inherit the parent's memory (GUNICORN_PRELOAD=0, several hosts) would sign
+    with its own random secret and reject the others' tokens.
+
+    Args:
+        auth_enabled: Whether requests are authenticated (AUTH_ENABLED)
+
+    Raises:
+        RuntimeError: If authentication is enabled, JWT_SECRET is unset and AUTH_DEV_MODE is off
+    """
+    global JWT_SECRET
+    if JWT_SECRET:
+        return
+    if auth_enabled and not AUTH_DEV_MODE:
+        raise RuntimeError("JWT_SECRET is not set: set it to the same value on every worker and host "
+                           "(or AUTH_DEV_MODE=1 for a single local process)")
+    JWT_SECRET = secrets.token_hex(32)
+    if auth_enabled:
+        print("⚠️ AUTH_DEV_MODE=1 and JWT_SECRET not set: using a random per-process secret")
+
+
+class RevocationList:
+    """
+    Ids of revoked tokens with their expiry time, in process memory.
+
+    Args:
+        max_entries: Upper bound on live revocations; beyond it, revoke() fails
+            rather than dropping one that has not expired
+    """
+
+    def __init__(self, max_entries=REVOCATION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._expires = {}
+        self._lock = threading.Lock()
+        self.revoked = 0
+        self.refused = 0
+
+    def revoke(self, jti, expires_at):
+        """
+        Record a revocation until `expires_at` (epoch seconds).
+
+        Raises:
+            RevocationListFull: If max_entries unexpired tokens are already revoked
+        """
+        with self._lock:
+            self._prune()
+            if jti not in self._expires and len(self._expires) >= self.max_entries:
+                self.refused += 1
+                raise RevocationListFull(f"Revocation list full ({self.max_entries} live tokens revoked)")
+            self._expires[jti] = expires_at
+            self.revoked += 1
+
+    def _prune(self):
+        # Swap in a new dict: is_revoked() reads without the lock
+        now = time.time()
+        if any(exp + JWT_LEEWAY_SECONDS <= now for exp in self._expires.values()):
+            self._expires = {jti: exp for jti, exp in self._expires.items() if exp + JWT_LEEWAY_SECONDS > now}
+
+    def is_revoked(self, jti):
+        # A plain dict read: no lock needed on the request path
+        return jti in self._expires
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._expires), "max_entries": self.max_entries,
+                    "revoked": self.revoked, "refused": self.refused}
+
+
+revocations = RevocationList()
+
+
+def issue_token(doctor):
+    """
+    Signed token for a doctor row (id, nom, prenom).
+
+    Returns:
+        (token, expires_at) with expires_at in epoch seconds
+    """
+    now = int(time.time())
+    expires_at = now + JWT_TTL_SECONDS
+    claims = {
+        "sub": str(doctor["id"]),
+        "name": f"{doctor['prenom']} {doctor['nom']}",
+        "iat": now,
+        "exp": expires_at,
+        "jti": uuid.uuid4().hex,
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM), expires_at
+
+
+def bearer_token(authorization):
+    """The token of an `Authorization: Bearer <token>` header value, or None."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def verify_token(token):
+    """
+    Check a token's signature, expiry and revocation.
+
+    Returns:
+        dict with the doctor's id and name, plus the token's jti and exp
+
+    Raises:
+        AuthError: If the token is missing, malformed, badly signed, expired or revoked
+    """
+    if not token:
+        raise AuthError("Missing bearer token")
+    try:
+        # The algorithm is pinned: the token's own header cannot select another one
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], leeway=JWT_LEEWAY_SECONDS,
+                            options={"require": ["sub", "exp", "iat", "jti"]})
+    except jwt.ExpiredSignatureError:
+        raise AuthError("Token expired")
+    except jwt.InvalidTokenError as e:
+        raise AuthError(f"Invalid token: {e}")
+    if revocations.is_revoked(claims["jti"]):
+        raise AuthError("Token revoked")
+    try:
+        doctor_id = int(claims["sub"])
+    except ValueError:
+        raise AuthError("Invalid token subject")
+    return {"id": doctor_id, "name": claims.get("name"), "jti": claims["jti"], "exp": claims["exp"]}
+
+
+def _url_signature(resource, expires):
+    message = f"url:{resource}:{expires}".encode()
+    return hmac.new(JWT_SECRET.encode(), message, "sha256").hexdigest()
+
+
+def sign_url(resource, ttl=None):
+    """
+    Query parameters granting GET access to `resource` until they expire.
+
+    Args:
+        resource: Name of what the URL serves, e.g. "get_upload/<digest>"
+        ttl: Validity in seconds (default UPLOAD_URL_TTL_SECONDS)
+
+    Returns:
+        dict with expires (epoch seconds) and sig
+    """
+    expires = int(time.time()) + (UPLOAD_URL_TTL_SECONDS if ttl is None else ttl)
+    return {"expires": expires, "sig": _url_signature(resource, expires)}
+
+
+def verify_signed_url(resource, expires, sig):
+    """
+    Check the query parameters of a signed URL (constant-time).
+
+    Raises:
+        AuthError: If they are missing, malformed, expired or signed for another resource
+    """
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        raise AuthError("Invalid signed URL")
+    if not sig or not hmac.compare_digest(sig.encode(), _url_signature(resource, expires).encode()):
+        raise AuthError("Invalid signed URL")
+    if expires < time.time():
+        raise AuthError("Signed URL expired")
+
+
+def verify_admin_token(token):
+    """
+    Check an operator token against ADMIN_TOKEN (constant-time).
+
+    Raises:
+        AdminDisabled: If ADMIN_TOKEN is not set
+        AuthError: If the token is missing or wrong
+    """
+    if not ADMIN_TOKEN:
+        raise AdminDisabled("Operator endpoints are disabled (ADMIN_TOKEN not set)")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise AuthError("Invalid operator token")
+
+
+def revoke(claims):
+    """
+    Revoke the token described by verify_token()'s result until it expires.
+
+    Raises:
+        RevocationListFull: If the revocation list has no room left
+    """
+    revocations.revoke(claims["jti"], claims["exp"])
+
+
+def stats():
+    return {"algorithm": JWT_ALGORITHM, "ttl_s": JWT_TTL_SECONDS, "url_ttl_s": UPLOAD_URL_TTL_SECONDS, "dev_mode": AUTH_DEV_MODE,
+            "admin_enabled": bool(ADMIN_TOKEN), "revocations": revocations.stats()}
@@ -0,0 +1,158 @@
+"""
+Dynamic micro-batching for the ML models.
+
+Concurrent single-row requests are queued and coalesced into one batched
+forward pass, either when max_batch_size rows are waiting or when the
+oldest row has waited max_wait_ms. A caller waits at most timeout_ms for
+its result and gets BatchTimeout (served as 503) instead of hanging.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class BatchTimeout(Exception):
+    """The scored output of a queued row was not ready in time."""
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus-style cumulative `le` buckets)."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            idx = len(self.bounds)
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    idx = i
+                    break
+            self.counts[idx] += 1
+            self.total += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {}
+            running = 0
+            for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+                running += count
+                buckets[str(bound)] = running
+            return {
+                "count": self.total,
+                "sum": self.sum,
+                "mean": self.sum / self.total if self.total else 0.0,
+                "buckets": buckets,
+            }
+
+
+class MicroBatcher:
+    """
+    In-process request coalescer in front of a vectorized scoring function.
+
+    Args:
+        name: Label used in metrics
+        score_fn: Callable mapping an (N, D) matrix to an (N, ...) array
+        max_batch_size: Dispatch as soon as this many rows are queued
+        max_wait_ms: Maximum time the oldest queued row waits before dispatch
+        timeout_ms: Maximum time submit() waits for the scored output
+    """
+
+    BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+    QUEUE_WAIT_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100]
+
+    def __init__(self, name, score_fn, max_batch_size=64, max_wait_ms=2.0, timeout_ms=5000.0):
+        self.name = name
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout_ms / 1000.0
+        self.batch_size_hist = Histogram(self.BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(self.QUEUE_WAIT_BUCKETS_MS)
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, row):
+        """
+        Queue one feature row and block until its scored output is ready.
+
+        Raises:
+            BatchTimeout: The output was not ready within timeout_ms
+        """
+        try:
+            return self.submit_async(row).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise BatchTimeout(f"{self.name}: no result after {self.timeout * 1000.0:.0f} ms") from None
+
+    def submit_async(self, row):
+        """Queue one feature row and return a Future for its scored output."""
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((np.asarray(row), time.perf_counter(), future))
+            self._cond.notify()
+        return future
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(): (re)start the dispatcher in each process
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            # Rows queued for a dispatcher that is gone would never be scored: fail them
+            while self._pending:
+                _, _, future = self._pending.popleft()
+                future.set_exception(RuntimeError(f"{self.name}: batch dispatcher stopped"))
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][1] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched_at = time.perf_counter()
+            for _, enqueued_at, _ in batch:
+                self.queue_wait_hist.observe((dispatched_at - enqueued_at) * 1000.0)
+            self.batch_size_hist.observe(len(batch))
+
+            try:
+                outputs = self.score_fn(np.stack([row for row, _, _ in batch]))
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for i, (_, _, future) in enumerate(batch):
+                future.set_result(outputs[i])
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "timeout_ms": self.timeout * 1000.0,
+            "queued": len(self._pending),
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
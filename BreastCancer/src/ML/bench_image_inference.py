@@ -0,0 +1,149 @@
+"""
+CPU throughput of the mammogram classifier (see image_inference.py), in images per second.
+
+    python bench_image_inference.py                          # trained checkpoint, synthetic images
+    python bench_image_inference.py --images DATASET/Cancer  # real images
+    python bench_image_inference.py --random-weights         # no checkpoint yet: speed only
+
+Three measurements:
+    1. preprocessing (decode, crop_breast_region, resize, normalize) on one core
+    2. forward pass, eager versus TorchScript, for each thread count and batch size
+    3. end to end through ImageClassifier with concurrent clients (preprocessing
+       in the client threads, micro-batched forward), as /predict_image runs
+
+Run it on the serving host: the best thread count and batch size depend on
+its cores and memory bandwidth (IMAGE_INFERENCE_THREADS, IMAGE_BATCH_MAX_SIZE).
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+import image_inference
+from image_inference import IMAGE_MODEL_PATH, ImageClassifier, build_model, export_torchscript, load_checkpoint, preprocess
+
+
+def synthetic_mammograms(directory, count, width=1600, height=2600):
+    """Grayscale JPEGs shaped like a mammogram: a textured half-ellipse on a black background."""
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:height, 0:width]
+    breast = ((xx / (0.8 * width)) ** 2 + ((yy - height / 2) / (0.45 * height)) ** 2) < 1
+    paths = []
+    for i in range(count):
+        pixels = np.where(breast, rng.normal(140, 35, (height, width)), rng.normal(3, 2, (height, width)))
+        path = os.path.join(directory, f"synthetic_{i}.jpg")
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "L").save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def timed(fn, seconds):
+    """(calls per second, mean seconds per call) of fn, run for about `seconds` after a warm-up call."""
+    fn()
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return calls / elapsed, elapsed / calls
+
+
+def bench_preprocess(paths, seconds):
+    cycle = iter(paths * 1000)
+    rate, _ = timed(lambda: preprocess(next(cycle)), seconds)
+    print(f"\n1. Preprocessing (one core): {rate:8.1f} images/s")
+
+
+def bench_forward(models, threads, batch_sizes, size, seconds):
+    print("\n2. Forward pass (images/s)")
+    print(f"   {'model':12s} {'threads':>7s} " + " ".join(f"{'batch=' + str(b):>10s}" for b in batch_sizes))
+    for name, model in models.items():
+        for n_threads in threads:
+            torch.set_num_threads(n_threads)
+            rates = []
+            for batch_size in batch_sizes:
+                X = torch.rand(batch_size, 3, size, size).contiguous(memory_format=torch.channels_last)
+                with torch.inference_mode():
+                    rate, _ = timed(lambda: model(X), seconds)
+                rates.append(rate * batch_size)
+            print(f"   {name:12s} {n_threads:7d} " + " ".join(f"{rate:10.1f}" for rate in rates))
+
+
+def bench_end_to_end(checkpoint, script_path, paths, threads, clients, max_batch_size, seconds):
+    print(f"\n3. End to end, {clients} concurrent clients, max batch {max_batch_size} (images/s)")
+    for n_threads in threads:
+        classifier = ImageClassifier(checkpoint, script_path, num_threads=n_threads,
+                                     max_batch_size=max_batch_size, max_wait_ms=10.0)
+        classifier.model()
+        cycle = iter(paths * 100000)
+        deadline = time.perf_counter() + seconds
+
+        def client():
+            done = 0
+            while time.perf_counter() < deadline:
+                classifier.predict(next(cycle))
+                done += 1
+            return done
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            done = sum(pool.map(lambda _: client(), range(clients)))
+        elapsed = time.perf_counter() - started
+        batching = classifier.batcher.stats()["batch_size"]
+        print(f"   threads={n_threads:<3d} {done / elapsed:8.1f} images/s  "
+              f"(mean batch {batching['mean']:.1f}, {elapsed * 1000 / done:.1f} ms/image)")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark the mammogram classifier on CPU")
+    parser.add_argument("--checkpoint", default=IMAGE_MODEL_PATH)
+    parser.add_argument("--random-weights", action="store_true", help="Benchmark an untrained model")
+    parser.add_argument("--images", help="Directory of images (default: synthetic mammograms)")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16")
+    parser.add_argument("--threads", default=",".join(sorted({"1", str(max(1, cpus // 2)), str(cpus)}, key=int)))
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients of the end-to-end run")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each measurement")
+    args = parser.parse_args()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    threads = [int(t) for t in args.threads.split(",")]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        checkpoint = args.checkpoint
+        if args.random_weights:
+            checkpoint = os.path.join(work_dir, "random_weights.pth")
+            torch.save(build_model().state_dict(), checkpoint)
+        elif not os.path.exists(checkpoint):
+            parser.error(f"checkpoint {checkpoint} not found (use --random-weights to measure speed only)")
+
+        if args.images:
+            paths = sorted(p for p in glob.glob(os.path.join(args.images, "**", "*"), recursive=True)
+                           if p.lower().endswith((".jpg", ".jpeg", ".png")))[:64]
+        else:
+            paths = synthetic_mammograms(work_dir, 8)
+        print(f"torch {torch.__version__}, {cpus} CPUs, {len(paths)} images, "
+              f"input {image_inference.IMAGE_SIZE}x{image_inference.IMAGE_SIZE}")
+
+        bench_preprocess(paths, args.seconds)
+
+        eager = load_checkpoint(checkpoint)
+        script_path = os.path.join(work_dir, "model.torchscript.pt")
+        scripted = export_torchscript(eager, script_path, {"checkpoint_sha256": image_inference.file_sha256(checkpoint),
+                                                           "size": image_inference.IMAGE_SIZE})
+        bench_forward({"eager": eager, "torchscript": scripted}, threads, batch_sizes,
+                      image_inference.IMAGE_SIZE, args.seconds)
+
+        bench_end_to_end(checkpoint, script_path, paths, threads, args.clients, args.max_batch_size, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Bulk feature extraction for archived reports.
+
+Reads a directory of .txt reports or a JSONL stream of
+{"id": ..., "report_description": ...} records, extracts the 30 features of
+every report concurrently and scores them in batches with the fused models.
+
+    python bulk_extract.py reports/ -o features.jsonl
+    python bulk_extract.py reports.jsonl -o features.jsonl --concurrency 8 --rate 4
+    cat reports.jsonl | python bulk_extract.py - -o features.jsonl --parquet features.parquet
+
+- Extractions run on a bounded pool of worker tasks (--concurrency); LLM calls
+  additionally go through a token bucket (--rate requests/s, --burst) and
+  are retried with exponential backoff + jitter on rate limits (429), server
+  errors (5xx), timeouts and connection errors.
+- Reports resolved entirely by the local extractor skip the rate limiter.
+- Results are appended to the JSONL output as they finish (one line per
+  report, flushed every scoring batch). The output doubles as the checkpoint:
+  on restart, ids already written with status "ok" are skipped, so a crashed
+  run resumes where it stopped. Failed reports are retried on the next run
+  (the last line for an id wins).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import groq
+import httpx
+
+from feature_extractor import LOCAL_CONFIDENCE_THRESHOLD, extract_features_from_text, extract_features_locally
+from llm_backends import NoBackendAvailable
+from llm_client import POOL_SIZE
+from scoring import feature_cols, features_to_matrix, softmax_prediction, mlp_prediction
+
+CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+RATE_PER_SECOND = float(os.getenv("BULK_RATE_PER_SECOND", "4"))
+BURST = int(os.getenv("BULK_BURST", "8"))
+MAX_ATTEMPTS = int(os.getenv("BULK_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.getenv("BULK_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("BULK_BACKOFF_MAX", "30"))
+SCORE_BATCH = int(os.getenv("BULK_SCORE_BATCH", "64"))
+# Pending results are scored and written at least this often, even if the batch is not full
+FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", "2"))
+
+# Transient failures worth retrying (groq.APITimeoutError is an APIConnectionError)
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APIConnectionError,
+    groq.InternalServerError,
+    httpx.TransportError,
+    json.JSONDecodeError,
+    NoBackendAvailable,
+)
+# OpenAI-compatible backends raise httpx.HTTPStatusError: retry rate limits and server errors only
+RETRYABLE_STATUS = 429
+
+
+def is_retryable(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == RETRYABLE_STATUS or status >= 500
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: `rate` acquisitions per second on average, bursts of up to `burst`.
+
+    A rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self.updated is not None:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt, error=None):
+    """Exponential backoff with full jitter, honouring a Retry-After header when the API sends one."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(BACKOFF_MAX, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+
+# =====================
+# INPUT / CHECKPOINT
+# =====================
+def iter_reports(source):
+    """
+    Yield (report_id, text) pairs from a directory of .txt files, a JSONL file or "-" (JSONL on stdin).
+
+    JSONL records need a "report_description" (or "text") field; the id comes
+    from "id" / "report_id" and defaults to the line number.
+    """
+    if source != "-" and os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if name.endswith(".txt") and os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    yield os.path.splitext(name)[0], f.read()
+        return
+
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping invalid JSON on line {line_no}")
+                continue
+            report_id = record.get("id", record.get("report_id", f"line-{line_no}"))
+            yield str(report_id), record.get("report_description", record.get("text", ""))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def load_checkpoint(output_path):
+    """Ids already extracted successfully in a previous run (a torn last line is ignored)."""
+    done = set()
+    if not output_path or not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+            else:
+                done.discard(record.get("id"))
+    return done
+
+
+def needs_llm(confidence):
+    """True if the local extraction (its per-feature confidence) leaves features for an API call."""
+    return any(confidence[col] < LOCAL_CONFIDENCE_THRESHOLD for col in feature_cols)
+
+
+# =====================
+# PIPELINE
+# =====================
+def score_records(records, model_registry):
+    """Score the successful records of a batch in one forward pass per model (in place)."""
+    ok = [record for record in records if record["status"] == "ok"]
+    if not ok or model_registry is None:
+        return
+    models = model_registry.current()
+    X = features_to_matrix([record["features"] for record in ok])
+    softmax_proba = models.softmax.predict_proba(X)
+    mlp_proba = models.mlp.predict_proba(X)
+    for k, record in enumerate(ok):
+        record["model_version"] = models.version
+        record["predictions"] = {
+            "softmax": softmax_prediction(softmax_proba[k]),
+            "mlp": mlp_prediction(mlp_proba[k])
+        }
+
+
+async def run_bulk_extraction(reports, write_records, model_registry=None, skip_ids=(),
+                              concurrency=CONCURRENCY, rate=RATE_PER_SECOND, burst=BURST,
+                              max_attempts=MAX_ATTEMPTS, score_batch=SCORE_BATCH, api_key=None):
+    """
+    Extract and score an iterable of (report_id, text) pairs.
+
+    Args:
+        reports: Iterable of (report_id, text); consumed lazily
+        write_records: Called with each scored batch (list of result dicts), in completion order
+        model_registry: ModelRegistry used for batched scoring (None = extraction only)
+        skip_ids: Report ids already done (checkpoint)
+        concurrency: Number of extractions running at once
+        rate: LLM calls per second allowed by the token bucket (<= 0 = unlimited)
+        burst: Token bucket capacity
+        max_attempts: Attempts per report on transient API errors
+        score_batch: Results scored and written together
+
+    Returns:
+        Summary dict (counts, retries, throughput)
+    """
+    loop = asyncio.get_running_loop()
+    # Dedicated threads: the default executor may be smaller than the requested concurrency
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk-extract")
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-read")
+    bucket = TokenBucket(rate, burst)
+    inputs = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
+    skip_ids = set(skip_ids)
+    summary = {"total": 0, "ok": 0, "failed": 0, "skipped": 0, "llm_calls": 0, "retries": 0}
+    start = time.perf_counter()
+
+    async def produce():
+        # Reading files or stdin blocks: pull each report on a thread, not on the event loop
+        iterator = iter(reports)
+        while True:
+            item = await loop.run_in_executor(reader, next, iterator, None)
+            if item is None:
+                break
+            report_id, text = item
+            if report_id in skip_ids:
+                summary["skipped"] += 1
+                continue
+            summary["total"] += 1
+            await inputs.put((report_id, text))
+        for _ in range(concurrency):
+            await inputs.put(None)
+
+    async def extract_one(report_id, text):
+        record = {"id": report_id}
+        started = time.perf_counter()
+        if not text or not text.strip():
+            return {**record, "status": "error", "error": "empty report", "attempts": 0}
+        local = await loop.run_in_executor(executor, extract_features_locally, text)
+        if needs_llm(local[1]):
+            await bucket.acquire()
+        for attempt in range(1, max_attempts + 1):
+            details = {}
+            try:
+                features = await loop.run_in_executor(
+                    executor, lambda: extract_features_from_text(text, api_key=api_key, details=details, local=local))
+            except Exception as e:
+                if not is_retryable(e) or attempt == max_attempts:
+                    return {**record, "status": "error", "error": f"{type(e).__name__}: {e}", "attempts": attempt}
+                summary["retries"] += 1
+                await asyncio.sleep(backoff_delay(attempt, e))
+                await bucket.acquire()
+                continue
+            if details.get("llm_called"):
+                summary["llm_calls"] += 1
+            return {
+                **record,
+                "status": "ok",
+                "features": features,
+                "resolved_locally": details.get("resolved_locally"),
+                "llm_called": details.get("llm_called", False),
+                "attempts": attempt,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)
+            }
+
+    async def work():
+        while True:
+            item = await inputs.get()
+            if item is None:
+                return
+            await results.put(await extract_one(*item))
+
+    def flush(pending):
+        score_records(pending, model_registry)
+        for record in pending:
+            summary["ok" if record["status"] == "ok" else "failed"] += 1
+        write_records(pending)
+
+    async def collect(workers):
+        # Score a batch when it is full, or when its oldest result has waited FLUSH_INTERVAL
+        pending = []
+        oldest = None
+        while not (workers.done() and results.empty()):
+            timeout = FLUSH_INTERVAL if oldest is None else max(0.0, oldest + FLUSH_INTERVAL - loop.time())
+            try:
+                pending.append(await asyncio.wait_for(results.get(), timeout=timeout))
+                oldest = oldest or loop.time()
+            except asyncio.TimeoutError:
+                pass
+            if pending and (len(pending) >= score_batch or loop.time() - oldest >= FLUSH_INTERVAL):
+                flush(pending)
+                pending, oldest = [], None
+        if pending:
+            flush(pending)
+
+    workers = asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    collector = asyncio.ensure_future(collect(workers))
+    try:
+        await workers
+        await collector
+    finally:
+        collector.cancel()
+        workers.cancel()
+        executor.shutdown(wait=False)
+        reader.shutdown(wait=False)
+
+    elapsed = time.perf_counter() - start
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["reports_per_s"] = round((summary["ok"] + summary["failed"]) / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+# =====================
+# OUTPUT
+# =====================
+def write_parquet(jsonl_path, parquet_path):
+    """Convert the JSONL output to Parquet (one column per feature/prediction, last record per id)."""
+    import pandas as pd
+
+    rows = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            row = {key: value for key, value in record.items() if key not in ("features", "predictions")}
+            row.update(record.get("features") or {})
+            for model, prediction in (record.get("predictions") or {}).items():
+                row.update({f"{model}_{key}": value for key, value in prediction.items()})
+            rows[record["id"]] = row
+    pd.DataFrame(list(rows.values())).to_parquet(parquet_path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk feature extraction and scoring of medical reports")
+    parser.add_argument("source", help="Directory of .txt reports, JSONL file, or '-' for JSONL on stdin")
+    parser.add_argument("-o", "--output", default="bulk_features.jsonl", help="JSONL output (also the resume checkpoint)")
+    parser.add_argument("--parquet", help="Also write the results to this Parquet file at the end (needs pyarrow)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_PER_SECOND, help="LLM calls per second (<= 0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=BURST)
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    parser.add_argument("--score-batch", type=int, default=SCORE_BATCH)
+    parser.add_argument("--no-score", action="store_true", help="Only extract features")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and truncate the output")
+    args = parser.parse_args()
+
+    if args.concurrency > POOL_SIZE:
+        print(f"⚠️ --concurrency {args.concurrency} exceeds GROQ_POOL_SIZE={POOL_SIZE}: "
+              f"extra workers will wait for a pooled connection")
+
+    model_registry = None
+    if not args.no_score:
+        from model_registry import ModelRegistry
+        model_registry = ModelRegistry(
+            default_path=os.getenv("MODEL_DIR", "."),
+            versions_dir=os.getenv("MODEL_VERSIONS_DIR", "model_versions")
+        )
+        print(f"✅ Models loaded: version {model_registry.load_initial().version}")
+
+    done = set() if args.restart else load_checkpoint(args.output)
+    if done:
+        print(f"🔁 Resuming: {len(done)} reports already extracted in {args.output}")
+
+    with open(args.output, "w" if args.restart else "a", encoding="utf-8") as out:
+        def write_records(records):
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            print(f"💾 {len(records)} results written")
+
+        summary = asyncio.run(run_bulk_extraction(
+            iter_reports(args.source), write_records,
+            model_registry=model_registry,
+            skip_ids=done,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            burst=args.burst,
+            max_attempts=args.max_attempts,
+            score_batch=args.score_batch
+        ))
+
+    print(f"✅ Done: {summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped, "
+          f"{summary['llm_calls']} LLM calls, {summary['retries']} retries "
+          f"in {summary['elapsed_s']} s ({summary['reports_per_s']} reports/s)")
+
+    if args.parquet:
+        try:
+            write_parquet(args.output, args.parquet)
+            print(f"💾 Parquet written to {args.parquet}")
+        except ImportError as e:
+            print(f"⚠️ Parquet output not available ({e}); install pyarrow")
+
+
+if __name__ == "__main__":
+    main()
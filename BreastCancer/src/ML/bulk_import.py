@@ -0,0 +1,278 @@
+"""
+Bulk import of historical consultations from CSV or JSONL.
+
+Streams the input (never loading it whole), validates every row, optionally
+scores rows that carry the 30 features with the fused Softmax/MLP models in
+one vectorized pass per batch, and writes each batch of patients and
+consultations in a single transaction (Repository.save_consultations, see
+storage.py; STORAGE_BACKEND selects MySQL or the embedded SQLite database).
+
+    python bulk_import.py consultations.csv
+    python bulk_import.py history.jsonl --score --batch-size 2000 --rejects rejects.jsonl
+    cat history.jsonl | python bulk_import.py - --format jsonl
+
+Columns / keys are the /save_consultation fields (patient_id, patient_name,
+patient_age, doctor_id, description, prediction_status, risk_level,
+confidence, image_path) plus an optional `date` (ISO) and, for scoring, the
+30 feature columns (or a JSONL "features" object). With scoring on, missing
+prediction_status / confidence are filled from the Softmax model and a
+missing risk_level from the MLP, as the web form does.
+
+Every row gets a write_id derived from its content (or its own `write_id`
+column), so importing the same file twice does not duplicate consultations.
+Invalid rows are rejected individually with their line number; the rest of
+their batch is still imported.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+import storage
+from consultation_store import InvalidConsultation, commit_isolating_rejects, validate_consultation
+from scoring import feature_cols, features_to_matrix, mlp_prediction, softmax_prediction
+
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Rejects listed in the summary (all of them are counted)
+MAX_REPORTED_REJECTS = int(os.getenv("IMPORT_MAX_REPORTED_REJECTS", "1000"))
+
+
+def detect_format(name="", declared=None):
+    """Input format ("csv" or "jsonl") from an explicit format / MIME type, else the file extension."""
+    declared = (declared or "").lower()
+    if "csv" in declared:
+        return "csv"
+    if "json" in declared:
+        return "jsonl"
+    return "csv" if name.lower().endswith(".csv") else "jsonl"
+
+
+def iter_text_lines(binary_lines):
+    """Decode an iterable of UTF-8 byte lines (file, upload or request stream), dropping a BOM."""
+    for i, line in enumerate(binary_lines):
+        yield line.decode("utf-8-sig" if i == 0 else "utf-8")
+
+
+def iter_rows(lines, fmt):
+    """
+    Yield (line_no, row, error) for every record of a CSV or JSONL text stream.
+
+    `row` is a dict, or None with `error` set when the line cannot be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, f"Expected {len(reader.fieldnames)} fields, got more"
+                continue
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Expected a JSON object"
+            continue
+        yield line_no, row, None
+
+
+def row_features(row):
+    """
+    The features present in a row (a "features" object or flat feature columns), as floats.
+
+    Raises:
+        InvalidConsultation: If a feature value is not numeric
+    """
+    source = row.get("features") if isinstance(row.get("features"), dict) else row
+    features = {}
+    for col in feature_cols:
+        value = source.get(col)
+        if value is None or value == "":
+            continue
+        try:
+            features[col] = float(value)
+        except (TypeError, ValueError):
+            raise InvalidConsultation(f"Feature {col} must be a number")
+    return features
+
+
+def import_write_id(row):
+    """Idempotency key of an imported row: its own write_id, else a hash of its content."""
+    if row.get("write_id"):
+        return str(row["write_id"])
+    canonical = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def score_batch(items, model_registry):
+    """
+    Score the records that carry features, one forward pass per model, filling missing prediction fields.
+
+    Args:
+        items: List of (record, features) pairs
+
+    Returns:
+        Number of records scored
+    """
+    items = [(record, features) for record, features in items if features]
+    if not items or model_registry is None:
+        return 0
+    models = model_registry.current()
+    X = features_to_matrix([features for _, features in items])
+    softmax_proba = models.softmax.predict_proba(X)
+    mlp_proba = models.mlp.predict_proba(X)
+    for k, (record, _) in enumerate(items):
+        softmax = softmax_prediction(softmax_proba[k])
+        mlp = mlp_prediction(mlp_proba[k])
+        if record["prediction_status"] in (None, ""):
+            record["prediction_status"] = softmax["diagnosis"]
+        if record["confidence"] is None:
+            record["confidence"] = softmax["confidence"]
+        if record["risk_level"] in (None, ""):
+            record["risk_level"] = mlp["risk_level_en"]
+    return len(items)
+
+
+def run_import(rows, save, model_registry=None, batch_size=BATCH_SIZE, on_batch=None, on_reject=None,
+               doctor_id=None):
+    """
+    Import an iterable of rows from iter_rows().
+
+    Args:
+        rows: Iterable of (line_no, row, error); consumed lazily
+        save: Repository.save_consultations (one call, one transaction per batch)
+        model_registry: ModelRegistry used to score rows with features (None = no scoring)
+        batch_size: Rows per transaction
+        on_batch: Called with the running summary after each batch
+        on_reject: Called with every reject dict (the summary lists only the first ones)
+        doctor_id: Import on behalf of this doctor: rows without doctor_id get it,
+            rows with another one are rejected (None = keep every row's own)
+
+    Returns:
+        Summary dict: rows, imported, rejected, scored, batches, elapsed_s, rows_per_s
+        and rejects (line, patient_id, error; at most MAX_REPORTED_REJECTS)
+
+    Raises:
+        StorageError: If the database fails for another reason than rejected data
+    """
+    summary = {"rows": 0, "imported": 0, "rejected": 0, "scored": 0, "batches": 0, "rejects": []}
+    started = time.perf_counter()
+
+    def reject(line_no, row, error):
+        item = {"line": line_no, "patient_id": (row or {}).get("patient_id"), "error": error}
+        summary["rejected"] += 1
+        if len(summary["rejects"]) < MAX_REPORTED_REJECTS:
+            summary["rejects"].append(item)
+        if on_reject is not None:
+            on_reject(item)
+
+    def flush(batch):
+        # batch: list of (line_no, row, record, features)
+        summary["scored"] += score_batch([(record, features) for _, _, record, features in batch], model_registry)
+        rejects = commit_isolating_rejects(save, [record for _, _, record, _ in batch])
+        for i, error in rejects.items():
+            line_no, row, _, _ = batch[i]
+            reject(line_no, row, f"Rejected by the database: {error}")
+        summary["imported"] += len(batch) - len(rejects)
+        summary["batches"] += 1
+        _update_rate(summary, started)
+        if on_batch is not None:
+            on_batch(summary)
+
+    batch = []
+    for line_no, row, error in rows:
+        summary["rows"] += 1
+        if error is not None:
+            reject(line_no, row, error)
+            continue
+        if doctor_id is not None and row.get("doctor_id") in (None, ""):
+            # Before the write_id is derived: the same file imported by two doctors is two sets of rows
+            row = {**row, "doctor_id": doctor_id}
+        try:
+            features = row_features(row)
+            record = validate_consultation(row, image_path=row.get("image_path") or None,
+                                           date=row.get("date"), write_id=import_write_id(row))
+        except InvalidConsultation as e:
+            reject(line_no, row, str(e))
+            continue
+        if doctor_id is not None and record["doctor_id"] != doctor_id:
+            reject(line_no, row, "doctor_id does not match the authenticated doctor")
+            continue
+        batch.append((line_no, row, record, features))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    _update_rate(summary, started)
+    return summary
+
+
+def _update_rate(summary, started):
+    elapsed = time.perf_counter() - started
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["rows_per_s"] = round(summary["rows"] / elapsed, 1) if elapsed > 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import of historical consultations")
+    parser.add_argument("source", help="CSV or JSONL file, or '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per transaction")
+    parser.add_argument("--score", action="store_true", help="Fill missing predictions of rows with features from the models")
+    parser.add_argument("--rejects", help="Write every rejected row (line, error) to this JSONL file")
+    args = parser.parse_args()
+
+    model_registry = None
+    if args.score:
+        from model_registry import ModelRegistry
+        model_registry = ModelRegistry(
+            default_path=os.getenv("MODEL_DIR", "."),
+            versions_dir=os.getenv("MODEL_VERSIONS_DIR", "model_versions")
+        )
+        print(f"✅ Models loaded: version {model_registry.load_initial().version}")
+
+    repo = storage.get_repository()
+    fmt = args.format or detect_format("" if args.source == "-" else args.source)
+    stream = sys.stdin.buffer if args.source == "-" else open(args.source, "rb")
+    rejects_out = open(args.rejects, "w", encoding="utf-8") if args.rejects else None
+
+    def on_batch(summary):
+        print(f"💾 {summary['imported']} imported, {summary['rejected']} rejected "
+              f"({summary['rows_per_s']} rows/s)")
+
+    def on_reject(item):
+        if rejects_out is not None:
+            rejects_out.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    try:
+        summary = run_import(iter_rows(iter_text_lines(stream), fmt), repo.save_consultations,
+                             model_registry=model_registry, batch_size=args.batch_size,
+                             on_batch=on_batch, on_reject=on_reject)
+    except storage.StorageError as err:
+        print(f"❌ Database Error: {err}")
+        sys.exit(1)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+        if rejects_out is not None:
+            rejects_out.close()
+
+    print(f"✅ Done: {summary['imported']} of {summary['rows']} rows imported, {summary['rejected']} rejected, "
+          f"{summary['scored']} scored in {summary['elapsed_s']} s ({summary['rows_per_s']} rows/s)")
+    for item in summary["rejects"][:20]:
+        print(f"   ⚠️ line {item['line']}: {item['error']}")
+
+
+if __name__ == "__main__":
+    main()
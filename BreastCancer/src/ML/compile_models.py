@@ -0,0 +1,199 @@
+"""
+Compile the scalers and models into fused NumPy kernels for serving.
+
+    python compile_models.py                                  # in place (default version)
+    python compile_models.py --version 20260101-120000        # new version in model_versions/
+    python compile_models.py --version 20260101-120000 --activate
+
+Folds scaler_dso2 into the SoftmaxRegression linear layer and scaler_dso3
+into the first layer of the MLP, exports float32 kernels loaded by
+fused_models.py, and checks them against the original torch/sklearn
+probabilities. Run it again after regenerate_models.py.
+
+Each kernel is written as a directory of uncompressed .npy arrays so the
+serving workers can memory-map (and share) the weights. The
+logistic_regression_pipeline.joblib bundle (RobustScaler + LogisticRegression)
+is compiled the same way, and a manifest.json with the version name and file
+checksums is written for the model registry (see model_registry.py).
+"""
+import argparse
+import os
+import shutil
+import sys
+import numpy as np
+import joblib
+import torch
+import torch.nn as nn
+from sklearn.datasets import load_breast_cancer
+
+from fused_models import load_fused_model, save_fused_model
+from model_registry import SOFTMAX_KERNEL, MLP_KERNEL, LOGISTIC_KERNEL, ModelRegistry, write_manifest
+
+SOURCE_FILES = [
+    'scaler_dso2.joblib', 'scaler_dso3.joblib', 'softmax_regression_dso2.pth',
+    'mlp_perfect_dso3_model.joblib', 'logistic_regression_pipeline.joblib',
+]
+
+# Maximum absolute difference allowed between original and fused probabilities
+TOLERANCE = 1e-5
+
+
+# Define Softmax Regression Model Class
+class SoftmaxRegression(nn.Module):
+    def __init__(self, input_dim, output_dim):
+        super(SoftmaxRegression, self).__init__()
+        self.linear = nn.Linear(input_dim, output_dim)
+
+    def forward(self, x):
+        return self.linear(x)
+
+
+def load_original_models():
+    """Load the scalers and models exactly as the legacy serving code did."""
+    # Monkey-patch numpy.random to handle old pickle format
+    import numpy.random
+    if not hasattr(numpy.random, '__RandomState_ctor'):
+        numpy.random.__RandomState_ctor = numpy.random.RandomState
+
+    # Try to use sklearn's joblib if available, otherwise use standard joblib
+    try:
+        from sklearn.externals import joblib as sk_joblib
+        loader = sk_joblib
+    except ImportError:
+        loader = joblib
+
+    scaler_dso2 = loader.load('scaler_dso2.joblib')
+    scaler_dso3 = loader.load('scaler_dso3.joblib')
+
+    softmax_model = SoftmaxRegression(input_dim=30, output_dim=2)
+    softmax_model.load_state_dict(torch.load('softmax_regression_dso2.pth', map_location=torch.device('cpu'), weights_only=False))
+    softmax_model.eval()
+
+    mlp_dso3 = loader.load('mlp_perfect_dso3_model.joblib')
+    logistic_pipeline = loader.load('logistic_regression_pipeline.joblib')
+    return scaler_dso2, scaler_dso3, softmax_model, mlp_dso3, logistic_pipeline
+
+
+def scaler_affine(scaler, n_features):
+    """Return (mean, scale) so that scaler.transform(x) == (x - mean) / scale."""
+    # StandardScaler exposes mean_, RobustScaler center_
+    mean = getattr(scaler, 'mean_', getattr(scaler, 'center_', None))
+    scale = getattr(scaler, 'scale_', None)
+    mean = mean if mean is not None else np.zeros(n_features)
+    scale = scale if scale is not None else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def fold_affine(mean, scale, W, b):
+    """
+    Fold (x - mean) / scale into x @ W + b.
+
+    Returns:
+        (W', b') with x @ W' + b' == ((x - mean) / scale) @ W + b
+    """
+    W_fused = W / scale[:, None]
+    b_fused = b - (mean / scale) @ W
+    return W_fused, b_fused
+
+
+def compile_softmax(scaler, model, output):
+    W = model.linear.weight.detach().double().numpy().T    # (30, 2)
+    b = model.linear.bias.detach().double().numpy()
+    mean, scale = scaler_affine(scaler, W.shape[0])
+    W_fused, b_fused = fold_affine(mean, scale, W, b)
+    save_fused_model(output, 'softmax',
+                     {'weight': W_fused.astype(np.float32), 'bias': b_fused.astype(np.float32)})
+    print(f"✅ {output} saved")
+
+
+def compile_mlp(scaler, mlp, output):
+    weights = [np.asarray(W, dtype=np.float64) for W in mlp.coefs_]
+    biases = [np.asarray(b, dtype=np.float64) for b in mlp.intercepts_]
+    mean, scale = scaler_affine(scaler, weights[0].shape[0])
+    weights[0], biases[0] = fold_affine(mean, scale, weights[0], biases[0])
+
+    arrays = {}
+    for i, (W, b) in enumerate(zip(weights, biases)):
+        arrays[f'W{i}'] = W.astype(np.float32)
+        arrays[f'b{i}'] = b.astype(np.float32)
+    save_fused_model(output, 'mlp', arrays, n_layers=len(weights),
+                     hidden_activation=mlp.activation, out_activation=mlp.out_activation_)
+    print(f"✅ {output} saved ({len(weights)} layers)")
+
+
+def compile_logistic(pipeline, output):
+    scaler, model = pipeline['scaler'], pipeline['model']
+    W = np.asarray(model.coef_, dtype=np.float64).T    # (30, 1)
+    b = np.asarray(model.intercept_, dtype=np.float64)
+    mean, scale = scaler_affine(scaler, W.shape[0])
+    W_fused, b_fused = fold_affine(mean, scale, W, b)
+    save_fused_model(output, 'logistic', {'W0': W_fused.astype(np.float32), 'b0': b_fused.astype(np.float32)},
+                     n_layers=1, out_activation='logistic')
+    print(f"✅ {output} saved")
+
+
+def verification_inputs():
+    """Wisconsin dataset rows plus random perturbations around them."""
+    X = load_breast_cancer().data
+    rng = np.random.default_rng(0)
+    noisy = X * rng.uniform(0.5, 1.5, size=X.shape)
+    return np.vstack([X, noisy]).astype(np.float32)
+
+
+def verify(name, expected, fused_path, X):
+    actual = load_fused_model(fused_path).predict_proba(X)
+    max_diff = float(np.max(np.abs(actual - expected)))
+    agree = float(np.mean(np.argmax(actual, axis=1) == np.argmax(expected, axis=1)))
+    status = "✅" if max_diff <= TOLERANCE else "❌"
+    print(f"{status} {name}: max |Δp| = {max_diff:.2e}, class agreement = {agree * 100:.2f}% on {len(X)} rows")
+    return max_diff <= TOLERANCE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile fused serving kernels")
+    parser.add_argument('--version', help="Write a new version to model_versions/<version> instead of in place")
+    parser.add_argument('--versions-dir', default='model_versions')
+    parser.add_argument('--activate', action='store_true', help="Point model_versions/CURRENT at the new version")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(args.versions_dir, args.version) if args.version else '.'
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("Loading original models...")
+    scaler_dso2, scaler_dso3, softmax_model, mlp_dso3, logistic_pipeline = load_original_models()
+
+    print(f"\nCompiling fused kernels into '{output_dir}'...")
+    softmax_output = os.path.join(output_dir, SOFTMAX_KERNEL)
+    mlp_output = os.path.join(output_dir, MLP_KERNEL)
+    logistic_output = os.path.join(output_dir, LOGISTIC_KERNEL)
+    compile_softmax(scaler_dso2, softmax_model, softmax_output)
+    compile_mlp(scaler_dso3, mlp_dso3, mlp_output)
+    compile_logistic(logistic_pipeline, logistic_output)
+
+    print("\nVerifying against original models...")
+    X = verification_inputs()
+    with torch.no_grad():
+        logits = softmax_model(torch.tensor(scaler_dso2.transform(X), dtype=torch.float32))
+        expected_softmax = torch.softmax(logits, dim=1).numpy()
+    expected_mlp = mlp_dso3.predict_proba(scaler_dso3.transform(X))
+    expected_logistic = logistic_pipeline['model'].predict_proba(logistic_pipeline['scaler'].transform(X))
+
+    ok = verify("Softmax (DSO2)", expected_softmax, softmax_output, X)
+    ok = verify("MLP (DSO3)", expected_mlp, mlp_output, X) and ok
+    ok = verify("Logistic Regression", expected_logistic, logistic_output, X) and ok
+
+    if not ok:
+        print(f"\n❌ Fused kernels differ from the original models by more than {TOLERANCE}")
+        sys.exit(1)
+
+    # Keep the source artifacts next to a versioned build so the set is self-contained
+    if output_dir != '.':
+        for name in SOURCE_FILES:
+            shutil.copy2(name, os.path.join(output_dir, name))
+    manifest = write_manifest(output_dir, args.version, SOURCE_FILES)
+    print(f"\n📦 Model version {manifest['version']} (checksum {manifest['checksum'][:12]})")
+
+    if args.activate and args.version:
+        ModelRegistry(versions_dir=args.versions_dir).activate(args.version)
+        print(f"🔄 {args.versions_dir}/CURRENT -> {args.version} (workers will hot-reload)")
+    print("\n✅ All models compiled successfully!")
@@ -0,0 +1,40 @@
+"""
+Shared pytest setup for the unit tests in this directory.
+
+app.py configures itself at import: the defaults below keep it off MySQL
+and away from the working directory when a test imports it.
+"""
+import os
+import tempfile
+
+_work_dir = tempfile.mkdtemp(prefix="test_ml_")
+os.environ.setdefault("AUTH_ENABLED", "0")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(_work_dir, "db.sqlite3"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_work_dir, "uploads"))
+os.environ.setdefault("JOB_DB_PATH", os.path.join(_work_dir, "jobs.sqlite3"))
+os.environ.setdefault("EXTRACTION_CACHE_PATH", os.path.join(_work_dir, "extraction_cache.sqlite3"))
+
+import pytest  # noqa: E402
+
+from consultation_store import validate_consultation  # noqa: E402
+from sqlite_storage import SQLiteRepository  # noqa: E402
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """An empty, fully migrated embedded repository."""
+    repo = SQLiteRepository(str(tmp_path / "db.sqlite3"))
+    repo.migrate()
+    return repo
+
+
+def _consultation(patient_id="P1", date=None, **fields):
+    return validate_consultation({"patient_id": patient_id, "patient_name": "Dupont", "patient_age": "54", **fields},
+                                 date=date)
+
+
+@pytest.fixture
+def consultation():
+    """Factory of valid consultation records: consultation(patient_id, date=None, **fields)."""
+    return _consultation
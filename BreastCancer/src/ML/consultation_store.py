@@ -0,0 +1,363 @@
+"""
+Consultation persistence: validation, batched saves and an optional write-behind queue.
+
+Validated consultations are stored in batches by the storage repository
+(Repository.save_consultations, see storage.py): one transaction and a
+fixed number of statements per batch, however large.
+
+In write-behind mode (WriteBehindQueue) /save_consultation only validates
+the consultation and appends it to a local SQLite queue (WAL mode, fsynced at
+every commit: survives a crash of the worker or of the host), then answers. A background drainer moves queued
+consultations into the database in batches and deletes them once committed:
+
+    request -> validate -> queue (SQLite) -> drainer -> database (batched) -> delete from queue
+
+Every consultation carries a write_id stored in a UNIQUE column, so replaying
+a batch whose commit succeeded but whose queue deletion did not (crash in
+between) inserts nothing twice. Only one process drains at a time (a lease row
+in the queue database). Rows the database rejects as invalid are moved to a
+`failed` table instead of blocking the queue.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from storage import RejectedData
+
+
+class InvalidConsultation(ValueError):
+    """The submitted consultation cannot be stored."""
+
+
+# Column sizes of the consultation/patient tables: rejected up front, since
+# write-behind saves cannot report a database error to the client
+_MAX_LENGTHS = {"write_id": 32, "patient_id": 50, "patient_name": 100, "prediction_status": 20, "risk_level": 20,
+                "image_path": 255}
+
+
+_TYPE_NAMES = {int: "an integer", float: "a number"}
+
+
+def _optional(value, cast, field):
+    if value is None or value == "":
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise InvalidConsultation(f"{field} must be {_TYPE_NAMES[cast]}")
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise InvalidConsultation(f"date must be an ISO date or datetime, got {value!r}")
+
+
+def validate_consultation(data, image_path=None, date=None, write_id=None):
+    """
+    Normalize a /save_consultation form or JSON body into a consultation record.
+
+    Args:
+        data: Form or JSON fields
+        image_path: Stored upload, if any
+        date: Consultation date for imported history (default: now)
+        write_id: Idempotency key (default: a new random id)
+
+    Returns:
+        dict ready for Repository.save_consultations / WriteBehindQueue.enqueue (JSON-serializable)
+
+    Raises:
+        InvalidConsultation: If a required field is missing or a value has the wrong type or size
+    """
+    record = {
+        "write_id": write_id or uuid.uuid4().hex,
+        "doctor_id": _optional(data.get("doctor_id"), int, "doctor_id"),
+        "patient_id": (data.get("patient_id") or "").strip(),
+        "patient_name": (data.get("patient_name") or "").strip(),
+        "patient_age": _optional(data.get("patient_age"), int, "patient_age"),
+        "description": data.get("description"),
+        "image_path": image_path,
+        "prediction_status": data.get("prediction_status"),
+        "risk_level": data.get("risk_level"),
+        "confidence": _optional(data.get("confidence"), float, "confidence"),
+        # Time of the save, not of the (possibly later) database write
+        "date": (_parse_date(date) if date else datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    for field in ("patient_id", "patient_name", "patient_age"):
+        if record[field] in (None, ""):
+            raise InvalidConsultation(f"{field} is required")
+    for field, max_length in _MAX_LENGTHS.items():
+        if record[field] is not None and len(str(record[field])) > max_length:
+            raise InvalidConsultation(f"{field} is longer than {max_length} characters")
+    return record
+
+
+# =====================
+# Batched writes
+# =====================
+def commit_isolating_rejects(save, records):
+    """
+    Save records as one batch; if the database rejects the batch, save them one by one to isolate the bad rows.
+
+    Args:
+        save: Repository.save_consultations (or any callable with its contract)
+        records: Records from validate_consultation
+
+    Returns:
+        dict mapping the index of each rejected record to the database error
+
+    Raises:
+        StorageError: For failures other than rejected data (e.g. database unreachable)
+    """
+    try:
+        save(records)
+        return {}
+    except RejectedData:
+        pass
+    rejects = {}
+    for i, record in enumerate(records):
+        try:
+            save([record])
+        except RejectedData as e:
+            rejects[i] = str(e)
+    return rejects
+
+
+# =====================
+# Write-behind queue
+# =====================
+
+
+class WriteBehindQueue:
+    """
+    Durable local queue of consultations drained into the database by a background thread.
+
+    Args:
+        path: SQLite queue file
+        save: Callable storing a batch of records in one transaction (Repository.save_consultations)
+        batch_size: Consultations written per database transaction
+        poll_interval: Seconds between checks for consultations queued by other workers
+        lease_ttl: Seconds a drainer keeps the drain lease without renewing it
+    """
+
+    LEASE_NAME = "drainer"
+
+    def __init__(self, path, save, batch_size=200, poll_interval=0.05, lease_ttl=10.0):
+        self.path = path
+        self.save = save
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._pid = None
+        self.enqueued = 0
+        self.drained = 0
+        self.batches = 0
+        self.dead = 0
+        self.errors = 0
+        self.last_error = None
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    write_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS failed (
+                    seq INTEGER PRIMARY KEY,
+                    write_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    error TEXT,
+                    failed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS drain_lease (
+                    name TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: fsync at every commit. An acknowledged (202) save must survive a power loss,
+            # which NORMAL does not guarantee in WAL mode
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------- Producer ----------
+    def enqueue(self, record):
+        """Append a validated consultation; it is written to the database by the drainer."""
+        self._connect().execute(
+            "INSERT INTO pending (write_id, payload, enqueued_at) VALUES (?, ?, ?)",
+            (record["write_id"], json.dumps(record, ensure_ascii=False), time.time())
+        )
+        with self._lock:
+            self.enqueued += 1
+        self.ensure_started()
+        self._wake.set()
+
+    # ---------- Drainer ----------
+    def ensure_started(self):
+        """Start this process's drainer thread (threads do not survive fork). Replays anything left queued."""
+        with self._lock:
+            if self._pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+                return
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            self._worker = threading.Thread(target=self._run, name="consultation-drainer", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        failures = 0
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                while self.drain_once():
+                    pass
+                failures = 0
+            except Exception as e:
+                # Database down, pool exhausted...: keep the queue and retry with backoff
+                failures += 1
+                delay = min(30.0, 0.5 * 2 ** min(failures, 6))
+                print(f"⚠️ Consultation drain failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _acquire_lease(self):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM drain_lease WHERE name = ? AND (expires_at < ? OR pid = ?)",
+                         (self.LEASE_NAME, now, os.getpid()))
+            acquired = conn.execute(
+                "INSERT OR IGNORE INTO drain_lease (name, pid, expires_at) VALUES (?, ?, ?)",
+                (self.LEASE_NAME, os.getpid(), now + self.lease_ttl)
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def drain_once(self):
+        """
+        Write the oldest batch of queued consultations to the database.
+
+        Returns:
+            Number of queued consultations handled (0 if the queue is empty or another process drains it)
+        """
+        with self._drain_lock:
+            if not self._acquire_lease():
+                return 0
+            queue = self._connect()
+            rows = queue.execute(
+                "SELECT seq, write_id, payload FROM pending ORDER BY seq LIMIT ?", (self.batch_size,)
+            ).fetchall()
+            if not rows:
+                return 0
+            try:
+                rejects = commit_isolating_rejects(self.save, [json.loads(payload) for _, _, payload in rows])
+            except Exception as e:
+                self._record_error(rows, e)
+                raise
+            for i, error in rejects.items():
+                self._move_to_failed(rows[i], error)
+            self._delete([row for i, row in enumerate(rows) if i not in rejects])
+            with self._lock:
+                self.batches += 1
+            return len(rows)
+
+    def _move_to_failed(self, row, error):
+        seq, write_id, payload = row
+        print(f"❌ Consultation {write_id} rejected by the database, moved to failed: {error}")
+        queue = self._connect()
+        queue.execute("BEGIN IMMEDIATE")
+        queue.execute("INSERT OR REPLACE INTO failed (seq, write_id, payload, error, failed_at) VALUES (?, ?, ?, ?, ?)",
+                      (seq, write_id, payload, error, time.time()))
+        queue.execute("DELETE FROM pending WHERE seq = ?", (seq,))
+        queue.execute("COMMIT")
+        with self._lock:
+            self.dead += 1
+
+    def _delete(self, rows):
+        if not rows:
+            return
+        seqs = [seq for seq, _, _ in rows]
+        self._connect().execute(f"DELETE FROM pending WHERE seq IN ({', '.join(['?'] * len(seqs))})", seqs)
+        with self._lock:
+            self.drained += len(rows)
+
+    def _record_error(self, rows, error):
+        message = f"{type(error).__name__}: {error}"
+        seqs = [seq for seq, _, _ in rows]
+        self._connect().execute(
+            f"UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE seq IN ({', '.join(['?'] * len(seqs))})",
+            [message, *seqs]
+        )
+        with self._lock:
+            self.errors += 1
+            self.last_error = message
+
+    def flush(self, timeout=10.0):
+        """
+        Drain synchronously until the queue is empty (tests, shutdown).
+
+        Returns:
+            True if the queue is empty
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.drain_once() and self.pending() == 0:
+                return True
+            time.sleep(0)
+        return self.pending() == 0
+
+    def pending(self):
+        return self._connect().execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def stats(self):
+        conn = self._connect()
+        pending, oldest, max_attempts = conn.execute(
+            "SELECT COUNT(*), MIN(enqueued_at), MAX(attempts) FROM pending"
+        ).fetchone()
+        failed = conn.execute("SELECT COUNT(*) FROM failed").fetchone()[0]
+        lease = conn.execute("SELECT pid, expires_at FROM drain_lease WHERE name = ?", (self.LEASE_NAME,)).fetchone()
+        return {
+            "path": self.path,
+            "batch_size": self.batch_size,
+            "pending": pending,
+            "oldest_pending_s": round(time.time() - oldest, 3) if oldest is not None else None,
+            "max_attempts": max_attempts or 0,
+            "failed": failed,
+            "drainer_pid": lease[0] if lease and lease[1] > time.time() else None,
+            # Counters of this process
+            "enqueued": self.enqueued,
+            "drained": self.drained,
+            "batches": self.batches,
+            "dead": self.dead,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
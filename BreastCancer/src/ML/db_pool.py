@@ -0,0 +1,239 @@
+"""
+Bounded MySQL connection pool for the Flask endpoints.
+
+Each worker process keeps up to `size` open connections and hands them out
+to request threads instead of connecting to MySQL on every request:
+
+- checkout validates a connection that sat idle for a while (ping) and
+  replaces connections older than max_lifetime, so a MySQL restart or
+  wait_timeout never surfaces as a failed request;
+- when every connection is busy, callers wait at most max_wait_ms, and at
+  most max_waiters callers wait at once; beyond that checkout raises
+  PoolExhausted (served as HTTP 503) instead of piling up requests.
+
+Connections are handed out wrapped: close() returns them to the pool (after
+rolling back an unfinished transaction) rather than closing the socket, so
+endpoint code keeps the usual connect / cursor / close pattern.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from batching import Histogram
+
+
+class PoolExhausted(RuntimeError):
+    """No connection became free within the wait budget, or too many callers are already waiting."""
+
+
+class PooledConnection:
+    """A checked-out connection; close() gives it back to its pool."""
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+        self._checked_out_at = time.monotonic()
+
+    def __getattr__(self, name):
+        # Everything else (cursor, commit, rollback, ...) goes to the real connection
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(conn, self._created_at, self._checked_out_at)
+
+
+class ConnectionPool:
+    """
+    Per-process pool of MySQL connections.
+
+    Args:
+        name: Label used in stats
+        connect_kwargs: Arguments for mysql.connector.connect
+        size: Maximum open connections in this process
+        max_lifetime: Connections older than this (seconds) are closed and replaced
+        max_wait_ms: Longest a checkout waits for a free connection
+        max_waiters: Callers allowed to wait at once; more fail immediately
+        validate_after: Ping connections idle for longer than this (seconds) before handing them out
+    """
+
+    WAIT_BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+    def __init__(self, name, connect_kwargs, size=8, max_lifetime=1800.0, max_wait_ms=2000.0,
+                 max_waiters=16, validate_after=5.0):
+        self.name = name
+        self.connect_kwargs = dict(connect_kwargs)
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_waiters = max_waiters
+        self.validate_after = validate_after
+        self._cond = threading.Condition()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        # Sockets inherited across fork() belong to the parent: drop them without closing
+        self._pid = os.getpid()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.created = 0
+        self.recycled = 0
+        self.broken = 0
+        self.max_in_use = 0
+        self.wait_hist = Histogram(self.WAIT_BUCKETS_MS)
+        self.hold_hist = Histogram(self.WAIT_BUCKETS_MS)
+
+    # ---------- Checkout ----------
+    def connection(self):
+        """
+        Check out a connection.
+
+        Returns:
+            PooledConnection; call close() to return it
+
+        Raises:
+            PoolExhausted: If no connection is free within max_wait_ms
+            mysql.connector.Error: If a new connection cannot be opened
+        """
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset()
+            entry = self._take(deadline)
+            self._in_use += 1
+            self.checkouts += 1
+            self.max_in_use = max(self.max_in_use, self._in_use)
+        self.wait_hist.observe((time.monotonic() - start) * 1000.0)
+
+        try:
+            conn, created_at = self._validated(entry)
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, conn, created_at)
+
+    def _take(self, deadline):
+        """Reserve an idle connection or a slot for a new one (None); called with the lock held."""
+        if not self._idle and self._open >= self.size and self._waiters >= self.max_waiters:
+            self.rejected += 1
+            raise PoolExhausted(f"{self.name}: {self._waiters} requests already waiting for a connection")
+        self._waiters += 1
+        try:
+            while True:
+                if self._idle:
+                    return self._idle.pop()  # most recently used: least likely to have timed out
+                if self._open < self.size:
+                    self._open += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolExhausted(f"{self.name}: no connection free after {self.max_wait * 1000.0:.0f} ms")
+                self._cond.wait(remaining)
+        finally:
+            self._waiters -= 1
+
+    def _validated(self, entry):
+        """A usable (conn, created_at) from a reserved idle entry, or a new connection."""
+        if entry is not None:
+            conn, created_at, last_used = entry
+            now = time.monotonic()
+            if now - created_at > self.max_lifetime:
+                self.recycled += 1
+                self._close_quietly(conn)
+            elif now - last_used <= self.validate_after or self._ping(conn):
+                return conn, created_at
+            else:
+                self.broken += 1
+                self._close_quietly(conn)
+        conn = self._connect()
+        self.created += 1
+        return conn, time.monotonic()
+
+    def _connect(self):
+        # The driver is only needed once a connection is opened (not by the SQLite backend)
+        import mysql.connector
+        return mysql.connector.connect(**self.connect_kwargs)
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ---------- Return ----------
+    def _release(self, conn, created_at, checked_out_at):
+        now = time.monotonic()
+        self.hold_hist.observe((now - checked_out_at) * 1000.0)
+        keep = os.getpid() == self._pid and now - created_at <= self.max_lifetime
+        if keep:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()  # an endpoint failed before commit: never hand out its transaction
+            except Exception:
+                self.broken += 1
+                keep = False
+        if not keep:
+            self._close_quietly(conn)
+        with self._cond:
+            if os.getpid() != self._pid:
+                return
+            self._in_use -= 1
+            if keep:
+                self._idle.append((conn, created_at, now))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset()
+            return {
+                "name": self.name,
+                "pid": self._pid,
+                "size": self.size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiters,
+                "utilization": self._in_use / self.size if self.size else 0.0,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "broken": self.broken,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_waiters": self.max_waiters,
+                "max_lifetime_s": self.max_lifetime,
+                "wait_ms": self.wait_hist.snapshot(),
+                "hold_ms": self.hold_hist.snapshot(),
+            }
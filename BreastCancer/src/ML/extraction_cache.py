@@ -0,0 +1,194 @@
+"""
+Persistent content-addressed cache for LLM feature extraction.
+
+Entries are keyed by a hash of the normalized report text, the prompt
+version and the backend pool's signature (models and request options, see
+llm_backends.py), and stored in a local SQLite database (WAL
+mode, shared by all gunicorn workers). The cache is bounded in size with
+least-recently-used eviction and entries expire after a TTL.
+
+The same database holds short-lived claims on keys being extracted, so a
+worker that misses the cache while another worker is already calling the
+LLM for the same report waits for that result instead of paying twice.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalize_report_text(text):
+    """Canonical form of a report: Unicode NFC, collapsed whitespace, trimmed."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def make_cache_key(text, prompt_version, backends):
+    payload = "\x00".join([normalize_report_text(text), prompt_version, backends])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    SQLite-backed LRU + TTL cache of extracted feature dicts.
+
+    Args:
+        path: SQLite database file
+        max_entries: Maximum number of cached reports (LRU eviction beyond it)
+        ttl_seconds: Entries older than this are treated as misses and purged
+    """
+
+    def __init__(self, path="extraction_cache.sqlite3", max_entries=10000, ttl_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.claim_waits = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    key TEXT PRIMARY KEY,
+                    features TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_access ON extraction_cache(last_access)")
+            # In-flight extractions, shared by all workers (see claim / wait_for)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_claims (
+                    key TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, field, n=1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def get(self, key):
+        """Return the cached feature dict for `key`, or None on a miss."""
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT features, created_at FROM extraction_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        features, created_at = row
+        if now - created_at > self.ttl_seconds:
+            conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+            self._count("misses")
+            self._count("evictions")
+            return None
+        conn.execute("UPDATE extraction_cache SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?", (now, key))
+        self._count("hits")
+        return json.loads(features)
+
+    def put(self, key, features, model, prompt_version):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("""
+            INSERT OR REPLACE INTO extraction_cache (key, features, model, prompt_version, created_at, last_access, hit_count)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        """, (key, json.dumps(features, ensure_ascii=False), model, prompt_version, now, now))
+        self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        expired = conn.execute("DELETE FROM extraction_cache WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+        (count,) = conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            conn.execute("""
+                DELETE FROM extraction_cache WHERE key IN (
+                    SELECT key FROM extraction_cache ORDER BY last_access ASC LIMIT ?
+                )
+            """, (overflow,))
+        if expired or overflow:
+            self._count("evictions", expired + overflow)
+
+    # ---------- Cross-worker single flight ----------
+    def claim(self, key, ttl_seconds=60.0):
+        """
+        Mark `key` as being extracted by this process.
+
+        Returns:
+            True if the claim was acquired, False if another live claim exists
+            (claims older than ttl_seconds are considered abandoned and taken over)
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM extraction_claims WHERE key = ? AND expires_at < ?", (key, now))
+            acquired = conn.execute(
+                "INSERT OR IGNORE INTO extraction_claims (key, pid, expires_at) VALUES (?, ?, ?)",
+                (key, os.getpid(), now + ttl_seconds)
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def release(self, key):
+        self._connect().execute("DELETE FROM extraction_claims WHERE key = ? AND pid = ?", (key, os.getpid()))
+
+    def wait_for(self, key, timeout=60.0, poll_interval=0.05):
+        """
+        Wait for another worker's claimed extraction of `key` to land in the cache.
+
+        Returns:
+            The cached features, or None if the claim was released or expired
+            without a result (the caller should then extract itself)
+        """
+        self._count("claim_waits")
+        conn = self._connect()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if conn.execute("SELECT 1 FROM extraction_cache WHERE key = ?", (key,)).fetchone():
+                return self.get(key)
+            claim = conn.execute("SELECT expires_at FROM extraction_claims WHERE key = ?", (key,)).fetchone()
+            if claim is None or claim[0] < time.time():
+                return self.get(key)
+            time.sleep(poll_interval)
+        return None
+
+    def clear(self):
+        self._connect().execute("DELETE FROM extraction_cache")
+
+    def stats(self):
+        (entries,) = self._connect().execute("SELECT COUNT(*) FROM extraction_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "claim_waits": self.claim_waits,
+        }
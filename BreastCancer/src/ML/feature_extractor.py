@@ -1,39 +1,242 @@
 """
-Feature extraction module using Groq AI
+Feature extraction module using Groq AI (with a local rule-based fast path)
 """
 import os
 import json
 import re
-from groq import Groq
-from dotenv import load_dotenv
+import time
+from extraction_cache import ExtractionCache, make_cache_key
+from llm_backends import get_backend_pool
+from llm_client import record_usage, track_call
+from json_stream import JSONObjectStreamParser, parse_json_object
+from singleflight import SingleFlight
+# The 30 breast cancer features, in model input order (defined once in scoring.py)
+from scoring import feature_cols as FEATURE_COLS
 
-# Load environment variables
-load_dotenv()
+MODEL_NAME = "qwen/qwen3-32b"
 
-def extract_features_from_text(input_text: str, api_key: str = None) -> dict:
+# "compact" (default): static system prefix + report as the user message, JSON mode, no reasoning.
+# "legacy": the original single-message prompt, kept selectable for A/B comparison.
+PROMPT_STYLE = os.getenv("EXTRACTION_PROMPT_STYLE", "compact")
+# Bump whenever the prompt or the post-processing changes (invalidates cached extractions)
+PROMPT_VERSIONS = {"legacy": "v1", "compact": "v2"}
+if PROMPT_STYLE not in PROMPT_VERSIONS:
+    raise ValueError(f"EXTRACTION_PROMPT_STYLE must be one of {list(PROMPT_VERSIONS)}, got {PROMPT_STYLE!r}")
+PROMPT_VERSION = PROMPT_VERSIONS[PROMPT_STYLE]
+# 30 "key": number pairs take ~350 tokens; the legacy prompt allowed 2048 (room for reasoning)
+MAX_COMPLETION_TOKENS = int(os.getenv("EXTRACTION_MAX_COMPLETION_TOKENS", "512"))
+
+# Normalize keys (handle potential LLM inconsistencies)
+KEY_MAPPING = {
+    # Mean
+    "mean radius": "radius_mean", "mean texture": "texture_mean", "mean perimeter": "perimeter_mean",
+    "mean area": "area_mean", "mean smoothness": "smoothness_mean", "mean compactness": "compactness_mean",
+    "mean concavity": "concavity_mean", "mean concave points": "concave points_mean", "mean symmetry": "symmetry_mean",
+    "mean fractal dimension": "fractal_dimension_mean",
+    # Error / SE
+    "radius error": "radius_se", "texture error": "texture_se", "perimeter error": "perimeter_se",
+    "area error": "area_se", "smoothness error": "smoothness_se", "compactness error": "compactness_se",
+    "concavity error": "concavity_se", "concave points error": "concave points_se", "symmetry error": "symmetry_se",
+    "fractal dimension error": "fractal_dimension_se",
+    # Worst
+    "worst radius": "radius_worst", "worst texture": "texture_worst", "worst perimeter": "perimeter_worst",
+    "worst area": "area_worst", "worst smoothness": "smoothness_worst", "worst compactness": "compactness_worst",
+    "worst concavity": "concavity_worst", "worst concave points": "concave points_worst", "worst symmetry": "symmetry_worst",
+    "worst fractal dimension": "fractal_dimension_worst",
+}
+
+# Local features below this confidence are left to the LLM
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CONFIDENCE_THRESHOLD", "0.75"))
+
+# A worker waits at most this long for another worker's in-flight extraction of the same report
+EXTRACTION_CLAIM_TTL = float(os.getenv("EXTRACTION_CLAIM_TTL", "60"))
+
+_cache = None
+# Concurrent LLM extractions of the same report (same cache key) within a worker share one call
+extraction_flight = SingleFlight("llm_extraction")
+
+def get_extraction_cache():
+    """Process-wide extraction cache (None when disabled with EXTRACTION_CACHE_ENABLED=0)."""
+    global _cache
+    if _cache is None and os.getenv("EXTRACTION_CACHE_ENABLED", "1") == "1":
+        _cache = ExtractionCache(
+            path=os.getenv("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3"),
+            max_entries=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_HOURS", "720")) * 3600
+        )
+    return _cache
+
+
+# =====================
+# Local rule-based extractor
+# =====================
+# Decimal number with either a point or a French decimal comma ("18,5").
+# "0,006, 0,030" is two numbers because list commas are followed by a space.
+_NUMBER = r"-?\d+(?:[.,]\d+)?"
+_NUMBER_RE = re.compile(r"(?<![\w.,])" + _NUMBER + r"(?![\w]|[.,]\d)")
+
+# French (and English) names of the 10 base measurements. Concave points must
+# come before concavity so "points concaves" is not read as "concavité".
+_BASE_PATTERNS = [
+    ("concave points", r"points?\s+(?:de\s+)?concav(?:es?|it[ée]s?)|concave\s+points?"),
+    ("fractal_dimension", r"dimensions?\s+fractales?|fractal\s+dimensions?"),
+    ("radius", r"rayons?|radius"),
+    ("texture", r"textures?"),
+    ("perimeter", r"p[ée]rim[èe]tres?|perimeters?"),
+    ("area", r"surfaces?|aires?|area"),
+    ("smoothness", r"lissit[ée]s?|smoothness"),
+    ("compactness", r"compacit[ée]s?|compactness"),
+    ("concavity", r"concavit[ée]s?|concavity"),
+    ("symmetry", r"sym[ée]tries?|symmetry"),
+]
+_BASE_RE = re.compile(r"\b(?:" + "|".join(f"(?P<b{i}>{p})" for i, (_, p) in enumerate(_BASE_PATTERNS)) + ")", re.IGNORECASE)
+
+# Which of the three statistics (mean / standard error / worst) a phrase refers to
+_KIND_RE = re.compile(
+    r"(?P<se>[ée]carts?[- ]types?|variabilit[ée]|erreurs?(?:\s+standard)?|standard\s+error)"
+    r"|(?P<worst>maxima(?:l|le|ux|les)|worst|d[ée]favorables?|pires?)"
+    r"|(?P<mean>moyen(?:ne|s|nes)?|\bmean\b)",
+    re.IGNORECASE
+)
+_RESPECTIVELY_RE = re.compile(r"respectivement|respectively", re.IGNORECASE)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.;!?:])\s+")
+
+def _find_kind(text, pos=0, endpos=None):
+    """Return the statistic named first in `text` ("mean", "se", "worst") or None."""
+    match = _KIND_RE.search(text, pos, len(text) if endpos is None else endpos)
+    return match.lastgroup if match else None
+
+def _parse_number(token):
+    return float(token.replace(",", "."))
+
+# Explicit "name : value" pairs, e.g. "radius_mean : 19.8" or "mean radius: 17.99".
+# The separator is matched first and the name is resolved from the words before it,
+# which is much cheaper than one alternation over every alias.
+_SEPARATOR_RE = re.compile(r"[ \t]*[:=][ \t]*(" + _NUMBER + r")(?![\w]|[.,]\d)")
+_TRAILING_WORDS_RE = re.compile(r"[A-Za-z_][A-Za-z_ ]*$")
+
+def _normalize_name(name):
+    return " ".join(name.replace("_", " ").lower().split())
+
+_KEY_VALUE_LOOKUP = {_normalize_name(col): col for col in FEATURE_COLS}
+_KEY_VALUE_LOOKUP.update({_normalize_name(k): v for k, v in KEY_MAPPING.items()})
+
+def _feature_name_before(text, end):
+    """Resolve the feature named by the (up to 4) words right before position `end`."""
+    match = _TRAILING_WORDS_RE.search(text, max(0, end - 48), end)
+    if not match:
+        return None
+    words = _normalize_name(match.group()).split()
+    for n in range(min(4, len(words)), 0, -1):
+        col = _KEY_VALUE_LOOKUP.get(" ".join(words[-n:]))
+        if col:
+            return col
+    return None
+
+def extract_features_locally(input_text: str):
     """
-    Extract 30 breast cancer features from medical report text using Groq AI.
+    Deterministic rule-based extraction for templated reports (no network I/O).
+    
+    Handles explicit "radius_mean : 19.8" / "mean radius: 17.99" pairs and the
+    French prose template ("Le rayon moyen de la masse est estimé à 18,5..."),
+    including French decimal commas, the mean / écart-type / maximal sections
+    and "respectivement" lists.
     
     Args:
         input_text: Medical report text
-        api_key: Groq API key (optional, will use env var if not provided)
     
     Returns:
-        Dictionary with 30 features
+        (features, confidence): both dicts keyed by the 30 features. Unresolved
+        features are None with confidence 0.0.
     """
-    if not api_key:
-        api_key = os.getenv("GROQ_API_KEY")
-    
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found. Check your .env file.")
-    
-    if not input_text or not input_text.strip():
-        raise ValueError("Input text is empty.")
-    
-    client = Groq(api_key=api_key)
-    
-    # Prompt for feature extraction
-    prompt = f"""
+    features = {col: None for col in FEATURE_COLS}
+    confidence = {col: 0.0 for col in FEATURE_COLS}
+
+    def assign(col, value, score):
+        if score > confidence[col] and value >= 0:
+            features[col] = value
+            confidence[col] = score
+
+    # 1. Explicit key/value pairs
+    for match in _SEPARATOR_RE.finditer(input_text):
+        col = _feature_name_before(input_text, match.start())
+        if col:
+            assign(col, _parse_number(match.group(1)), 1.0)
+
+    # 2. Prose, sentence by sentence, with the current section as fallback statistic
+    section_kind = None
+    for line in input_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not _NUMBER_RE.search(line):
+            # Header such as "Variabilité des mesures (écarts-types)"
+            if len(line) <= 80:
+                section_kind = _find_kind(line) or section_kind
+            continue
+
+        for sentence in _SENTENCE_SPLIT_RE.split(line):
+            mentions = [(m.start(), m.end(), _BASE_PATTERNS[int(m.lastgroup[1:])][0]) for m in _BASE_RE.finditer(sentence)]
+            if not mentions:
+                continue
+            numbers = [(m.start(), _parse_number(m.group())) for m in _NUMBER_RE.finditer(sentence)]
+            sentence_kind = _find_kind(sentence) or section_kind
+
+            respectively = _RESPECTIVELY_RE.search(sentence)
+            if respectively:
+                listed = [n for n in numbers if n[0] > respectively.start()] or numbers
+                if len(listed) == len(mentions) and sentence_kind:
+                    for (_, _, base), (_, value) in zip(mentions, listed):
+                        assign(f"{base}_{sentence_kind}", value, 0.8)
+                continue
+
+            for i, (start, end, base) in enumerate(mentions):
+                next_start = mentions[i + 1][0] if i + 1 < len(mentions) else len(sentence)
+                value = next(((pos, v) for pos, v in numbers if end <= pos < next_start), None)
+                if value is None:
+                    continue
+                # A qualifier right after the name ("rayon moyen", "texture maximale") wins
+                kind = _find_kind(sentence, end, value[0]) or sentence_kind
+                if kind:
+                    assign(f"{base}_{kind}", value[1], 0.9)
+
+    return features, confidence
+
+
+# =====================
+# LLM extractor
+# =====================
+# Static instructions: identical bytes on every request, so the provider's prompt cache can reuse them.
+# The report (the only variable part) goes last, in the user message.
+SYSTEM_PROMPT = (
+    "Vous extrayez les mesures d'un rapport médical de tumeur du sein.\n"
+    "Répondez UNIQUEMENT par un objet JSON avec exactement ces 30 clés "
+    "(valeur numérique telle qu'écrite dans le rapport, ou null si absente) :\n"
+    + ", ".join(FEATURE_COLS)
+)
+
+
+def _completion_request(input_text: str) -> dict:
+    """Chat completion arguments for the selected prompt style."""
+    if PROMPT_STYLE == "legacy":
+        return {
+            "messages": [{"role": "user", "content": _build_legacy_prompt(input_text)}],
+            "temperature": 0,
+            "max_completion_tokens": 2048
+        }
+    # reasoning_effort and JSON mode depend on the model: each backend adds its own options (llm_backends.py)
+    return {
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": input_text}
+        ],
+        "temperature": 0,
+        "max_completion_tokens": MAX_COMPLETION_TOKENS
+    }
+
+
+def _build_legacy_prompt(input_text: str) -> str:
+    return f"""
 Vous êtes un expert en extraction de données biomédicales.
 
 Votre UNIQUE sortie doit être un JSON VALIDE contenant EXACTEMENT
@@ -56,92 +259,280 @@ RÈGLE ABSOLUE :
 - JSON UNIQUEMENT
 - AUCUN TEXTE
 """
+
+
+def _normalize_key(key: str) -> str:
+    # Keep as is if no mapping found (or if already correct)
+    return KEY_MAPPING.get(key, key)
+
+
+def _extract_features_with_llm(input_text: str, api_key: str = None):
+    """
+    Call the LLM through the backend pool (weighted, circuit breakers, hedging; see llm_backends.py).
     
-    # Call Groq API
-    response = client.chat.completions.create(
-        model="qwen/qwen3-32b",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0,
-        max_completion_tokens=2048
-    )
-    
-    raw_output = response.choices[0].message.content.strip()
-    
-    # Extract JSON from response
-    def extract_json(text: str) -> dict:
-        """Extract first valid JSON object from text."""
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        if not match:
-            raise ValueError("No JSON object found in model output.")
-        return json.loads(match.group())
-    
-    features = extract_json(raw_output)
-    
-    # Normalize keys (handle potential LLM inconsistencies)
-    key_mapping = {
-        # Mean
-        "mean radius": "radius_mean", "mean texture": "texture_mean", "mean perimeter": "perimeter_mean",
-        "mean area": "area_mean", "mean smoothness": "smoothness_mean", "mean compactness": "compactness_mean",
-        "mean concavity": "concavity_mean", "mean concave points": "concave points_mean", "mean symmetry": "symmetry_mean",
-        "mean fractal dimension": "fractal_dimension_mean",
-        # Error / SE
-        "radius error": "radius_se", "texture error": "texture_se", "perimeter error": "perimeter_se",
-        "area error": "area_se", "smoothness error": "smoothness_se", "compactness error": "compactness_se",
-        "concavity error": "concavity_se", "concave points error": "concave points_se", "symmetry error": "symmetry_se",
-        "fractal dimension error": "fractal_dimension_se",
-        # Worst
-        "worst radius": "radius_worst", "worst texture": "texture_worst", "worst perimeter": "perimeter_worst",
-        "worst area": "area_worst", "worst smoothness": "smoothness_worst", "worst compactness": "compactness_worst",
-        "worst concavity": "concavity_worst", "worst concave points": "concave points_worst", "worst symmetry": "symmetry_worst",
-        "worst fractal dimension": "fractal_dimension_worst",
-    }
+    Args:
+        input_text: Medical report text
+        api_key: Explicit Groq API key (bypasses EXTRACTION_BACKENDS)
+    
+    Returns:
+        (normalized feature dict, call timing from llm_client.track_call plus the backend used)
+    """
+    pool = get_backend_pool(MODEL_NAME, api_key)
+    raw_output, timing = pool.complete(_completion_request(input_text), PROMPT_VERSION)
+    
+    # First JSON object outside the <think> reasoning block
+    features = parse_json_object(raw_output.strip())
+    return {_normalize_key(k): v for k, v in features.items()}, timing
+
+
+def _stream_features_with_llm(input_text: str, api_key: str = None):
+    """
+    Stream the completion from one pool backend and parse the JSON answer as tokens arrive.
+    
+    Yields (feature, value) as soon as each value is complete. The stream is
+    closed as soon as the closing brace is seen, so the remaining tokens are
+    not waited for.
+    
+    Returns (via StopIteration / yield from):
+        (normalized feature dict, call timing with first_token_ms and json_complete_ms added)
+    """
+    served_by = {}
+    chunks = get_backend_pool(MODEL_NAME, api_key).stream(_completion_request(input_text), served_by)
+    parser = JSONObjectStreamParser()
+    
+    with track_call() as timing:
+        start = time.perf_counter()
+        usage = None
+        try:
+            for content, chunk_usage in chunks:
+                # Usage comes with the last chunk, so it is missing if we stop early
+                usage = chunk_usage or usage
+                if not content:
+                    continue
+                if "first_token_ms" not in timing:
+                    timing["first_token_ms"] = (time.perf_counter() - start) * 1000.0
+                for key, value in parser.feed(content):
+                    yield _normalize_key(key), value
+                if parser.done:
+                    timing["json_complete_ms"] = (time.perf_counter() - start) * 1000.0
+                    break
+        finally:
+            chunks.close()
+    record_usage(timing, usage, PROMPT_VERSION)
+    timing.update(served_by, hedged=False)
     
-    normalized_features = {}
-    for k, v in features.items():
-        if k in key_mapping:
-            normalized_features[key_mapping[k]] = v
-        else:
-            normalized_features[k] = v # Keep as is if no mapping found (or if already correct)
-            
-    return normalized_features
+    features = parser.close()
+    return {_normalize_key(k): v for k, v in features.items()}, timing
+
+
+def _merge_llm_features(local_features, resolved, llm_features, llm_source, confidence, source):
+    """Locally resolved features win over the LLM answer (confidence and source updated in place)."""
+    features = dict(llm_features)
+    for col in resolved:
+        features[col] = local_features[col]
+    for col in FEATURE_COLS:
+        if col not in resolved:
+            source[col] = llm_source
+            confidence[col] = 1.0 if features.get(col) is not None else 0.0
+    return features
+
+
+def _cache_key(input_text, api_key):
+    """Cache key of a report: answers from differently configured backend pools are kept apart."""
+    return make_cache_key(input_text, PROMPT_VERSION, get_backend_pool(MODEL_NAME, api_key).signature)
+
+
+def _fetch_llm_features(input_text, api_key, cache, cache_key):
+    """
+    Leader side of the single flight: reuse another worker's in-flight result
+    if it holds the claim on this report, otherwise call the LLM.
+
+    Returns:
+        (features, timing, source) with source "llm" or "cache"
+    """
+    claimed = cache is None or cache.claim(cache_key, EXTRACTION_CLAIM_TTL)
+    if not claimed:
+        features = cache.wait_for(cache_key, EXTRACTION_CLAIM_TTL)
+        if features is not None:
+            return features, None, "cache"
+    try:
+        features, timing = _extract_features_with_llm(input_text, api_key)
+        if cache is not None:
+            cache.put(cache_key, features, timing.get("model", MODEL_NAME), PROMPT_VERSION)
+    finally:
+        if cache is not None and claimed:
+            cache.release(cache_key)
+    return features, timing, "llm"
 
 
-def extract_features_from_file(input_file: str, output_file: str = None) -> dict:
+def extract_features_from_text(input_text: str, api_key: str = None, use_cache: bool = True, details: dict = None,
+                               local: tuple = None) -> dict:
     """
-    Extract features from a text file.
+    Extract 30 breast cancer features from medical report text.
+    
+    Features are first extracted locally with deterministic rules; Groq AI is
+    only called when some features could not be resolved, and only those are
+    taken from its answer. Identical reports (after whitespace/Unicode
+    normalization) are served from the local extraction cache.
     
     Args:
-        input_file: Path to input text file
-        output_file: Optional path to save extracted features
+        input_text: Medical report text
+        api_key: Groq API key (optional, will use env var if not provided)
+        use_cache: Look up and store the LLM result in the extraction cache
+        details: Optional dict filled with per-feature "confidence" and "source"
+            ("local", "llm" or "cache"), whether the LLM was called and, if so,
+            the call "timing" (connection setup vs model time), and whether the
+            result was shared with a concurrent identical request ("deduplicated")
+        local: (features, confidence) already returned by extract_features_locally
+            for this text, so it is not extracted locally twice
     
     Returns:
         Dictionary with 30 features
     """
-    # Read input file
-    with open(input_file, "r", encoding="utf-8") as f:
-        input_text = f.read().strip()
+    if not input_text or not input_text.strip():
+        raise ValueError("Input text is empty.")
     
-    # Extract features
-    features = extract_features_from_text(input_text)
+    local_features, confidence = local if local is not None else extract_features_locally(input_text)
+    # details["confidence"] is handed to the caller: do not share the caller's dict
+    confidence = dict(confidence)
+    resolved = {col for col in FEATURE_COLS if confidence[col] >= LOCAL_CONFIDENCE_THRESHOLD}
+    source = {col: "local" for col in resolved}
+    llm_called = False
+    timing = None
     
-    # Save to file if specified
-    if output_file:
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(features, f, indent=2, ensure_ascii=False)
+    deduplicated = False
     
+    if len(resolved) == len(FEATURE_COLS):
+        features = {col: local_features[col] for col in FEATURE_COLS}
+    else:
+        cache = get_extraction_cache() if use_cache else None
+        cache_key = _cache_key(input_text, api_key)
+        llm_features = cache.get(cache_key) if cache is not None else None
+        llm_source = "cache"
+        
+        if llm_features is None:
+            (llm_features, timing, llm_source), deduplicated = extraction_flight.do(
+                cache_key, lambda: _fetch_llm_features(input_text, api_key, cache, cache_key))
+            llm_called = llm_source == "llm" and not deduplicated
+            if deduplicated:
+                timing = None
+        
+        features = _merge_llm_features(local_features, resolved, llm_features, llm_source, confidence, source)
+    
+    if details is not None:
+        details.update({
+            "confidence": confidence,
+            "source": source,
+            "llm_called": llm_called,
+            "deduplicated": deduplicated,
+            "resolved_locally": len(resolved),
+            "timing": timing
+        })
     return features
 
 
-if __name__ == "__main__":
-    # Command-line usage
-    print("🚀 Feature extraction started")
+def stream_features_from_text(input_text: str, api_key: str = None, use_cache: bool = True):
+    """
+    Streaming variant of extract_features_from_text.
     
-    INPUT_FILE = "input_report.txt"
-    OUTPUT_FILE = "extracted_features.json"
+    Yields:
+        ("feature", {"name", "value", "source"}) for each feature as soon as it
+        is known (local features first, then LLM features as tokens arrive),
+        then once ("features", {"features": dict, "details": dict}) with the
+        merged result and the same details as extract_features_from_text.
+    """
+    if not input_text or not input_text.strip():
+        raise ValueError("Input text is empty.")
     
-    try:
-        features = extract_features_from_file(INPUT_FILE, OUTPUT_FILE)
-        print("✅ Extraction terminée.")
-        print(f"📁 Résultat sauvegardé dans : {OUTPUT_FILE}")
-    except Exception as e:
-        print(f"❌ Error: {e}")
+    local_features, confidence = extract_features_locally(input_text)
+    resolved = {col for col in FEATURE_COLS if confidence[col] >= LOCAL_CONFIDENCE_THRESHOLD}
+    source = {col: "local" for col in resolved}
+    llm_called = False
+    deduplicated = False
+    timing = None
+    
+    for col in FEATURE_COLS:
+        if col in resolved:
+            yield "feature", {"name": col, "value": local_features[col], "source": "local"}
+    
+    if len(resolved) == len(FEATURE_COLS):
+        features = {col: local_features[col] for col in FEATURE_COLS}
+    else:
+        cache = get_extraction_cache() if use_cache else None
+        cache_key = _cache_key(input_text, api_key)
+        llm_features = cache.get(cache_key) if cache is not None else None
+        llm_source = "cache"
+        
+        streamed = False
+        if llm_features is None:
+            future, is_leader = extraction_flight.begin(cache_key)
+            if not is_leader:
+                llm_features, _, llm_source = future.result()
+                deduplicated = True
+            else:
+                claimed = False
+                try:
+                    claimed = cache is None or cache.claim(cache_key, EXTRACTION_CLAIM_TTL)
+                    if not claimed:
+                        llm_features = cache.wait_for(cache_key, EXTRACTION_CLAIM_TTL)
+                    if llm_features is None:
+                        llm_source = "llm"
+                        llm_called = True
+                        streamed = True
+                        pairs = _stream_features_with_llm(input_text, api_key)
+                        while True:
+                            try:
+                                col, value = next(pairs)
+                            except StopIteration as stop:
+                                llm_features, timing = stop.value
+                                break
+                            if col in FEATURE_COLS and col not in resolved:
+                                yield "feature", {"name": col, "value": value, "source": "llm"}
+                        if cache is not None:
+                            cache.put(cache_key, llm_features, timing.get("model", MODEL_NAME), PROMPT_VERSION)
+                except BaseException as e:
+                    extraction_flight.finish(cache_key, error=e)
+                    raise
+                finally:
+                    if cache is not None and claimed:
+                        cache.release(cache_key)
+                extraction_flight.finish(cache_key, result=(llm_features, timing, llm_source))
+        
+        if not streamed:
+            for col in FEATURE_COLS:
+                if col not in resolved:
+                    yield "feature", {"name": col, "value": llm_features.get(col), "source": llm_source}
+        
+        features = _merge_llm_features(local_features, resolved, llm_features, llm_source, confidence, source)
+    
+    yield "features", {
+        "features": features,
+        "details": {
+            "confidence": confidence,
+            "source": source,
+            "llm_called": llm_called,
+            "deduplicated": deduplicated,
+            "resolved_locally": len(resolved),
+            "timing": timing
+        }
+    }
+
+
+def main():
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Extract the 30 features of a medical report")
+    parser.add_argument("source", nargs="?", default="-", help="Report text file, or '-' (default) for stdin")
+    args = parser.parse_args()
+
+    if args.source == "-":
+        input_text = sys.stdin.read()
+    else:
+        with open(args.source, "r", encoding="utf-8") as f:
+            input_text = f.read()
+    # Features on stdout, so the command composes with pipes; the API serves the same through /jobs
+    print(json.dumps(extract_features_from_text(input_text), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
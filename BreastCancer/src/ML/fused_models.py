@@ -0,0 +1,139 @@
+"""
+Fused NumPy inference kernels for the breast cancer models.
+
+The kernels are produced by compile_models.py, which folds each
+StandardScaler into the first affine layer of its model. Serving therefore
+only needs NumPy: no torch or scikit-learn import at runtime.
+
+Each kernel is a directory holding meta.json plus one .npy file per array.
+The arrays are opened memory-mapped, so every gunicorn worker shares the
+same page-cache pages instead of holding a private copy of the weights.
+"""
+import json
+import os
+import numpy as np
+
+
+def _relu(z):
+    return np.maximum(z, 0, out=z)
+
+
+def _tanh(z):
+    return np.tanh(z, out=z)
+
+
+def _sigmoid(z):
+    return np.exp(-np.logaddexp(0, -z))
+
+
+def _identity(z):
+    return z
+
+
+ACTIVATIONS = {
+    "relu": _relu,
+    "tanh": _tanh,
+    "logistic": _sigmoid,
+    "identity": _identity,
+}
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+class FusedSoftmax:
+    """Scaler + nn.Linear + softmax, folded into a single float32 affine map."""
+
+    kind = "softmax"
+
+    def __init__(self, weight, bias):
+        self.weight = weight    # (n_features, n_classes)
+        self.bias = bias        # (n_classes,)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return _softmax(X @ self.weight + self.bias)
+
+
+class FusedMLP:
+    """
+    Scaler + MLPClassifier layer stack as plain matmul + activation.
+
+    A scaled binary LogisticRegression is the one-layer case of this kernel.
+    """
+
+    kind = "mlp"
+
+    def __init__(self, weights, biases, hidden_activation="relu", out_activation="logistic"):
+        self.weights = weights
+        self.biases = biases
+        self.hidden_activation = hidden_activation
+        self.out_activation = out_activation
+
+    def predict_proba(self, X):
+        h = np.asarray(X, dtype=np.float32)
+        activation = ACTIVATIONS[self.hidden_activation]
+        last = len(self.weights) - 1
+        for i, (W, b) in enumerate(zip(self.weights, self.biases)):
+            h = h @ W + b
+            if i != last:
+                h = activation(h)
+
+        if self.out_activation == "softmax":
+            return _softmax(h)
+        # Binary MLPClassifier: one logistic output unit for class 1
+        p1 = _sigmoid(h[:, 0])
+        return np.stack([1.0 - p1, p1], axis=1)
+
+
+def save_fused_model(path, kind, arrays, **meta):
+    """
+    Write a kernel directory: meta.json plus one uncompressed .npy per array.
+
+    Args:
+        path: Output directory
+        kind: "softmax", "mlp" or "logistic"
+        arrays: Mapping of array name to ndarray
+        meta: Extra JSON-serializable metadata (layer count, activations...)
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "arrays": sorted(arrays), **meta}, f, indent=2)
+
+
+def load_fused_model(path, mmap_mode="r"):
+    """
+    Load a kernel exported by compile_models.py.
+
+    Args:
+        path: Kernel directory
+        mmap_mode: numpy memory-map mode for the weight arrays (None to read
+            them into private memory)
+
+    Returns:
+        FusedSoftmax or FusedMLP instance
+    """
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    def array(name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+
+    kind = meta["kind"]
+    if kind == "softmax":
+        return FusedSoftmax(array("weight"), array("bias"))
+    if kind in ("mlp", "logistic"):
+        n_layers = meta["n_layers"]
+        return FusedMLP(
+            [array(f"W{i}") for i in range(n_layers)],
+            [array(f"b{i}") for i in range(n_layers)],
+            hidden_activation=meta.get("hidden_activation", "identity"),
+            out_activation=meta["out_activation"],
+        )
+    raise ValueError(f"Unknown fused model kind '{kind}' in {path}")
@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration for the ML backend.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+With preload_app the master imports app.py once (models, DB init) before
+forking, so workers inherit the loaded state copy-on-write instead of each
+re-running the startup. The fused model weights are memory-mapped .npy files
+(see fused_models.py), so their pages stay shared across all workers.
+"""
+import os
+import time
+
+import process_stats
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+# Threaded workers let concurrent requests in one worker share a micro-batch
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+_master_started = time.perf_counter()
+
+
+def when_ready(server):
+    usage = process_stats.memory_usage()
+    server.log.info(f"Master ready in {(time.perf_counter() - _master_started) * 1000:.1f} ms "
+                    f"(preload_app={preload_app}, {process_stats.format_memory(usage)})")
+
+
+def post_fork(server, worker):
+    process_stats.mark_process_start()
+
+
+def post_worker_init(worker):
+    usage = process_stats.memory_usage()
+    worker.log.info(f"Worker {worker.pid} ready in {process_stats.seconds_since_start() * 1000:.1f} ms "
+                    f"({process_stats.format_memory(usage)})")
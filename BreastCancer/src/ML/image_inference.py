@@ -0,0 +1,385 @@
+"""
+Mammogram classification (Normal / Benign / Cancer) with the EfficientNet-B3
+trained in Breast_Cancer_computer_vision.ipynb, served on CPU.
+
+    python image_inference.py                 # export the TorchScript graph next to the checkpoint
+    python image_inference.py --check img.jpg # export, then classify an image
+
+The checkpoint (IMAGE_MODEL_PATH, the notebook's best_effnet_b3_3class.pth
+state dict) is exported to a frozen TorchScript graph (IMAGE_SCRIPT_PATH)
+traced in channels-last layout, as a deployment step (the command above,
+run at image build or before restarting the server), never by the server:
+the export takes far longer than a request may, and concurrent workers
+would race to write the file. The export records the checkpoint's SHA-256;
+the server only loads the graph, and refuses one that does not match the
+deployed checkpoint. timm is needed for the export, not at serving time.
+
+Each worker process loads the graph on its first image, in the thread of
+its MicroBatcher (see batching.py): concurrent uploads are decoded and
+preprocessed in their request threads, then classified together in one
+forward pass under torch.inference_mode(), using IMAGE_INFERENCE_THREADS
+intra-op threads. torch is only imported there, so workers that never
+classify an image do not pay for it.
+
+Preprocessing matches the notebook's predict_image: crop_breast_region,
+then the 384x384 inference_transform (bilinear resize, ToTensor, Normalize).
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from batching import MicroBatcher
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CLASS_NAMES = ["Normal", "Benign", "Cancer"]
+MODEL_NAME = os.getenv("IMAGE_MODEL_NAME", "efficientnet_b3")
+IMAGE_MODEL_PATH = os.getenv("IMAGE_MODEL_PATH", "best_effnet_b3_3class.pth")
+IMAGE_SCRIPT_PATH = os.getenv("IMAGE_SCRIPT_PATH", os.path.splitext(IMAGE_MODEL_PATH)[0] + ".torchscript.pt")
+IMAGE_SIZE = int(os.getenv("IMAGE_SIZE", "384"))
+# inference_transform of the notebook
+MEAN = (0.499, 0.499, 0.499)
+STD = (0.240, 0.240, 0.240)
+# Pixels darker than this are background (crop_breast_region)
+BACKGROUND_THRESHOLD = 10
+# Maximum absolute difference allowed between eager and exported probabilities
+TOLERANCE = 1e-4
+
+# Folded ToTensor + Normalize: x / 255 * _SCALE + _OFFSET == (x / 255 - mean) / std
+_SCALE = np.array([1.0 / (255.0 * s) for s in STD], dtype=np.float32)
+_OFFSET = np.array([-m / s for m, s in zip(MEAN, STD)], dtype=np.float32)
+
+
+class ImageModelUnavailable(RuntimeError):
+    """The image model cannot be served here (no checkpoint, torch or Pillow; served as 503)."""
+
+
+class InvalidImage(ValueError):
+    """The upload is not a readable image (served as 400)."""
+
+
+def default_threads():
+    """Intra-op threads per worker: the cores shared between the gunicorn workers."""
+    workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+# =====================
+# Preprocessing
+# =====================
+def crop_breast_region(img):
+    """
+    Crop an image to the bounding box of its non-background pixels (the notebook's crop_breast_region).
+
+    As in the notebook, the right and bottom bounds are exclusive, so the
+    last foreground column and row are dropped.
+    """
+    gray = np.asarray(img if img.mode == "L" else ImageOps.grayscale(img))
+    mask = gray > BACKGROUND_THRESHOLD
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return img
+    cols = np.flatnonzero(mask.any(axis=0))
+    return img.crop((int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1])))
+
+
+def preprocess(source, size=IMAGE_SIZE):
+    """
+    Decode, crop and normalize one image for the model.
+
+    Grayscale images (most mammograms) are processed on their single
+    channel: converting them to RGB first, as the notebook does, gives three
+    identical channels and the same values.
+
+    Args:
+        source: Path or binary file object
+        size: Side of the square model input
+
+    Returns:
+        (size, size, 3) float32 array (channels last)
+
+    Raises:
+        ImageModelUnavailable: If Pillow is not installed
+        InvalidImage: If the image cannot be decoded
+    """
+    if Image is None:
+        raise ImageModelUnavailable("Pillow is not installed")
+    try:
+        with Image.open(source) as img:
+            img = img if img.mode in ("L", "RGB") else img.convert("RGB")
+            img = crop_breast_region(img).resize((size, size), Image.BILINEAR)
+    except Image.UnidentifiedImageError:
+        raise InvalidImage("Unreadable image: not an image file or an unsupported format")
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"Unreadable image: {e}")
+    pixels = np.asarray(img, dtype=np.float32)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    return pixels * _SCALE + _OFFSET
+
+
+# =====================
+# Model export
+# =====================
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_model(model_name=MODEL_NAME, n_classes=len(CLASS_NAMES)):
+    """The notebook's build_model, without the ImageNet weights (the checkpoint replaces them)."""
+    import timm
+    return timm.create_model(model_name, pretrained=False, num_classes=n_classes)
+
+
+def load_checkpoint(path=IMAGE_MODEL_PATH, model_name=MODEL_NAME):
+    """Eager model with the notebook's trained weights, in eval mode and channels-last layout."""
+    import torch
+    model = build_model(model_name)
+    model.load_state_dict(torch.load(path, map_location="cpu", weights_only=True))
+    return model.eval().to(memory_format=torch.channels_last)
+
+
+def export_torchscript(model, script_path, source, size=IMAGE_SIZE):
+    """
+    Trace and freeze an eager model, check it against the eager outputs and save it.
+
+    Freezing inlines the weights and folds batch norms into the convolutions.
+
+    Args:
+        model: Eager model (eval mode)
+        script_path: Output .torchscript.pt file
+        source: JSON-serializable description of the checkpoint, stored in the file
+        size: Side of the square model input
+
+    Returns:
+        Frozen ScriptModule
+
+    Raises:
+        RuntimeError: If the exported graph disagrees with the eager model
+    """
+    import torch
+    example = torch.rand(2, 3, size, size).contiguous(memory_format=torch.channels_last)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)  # TorchScript deprecation notices
+        with torch.no_grad():
+            frozen = torch.jit.freeze(torch.jit.trace(model, example[:1]))
+            diff = (torch.softmax(frozen(example), 1) - torch.softmax(model(example), 1)).abs().max().item()
+        if diff > TOLERANCE:
+            raise RuntimeError(f"Exported graph differs from the eager model by {diff:.2e}")
+        tmp = f"{script_path}.{os.getpid()}.tmp"
+        torch.jit.save(frozen, tmp, _extra_files={"source.json": json.dumps(source)})
+    os.replace(tmp, script_path)
+    return frozen
+
+
+def load_torchscript(script_path):
+    """(ScriptModule, source description) of an exported graph."""
+    import torch
+    extra = {"source.json": ""}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        module = torch.jit.load(script_path, map_location="cpu", _extra_files=extra)
+    return module.eval(), json.loads(extra["source.json"] or "{}")
+
+
+# =====================
+# Serving
+# =====================
+class ImageClassifier:
+    """
+    Lazily loaded, micro-batched image classifier.
+
+    Args:
+        checkpoint: State dict saved by the notebook (may be absent if the exported graph is deployed alone)
+        script_path: TorchScript graph exported by `python image_inference.py`
+        size: Side of the square model input
+        num_threads: Intra-op threads of the forward pass in each process
+        max_batch_size: Images classified in one forward pass at most
+        max_wait_ms: Maximum time the first queued image waits for others
+        timeout_ms: Maximum time a request waits for its result (the first batch also loads the graph)
+        export: "torchscript", or "eager" to serve the timm model as is
+    """
+
+    def __init__(self, checkpoint=IMAGE_MODEL_PATH, script_path=IMAGE_SCRIPT_PATH, size=IMAGE_SIZE,
+                 num_threads=None, max_batch_size=8, max_wait_ms=10.0, timeout_ms=60000.0, export="torchscript"):
+        self.checkpoint = checkpoint
+        self.script_path = script_path
+        self.size = size
+        self.num_threads = num_threads or default_threads()
+        self.export = export
+        self.version = None
+        self._model = None
+        self._pid = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.load_ms = None
+        self.images = 0
+        self.preprocess_ms = 0.0
+        self.forward_ms = 0.0
+        self.batcher = MicroBatcher(MODEL_NAME, self.predict_batch, max_batch_size, max_wait_ms, timeout_ms)
+
+    @property
+    def available(self):
+        has_model = os.path.exists(self.script_path if self.export == "torchscript" else self.checkpoint)
+        return Image is not None and importlib.util.find_spec("torch") is not None and has_model
+
+    def _is_current(self, source, checkpoint_sha):
+        return source.get("size") == self.size and checkpoint_sha in (None, source.get("checkpoint_sha256"))
+
+    def _load_model(self):
+        """Model for this process: the exported graph, if it matches the deployed checkpoint."""
+        checkpoint_sha = file_sha256(self.checkpoint) if os.path.exists(self.checkpoint) else None
+        if self.export == "eager":
+            if checkpoint_sha is None:
+                raise ImageModelUnavailable(f"Image model checkpoint {self.checkpoint} not found")
+            return load_checkpoint(self.checkpoint), checkpoint_sha
+
+        if not os.path.exists(self.script_path):
+            raise ImageModelUnavailable(f"{self.script_path} not found: run 'python image_inference.py' to export it")
+        module, source = load_torchscript(self.script_path)
+        if not self._is_current(source, checkpoint_sha):
+            raise ImageModelUnavailable(f"{self.script_path} was not exported from {self.checkpoint}: "
+                                        f"run 'python image_inference.py' again")
+        return module, source.get("checkpoint_sha256") or "unknown"
+
+    def export_model(self):
+        """
+        Export the checkpoint to script_path, unless the graph there already matches it (deployment step).
+
+        Returns:
+            True if a graph was written
+        """
+        import torch
+        checkpoint_sha = file_sha256(self.checkpoint)
+        if os.path.exists(self.script_path) and self._is_current(load_torchscript(self.script_path)[1], checkpoint_sha):
+            print(f"✅ {self.script_path} is up to date")
+            return False
+        source = {"checkpoint": os.path.basename(self.checkpoint), "checkpoint_sha256": checkpoint_sha,
+                  "model": MODEL_NAME, "size": self.size, "torch": torch.__version__}
+        export_torchscript(load_checkpoint(self.checkpoint), self.script_path, source, self.size)
+        print(f"💾 Exported {MODEL_NAME} to {self.script_path}")
+        return True
+
+    def model(self):
+        """
+        The model of this process, loaded on first use.
+
+        Raises:
+            ImageModelUnavailable: If torch or the exported graph is missing, or the graph is stale
+        """
+        # Thread pools do not survive fork(): load (and size the pool) in each process
+        if self._pid == os.getpid():
+            return self._model
+        with self._load_lock:
+            if self._pid != os.getpid():
+                if not self.available:
+                    raise ImageModelUnavailable(
+                        f"Image model not available (needs torch, Pillow and {self.script_path}, "
+                        f"exported by 'python image_inference.py')"
+                    )
+                import torch
+                started = time.perf_counter()
+                torch.set_num_threads(self.num_threads)
+                model, sha = self._load_model()
+                # First passes specialize the graph: run them now rather than on a request
+                self._forward(model, np.zeros((1, self.size, self.size, 3), dtype=np.float32))
+                self._model, self.version, self._pid = model, sha[:12], os.getpid()
+                self.load_ms = (time.perf_counter() - started) * 1000.0
+                print(f"✅ Image model {MODEL_NAME} ready in {self.load_ms:.0f} ms "
+                      f"({self.export}, {self.num_threads} threads, version {self.version})")
+        return self._model
+
+    @staticmethod
+    def _forward(model, X):
+        import torch
+        # (N, H, W, C) -> (N, C, H, W) view: already in channels-last memory layout, no copy
+        batch = torch.from_numpy(X).permute(0, 3, 1, 2)
+        with torch.inference_mode():
+            return torch.softmax(model(batch), dim=1).numpy()
+
+    def predict_batch(self, X):
+        """
+        Class probabilities of preprocessed images.
+
+        Args:
+            X: (N, size, size, 3) float32 array from preprocess()
+
+        Returns:
+            (N, 3) array of probabilities in CLASS_NAMES order
+        """
+        model = self.model()
+        started = time.perf_counter()
+        proba = self._forward(model, np.ascontiguousarray(X, dtype=np.float32))
+        with self._lock:
+            self.images += len(X)
+            self.forward_ms += (time.perf_counter() - started) * 1000.0
+        return proba
+
+    def predict(self, source):
+        """
+        Classify one image, batched with the concurrent requests of this process.
+
+        Returns:
+            dict with the predicted class, its confidence, every class probability and the model version
+
+        Raises:
+            ImageModelUnavailable: If the model cannot be loaded
+            InvalidImage: If the image cannot be decoded
+        """
+        started = time.perf_counter()
+        pixels = preprocess(source, self.size)
+        with self._lock:
+            self.preprocess_ms += (time.perf_counter() - started) * 1000.0
+        proba = self.batcher.submit(pixels)
+        index = int(np.argmax(proba))
+        return {
+            "prediction": CLASS_NAMES[index],
+            "confidence": float(proba[index]),
+            "probabilities": {name: float(p) for name, p in zip(CLASS_NAMES, proba)},
+            "model": MODEL_NAME,
+            "model_version": self.version,
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = {"available": self.available, "loaded": self._pid == os.getpid(), "model": MODEL_NAME,
+                     "version": self.version, "export": self.export, "size": self.size,
+                     "threads": self.num_threads, "load_ms": self.load_ms, "images": self.images,
+                     "mean_preprocess_ms": self.preprocess_ms / self.images if self.images else 0.0,
+                     "mean_forward_ms_per_image": self.forward_ms / self.images if self.images else 0.0}
+        stats["batching"] = self.batcher.stats()
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the mammogram classifier to TorchScript")
+    parser.add_argument("--checkpoint", default=IMAGE_MODEL_PATH)
+    parser.add_argument("--output", default=IMAGE_SCRIPT_PATH)
+    parser.add_argument("--check", metavar="IMAGE", help="Classify this image with the exported graph")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        parser.error(f"checkpoint {args.checkpoint} not found (train it with Breast_Cancer_computer_vision.ipynb)")
+    classifier = ImageClassifier(args.checkpoint, args.output)
+    classifier.export_model()
+    classifier.model()
+    if args.check:
+        print(json.dumps(classifier.predict(args.check), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Asynchronous jobs for long-running requests (report extraction + scoring).
+
+A job is submitted, gets an id immediately and runs on a bounded pool of
+background threads; clients poll or long-poll its status. Job state lives
+in a SQLite database (WAL mode) so any gunicorn worker can answer a poll,
+not only the worker running the job. Finished jobs are evicted after a TTL.
+
+    queued -> running -> done | error
+
+A job still queued or running stale_seconds after it was created is marked
+as an error: the worker holding it has crashed or been restarted, and its
+pollers would otherwise wait for it forever. This is checked when the
+store is opened, whenever a job is created and when such a job is polled.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(RuntimeError):
+    """The job runner already has the maximum number of pending jobs."""
+
+
+class JobStore:
+    """
+    SQLite-backed job table with TTL eviction.
+
+    Args:
+        path: SQLite database file
+        ttl_seconds: Finished jobs are deleted this long after completion
+        stale_seconds: Unfinished jobs older than this are marked as abandoned (error)
+    """
+
+    def __init__(self, path="jobs.sqlite3", ttl_seconds=3600, stale_seconds=900):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.abandoned = 0
+        self._local = threading.local()
+        # Wakes long-polls in this process as soon as a job it runs finishes
+        self._changed = threading.Condition()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at)")
+            self._evict(conn, time.time())
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, kind):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        now = time.time()
+        conn.execute("INSERT INTO jobs (id, kind, status, created_at) VALUES (?, ?, 'queued', ?)", (job_id, kind, now))
+        self._evict(conn, now)
+        return job_id
+
+    def _evict(self, conn, now):
+        """Delete expired finished jobs and give up on the ones a dead worker left unfinished."""
+        conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - self.ttl_seconds,))
+        abandoned = conn.execute(
+            "UPDATE jobs SET status = 'error', error = ?, finished_at = ? "
+            "WHERE finished_at IS NULL AND created_at < ?",
+            (f"Job abandoned: not finished after {self.stale_seconds:g} s (worker stopped or restarted)",
+             now, now - self.stale_seconds)
+        ).rowcount
+        if abandoned:
+            self.abandoned += abandoned
+            print(f"⚠️ {abandoned} unfinished job(s) marked as abandoned")
+            self._notify()
+
+    def mark_running(self, job_id):
+        self._connect().execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+        self._notify()
+
+    def finish(self, job_id, result=None, error=None):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            ("error" if error is not None else "done",
+             json.dumps(result, ensure_ascii=False) if result is not None else None,
+             error, time.time(), job_id)
+        )
+        self._notify()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def get(self, job_id):
+        """Job as a dict, or None if unknown or expired."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT id, kind, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, result, error, created_at, started_at, finished_at = row
+        now = time.time()
+        if finished_at is not None and now - finished_at > self.ttl_seconds:
+            return None
+        if finished_at is None and now - created_at > self.stale_seconds:
+            # Polled job left behind by a dead worker: settle it now rather than at the next submit
+            self._evict(conn, now)
+            return self.get(job_id)
+        job = {"job_id": job_id, "kind": kind, "status": status, "created_at": created_at}
+        if started_at is not None:
+            job["queue_ms"] = round((started_at - created_at) * 1000.0, 1)
+        if finished_at is not None:
+            job["run_ms"] = round((finished_at - (started_at or created_at)) * 1000.0, 1)
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error is not None:
+            job["error"] = error
+        return job
+
+    def wait(self, job_id, timeout, poll_interval=0.1):
+        """
+        Long-poll: return the job once it is finished, or its current state after `timeout` seconds.
+
+        Jobs run by this process wake the waiter immediately; jobs run by
+        another worker are seen within poll_interval.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in ("done", "error") or remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(poll_interval, remaining))
+
+    def stats(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {"path": self.path, "ttl_seconds": self.ttl_seconds, "stale_seconds": self.stale_seconds,
+                "abandoned": self.abandoned, "jobs": dict(rows)}
+
+
+class JobRunner:
+    """
+    Bounded background pool executing jobs recorded in a JobStore.
+
+    Args:
+        store: JobStore
+        max_workers: Jobs running at once in this process
+        max_pending: Queued + running jobs accepted before submit() raises QueueFull
+    """
+
+    def __init__(self, store, max_workers=4, max_pending=100):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+
+    def _pool(self):
+        # Threads do not survive fork(): one executor per process
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def submit(self, kind, fn, *args):
+        """
+        Record a job and schedule fn(*args) on the pool; its return value becomes the job result.
+
+        Returns:
+            The job id
+
+        Raises:
+            QueueFull: If max_pending jobs are already queued or running
+        """
+        with self._lock:
+            executor = self._pool()
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"Too many pending jobs ({self._pending})")
+            self._pending += 1
+        try:
+            job_id = self.store.create(kind)
+            executor.submit(self._run, job_id, fn, args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        try:
+            self.store.mark_running(job_id)
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self.store.finish(job_id, error=f"{type(e).__name__}: {e}")
+            else:
+                self.store.finish(job_id, result=result)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        return {"max_workers": self.max_workers, "max_pending": self.max_pending,
+                "pending": self._pending, **self.store.stats()}
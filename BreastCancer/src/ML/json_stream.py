@@ -0,0 +1,149 @@
+"""
+Incremental parser for the JSON object in a streamed LLM completion.
+
+The model may emit a reasoning preamble (<think>...</think>, possibly
+containing braces) before the JSON answer. The parser skips it, then
+reports every top-level "key": value pair as soon as the value is complete,
+and flags completion the moment the closing brace of the object arrives, so
+callers can stop reading the stream and start scoring.
+
+    parser = JSONObjectStreamParser()
+    for chunk in chunks:
+        for key, value in parser.feed(chunk):
+            ...
+        if parser.done:
+            break
+"""
+import json
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+_PREAMBLE, _THINK, _OBJECT, _DONE = range(4)
+
+
+class JSONObjectStreamParser:
+    """Push parser for the first top-level JSON object outside <think> blocks."""
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._state = _PREAMBLE
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+        self.result = {}
+
+    @property
+    def done(self):
+        return self._state == _DONE
+
+    def feed(self, chunk):
+        """
+        Consume a chunk of completion text.
+
+        Returns:
+            List of (key, value) pairs completed by this chunk
+
+        Raises:
+            ValueError: If a member of the object is not valid JSON
+        """
+        if self._state == _DONE or not chunk:
+            return []
+        self._buf += chunk
+        pairs = []
+        while self._state != _DONE:
+            before = (self._state, self._pos)
+            if self._state == _PREAMBLE:
+                self._skip_preamble()
+            elif self._state == _THINK:
+                self._skip_think()
+            else:
+                self._scan_object(pairs)
+            if (self._state, self._pos) == before:
+                break  # wait for more text (a tag may be split across chunks)
+        return pairs
+
+    def close(self):
+        """
+        Signal the end of the stream.
+
+        Returns:
+            The parsed object
+
+        Raises:
+            ValueError: If no complete JSON object was seen
+        """
+        if self._state != _DONE:
+            raise ValueError("No JSON object found in model output.")
+        return self.result
+
+    # ---------- States ----------
+    def _skip_preamble(self):
+        brace = self._buf.find("{", self._pos)
+        think = self._buf.find(THINK_OPEN, self._pos)
+        if think != -1 and (brace == -1 or think < brace):
+            self._pos = think + len(THINK_OPEN)
+            self._state = _THINK
+        elif brace != -1:
+            self._pos = brace + 1
+            self._state = _OBJECT
+            self._depth = 1
+            self._member_start = self._pos
+        else:
+            # Keep a possible partial "<think" at the end of the buffer
+            self._pos = max(self._pos, len(self._buf) - len(THINK_OPEN) + 1)
+
+    def _skip_think(self):
+        end = self._buf.find(THINK_CLOSE, self._pos)
+        if end == -1:
+            self._pos = max(self._pos, len(self._buf) - len(THINK_CLOSE) + 1)
+        else:
+            self._pos = end + len(THINK_CLOSE)
+            self._state = _PREAMBLE
+
+    def _scan_object(self, pairs):
+        buf = self._buf
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:i], pairs)
+                    self._state = _DONE
+                    self._pos = i + 1
+                    self._buf = ""
+                    return
+            elif c == "," and self._depth == 1:
+                self._emit(buf[self._member_start:i], pairs)
+                self._member_start = i + 1
+        self._pos = len(buf)
+
+    def _emit(self, member, pairs):
+        if not member.strip():
+            return
+        try:
+            (key, value), = json.loads("{" + member + "}").items()
+        except (json.JSONDecodeError, ValueError):
+            raise ValueError(f"Invalid JSON member in model output: {member.strip()[:80]!r}")
+        self.result[key] = value
+        pairs.append((key, value))
+
+
+def parse_json_object(text):
+    """Parse the first JSON object of a complete model output, ignoring <think> blocks."""
+    parser = JSONObjectStreamParser()
+    parser.feed(text)
+    return parser.close()
@@ -0,0 +1,472 @@
+"""
+Pool of LLM backends for feature extraction.
+
+A backend is one (provider, API key, model) target: the Groq API, or any
+OpenAI-compatible server (for example local_llm_server.py for offline tests
+and benchmarks). Backends are configured with EXTRACTION_BACKENDS, a JSON
+list such as:
+
+    [{"name": "groq-a", "kind": "groq", "api_key_env": "GROQ_API_KEY", "weight": 3},
+     {"name": "groq-b", "kind": "groq", "api_key_env": "GROQ_API_KEY_2", "model": "llama-3.3-70b-versatile"},
+     {"name": "local", "kind": "openai", "base_url": "http://127.0.0.1:8800/v1", "model": "local-rules"}]
+
+Without it, the pool holds a single Groq backend using GROQ_API_KEY.
+
+Request options that only some models accept (reasoning_effort, JSON mode
+through response_format) are per backend: "options" is merged into every
+chat completion the backend sends. A backend without "options" gets the
+MODEL_OPTIONS defaults of its model, if any. response_format is left out
+of streamed calls, where JSON mode is not available.
+
+- Load balancing: each call picks a backend at random, proportionally to its weight.
+- Circuit breaker: after EXTRACTION_BREAKER_FAILURES consecutive failures a
+  backend is skipped for EXTRACTION_BREAKER_COOLDOWN seconds, then a single
+  trial call decides whether it is closed again.
+- Hedging: if the answer has not arrived after EXTRACTION_HEDGE_DELAY_MS,
+  the same request is sent to a second backend and the first answer wins
+  (0 disables hedging). A failed call fails over to another backend at once.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from llm_client import get_groq_client, get_http_client, load_env, record_usage, track_call
+
+HEDGE_DELAY_MS = float(os.getenv("EXTRACTION_HEDGE_DELAY_MS", "0"))
+BREAKER_FAILURES = int(os.getenv("EXTRACTION_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("EXTRACTION_BREAKER_COOLDOWN", "30"))
+HEDGE_WORKERS = int(os.getenv("EXTRACTION_HEDGE_WORKERS", "32"))
+
+# Default request options per model: qwen3 reasons unless told not to, and supports JSON mode
+MODEL_OPTIONS = {
+    "qwen/qwen3-32b": {"reasoning_effort": "none", "response_format": {"type": "json_object"}},
+}
+
+
+class NoBackendAvailable(RuntimeError):
+    """Every backend of the pool has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed -> open after `failures` consecutive errors; open -> half-open after
+    `cooldown` seconds, where one trial call is let through; its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.cooldown
+            return not self.trial_in_flight
+
+    def acquire(self):
+        """Reserve a call; False if the breaker does not let it through."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.max_failures:
+                if self.state != "open":
+                    print(f"⚠️ Circuit breaker for backend '{self.name}' opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+def _usage_from_dict(usage):
+    """Wrap an OpenAI-style usage dict so record_usage can read it like the SDK objects."""
+    if not usage:
+        return None
+    details = usage.get("prompt_tokens_details") or {}
+    return SimpleNamespace(
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        prompt_tokens_details=SimpleNamespace(cached_tokens=details.get("cached_tokens"))
+    )
+
+
+class Backend:
+    """
+    One extraction target.
+
+    Args:
+        name: Label used in logs and metrics
+        kind: "groq" (Groq SDK) or "openai" (OpenAI-compatible HTTP API)
+        model: Model name sent with each request
+        api_key: API key (optional for local servers)
+        base_url: API base URL ("groq": SDK default; "openai": required, e.g. http://host:8800/v1)
+        weight: Relative share of the traffic
+        options: Extra chat completion arguments sent with each request (None = MODEL_OPTIONS of the model)
+    """
+
+    def __init__(self, name, kind, model, api_key=None, base_url=None, weight=1.0, options=None):
+        if kind not in ("groq", "openai"):
+            raise ValueError(f"Unknown backend kind '{kind}' for backend '{name}'")
+        if kind == "openai" and not base_url:
+            raise ValueError(f"Backend '{name}': base_url is required for kind 'openai'")
+        self.name = name
+        self.kind = kind
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.weight = float(weight)
+        self.options = dict(MODEL_OPTIONS.get(model, {}) if options is None else options)
+        self.breaker = CircuitBreaker(name)
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.total_ms = 0.0
+
+    def record(self, ok, elapsed_ms):
+        if ok:
+            self.breaker.success()
+        else:
+            self.breaker.failure()
+        with self._stats_lock:
+            self.calls += 1
+            self.failures += 0 if ok else 1
+            self.total_ms += elapsed_ms
+
+    def _request(self, request, stream=False):
+        """The caller's chat completion arguments plus this backend's options."""
+        options = {key: value for key, value in self.options.items() if not (stream and key == "response_format")}
+        return {**options, **request}
+
+    def complete(self, request):
+        """
+        Run a chat completion.
+
+        Returns:
+            (content, usage)
+        """
+        request = self._request(request)
+        if self.kind == "groq":
+            response = get_groq_client(self.api_key, self.base_url).chat.completions.create(model=self.model, **request)
+            return response.choices[0].message.content, response.usage
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = get_http_client().post(f"{self.base_url.rstrip('/')}/chat/completions",
+                                          json={"model": self.model, **request}, headers=headers)
+        response.raise_for_status()
+        body = response.json()
+        return body["choices"][0]["message"]["content"], _usage_from_dict(body.get("usage"))
+
+    def stream(self, request):
+        """Streamed chat completion: yields (content delta or None, usage or None) per chunk."""
+        request = self._request(request, stream=True)
+        if self.kind == "groq":
+            stream = get_groq_client(self.api_key, self.base_url).chat.completions.create(
+                model=self.model, stream=True, **request)
+            try:
+                for chunk in stream:
+                    # Usage comes with the last chunk (x_groq.usage on Groq)
+                    usage = chunk.usage or getattr(chunk.x_groq, "usage", None)
+                    yield (chunk.choices[0].delta.content if chunk.choices else None), usage
+            finally:
+                stream.close()
+            return
+
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        with get_http_client().stream("POST", f"{self.base_url.rstrip('/')}/chat/completions",
+                                      json={"model": self.model, "stream": True, **request},
+                                      headers=headers) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                choices = chunk.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                yield content, _usage_from_dict(chunk.get("usage"))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "kind": self.kind,
+                "model": self.model,
+                "options": self.options,
+                "weight": self.weight,
+                "breaker": self.breaker.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+            }
+
+
+class BackendPool:
+    """
+    Weighted pool of backends with circuit breakers, failover and hedged requests.
+
+    Args:
+        backends: List of Backend
+        hedge_delay_ms: Delay before a hedge request is sent to a second backend (0 = never)
+    """
+
+    def __init__(self, backends, hedge_delay_ms=HEDGE_DELAY_MS):
+        if not backends:
+            raise ValueError("At least one extraction backend is required")
+        self.backends = backends
+        self.hedge_delay_ms = hedge_delay_ms
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    @property
+    def signature(self):
+        """
+        Hash of what can change an answer: each backend's kind, model, base URL and options.
+
+        API keys, names and weights are left out, so pools answering alike share
+        cache entries.
+        """
+        config = sorted(json.dumps([b.kind, b.model, b.base_url, b.options], sort_keys=True) for b in self.backends)
+        return hashlib.sha256("\n".join(config).encode("utf-8")).hexdigest()[:16]
+
+    def _pool(self):
+        # Executor threads do not survive fork(): one executor per process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-backend")
+                    self._pid = os.getpid()
+        return self._executor
+
+    def choose(self, exclude=()):
+        """
+        Pick a backend by weight among those whose breaker lets a call through.
+
+        Raises:
+            NoBackendAvailable: If every remaining backend is open
+        """
+        candidates = [b for b in self.backends if b not in exclude and b.breaker.available()]
+        while candidates:
+            backend = random.choices(candidates, weights=[b.weight for b in candidates])[0]
+            if backend.breaker.acquire():
+                return backend
+            candidates.remove(backend)
+        raise NoBackendAvailable("No extraction backend available (all circuit breakers open)")
+
+    def _call(self, backend, request, prompt_version):
+        start = time.perf_counter()
+        try:
+            with track_call() as timing:
+                content, usage = backend.complete(request)
+        except Exception:
+            backend.record(False, (time.perf_counter() - start) * 1000.0)
+            raise
+        backend.record(True, timing["total_ms"])
+        # Every finished call is billed, hedge losers included
+        record_usage(timing, usage, prompt_version)
+        return content, timing
+
+    def complete(self, request, prompt_version):
+        """
+        Run a chat completion on the pool.
+
+        Returns:
+            (content, timing) where timing comes from the winning call and
+            includes "backend", "model" and "hedged"
+        """
+        executor = self._pool()
+        primary = self.choose()
+        used = [primary]
+        futures = {executor.submit(self._call, primary, request, prompt_version): primary}
+        hedged = False
+        hedge_pending = self.hedge_delay_ms > 0 and len(self.backends) > 1
+        hedge_at = time.monotonic() + self.hedge_delay_ms / 1000.0
+        last_error = None
+
+        while futures:
+            timeout = max(0.0, hedge_at - time.monotonic()) if hedge_pending else None
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Hedge delay elapsed: race a second backend
+                hedge_pending = False
+                try:
+                    backend = self.choose(exclude=used)
+                except NoBackendAvailable:
+                    continue
+                used.append(backend)
+                futures[executor.submit(self._call, backend, request, prompt_version)] = backend
+                hedged = True
+                with self._lock:
+                    self.hedges += 1
+                continue
+
+            for future in done:
+                backend = futures.pop(future)
+                try:
+                    content, timing = future.result()
+                except Exception as e:
+                    # Fail over right away (also when a hedge fails while another call is still running)
+                    last_error = e
+                    try:
+                        fallback = self.choose(exclude=used)
+                    except NoBackendAvailable:
+                        continue
+                    used.append(fallback)
+                    futures[executor.submit(self._call, fallback, request, prompt_version)] = fallback
+                    with self._lock:
+                        self.failovers += 1
+                    continue
+                if backend is not primary and hedged:
+                    with self._lock:
+                        self.hedge_wins += 1
+                # The losing request (if any) finishes in the background
+                return content, {**timing, "backend": backend.name, "model": backend.model, "hedged": hedged}
+
+        raise last_error
+
+    def stream(self, request, info):
+        """
+        Streamed chat completion on one backend picked by weight (no hedging).
+
+        A backend failing before its first chunk fails over to another one;
+        once chunks have been yielded, errors are raised to the caller.
+
+        Args:
+            request: Chat completion arguments
+            info: Dict filled with the "backend" and "model" that served the stream
+
+        Yields:
+            (content, usage) chunks. The outcome is recorded on the backend's
+            breaker; closing the stream early counts as a success.
+        """
+        used = []
+        while True:
+            try:
+                backend = self.choose(exclude=used)
+            except NoBackendAvailable:
+                if used:
+                    raise last_error
+                raise
+            used.append(backend)
+            info.update(backend=backend.name, model=backend.model)
+            start = time.perf_counter()
+            started = False
+            try:
+                for item in backend.stream(request):
+                    started = True
+                    yield item
+            except GeneratorExit:
+                backend.record(True, (time.perf_counter() - start) * 1000.0)
+                raise
+            except Exception as e:
+                backend.record(False, (time.perf_counter() - start) * 1000.0)
+                if started:
+                    raise
+                last_error = e
+                with self._lock:
+                    self.failovers += 1
+                continue
+            backend.record(True, (time.perf_counter() - start) * 1000.0)
+            return
+
+    def stats(self):
+        return {
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "backends": [backend.stats() for backend in self.backends],
+        }
+
+
+# =====================
+# Configuration
+# =====================
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _backend_from_config(config, default_model):
+    api_key = config.get("api_key")
+    if not api_key and config.get("api_key_env"):
+        api_key = os.getenv(config["api_key_env"])
+    kind = config.get("kind", "groq")
+    name = config.get("name") or f"{kind}-{config.get('model', default_model)}"
+    if kind == "groq" and not api_key:
+        raise ValueError(f"No API key for backend '{name}'. Check your .env file.")
+    return Backend(name=name, kind=kind, model=config.get("model", default_model), api_key=api_key,
+                   base_url=config.get("base_url"), weight=config.get("weight", 1.0), options=config.get("options"))
+
+
+def get_backend_pool(default_model, api_key=None):
+    """
+    Process-wide backend pool.
+
+    Args:
+        default_model: Model used by backends that do not name one
+        api_key: Explicit Groq API key: use a single-backend pool for it instead of EXTRACTION_BACKENDS
+
+    Raises:
+        ValueError: If the configuration is invalid or no API key is available
+    """
+    pool = _pools.get(api_key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(api_key)
+        if pool is not None:
+            return pool
+        load_env()
+        if api_key:
+            configs = [{"name": "groq", "kind": "groq", "api_key": api_key}]
+        elif os.getenv("EXTRACTION_BACKENDS"):
+            configs = json.loads(os.getenv("EXTRACTION_BACKENDS"))
+        else:
+            if not os.getenv("GROQ_API_KEY"):
+                raise ValueError("GROQ_API_KEY not found. Check your .env file.")
+            configs = [{"name": "groq", "kind": "groq", "api_key_env": "GROQ_API_KEY"}]
+        pool = BackendPool([_backend_from_config(config, default_model) for config in configs])
+        _pools[api_key] = pool
+        print(f"✅ Extraction backends: {', '.join(f'{b.name} ({b.model}, w={b.weight:g})' for b in pool.backends)}")
+        return pool
+
+
+def backend_pool_stats():
+    """Stats of the pool(s) built so far in this process."""
+    return [pool.stats() for pool in list(_pools.values())]
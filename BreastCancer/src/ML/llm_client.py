@@ -0,0 +1,203 @@
+"""
+Process-wide pooled LLM clients for feature extraction.
+
+One client per backend (Groq API key / base URL, or the plain httpx client
+used by OpenAI-compatible servers) is shared by all threads of a worker,
+instead of building a client and doing a fresh TCP + TLS handshake on every
+extraction. Clients are dropped in the child after fork() so each gunicorn
+worker opens its own connections.
+
+Each call can be timed with track_call(), which splits the wall time into
+connection setup (TCP + TLS, zero when a pooled connection is reused) and
+time waiting for the model (request sent -> response headers). Token usage
+is recorded per prompt version with record_usage(), so prompt variants can
+be compared on cost and latency.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from groq import Groq
+from dotenv import load_dotenv
+
+POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "120"))
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+
+_lock = threading.Lock()
+_clients = {}
+_env_loaded = False
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "new_connections": 0, "connect_ms": 0.0, "model_ms": 0.0, "total_ms": 0.0}
+_usage = {}
+
+
+def load_env():
+    """Load .env once per process (instead of at import time)."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def _reset_after_fork():
+    # The parent's sockets must not be shared: the child builds its own pool lazily
+    global _clients, _lock
+    _clients = {}
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _trace(event_name, info):
+    """httpcore trace hook: timestamps connection setup and the request/response exchange."""
+    timing = getattr(_local, "timing", None)
+    if timing is None:
+        return
+    now = time.perf_counter()
+    if event_name.endswith(("connect_tcp.started", "start_tls.started")):
+        timing["_connect_started"] = now
+    elif event_name.endswith(("connect_tcp.complete", "start_tls.complete")):
+        timing["connect_ms"] += (now - timing.pop("_connect_started", now)) * 1000.0
+        if event_name.endswith("connect_tcp.complete"):
+            timing["new_connections"] += 1
+    elif event_name.endswith("send_request_headers.started"):
+        timing["_sent"] = now
+    elif event_name.endswith("receive_response_headers.complete"):
+        timing["model_ms"] += (now - timing.pop("_sent", now)) * 1000.0
+
+
+def _attach_trace(request):
+    request.extensions["trace"] = _trace
+
+
+def _build_http_client():
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=CONNECT_TIMEOUT),
+        event_hooks={"request": [_attach_trace]}
+    )
+
+
+def _shared(key, build):
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = build()
+            _clients[key] = client
+        return client
+
+
+def get_groq_client(api_key, base_url=None):
+    """Return the shared Groq client for `api_key` / `base_url` (thread-safe, rebuilt after fork)."""
+    return _shared(("groq", api_key, base_url), lambda: Groq(
+        api_key=api_key, base_url=base_url, http_client=_build_http_client(), max_retries=MAX_RETRIES))
+
+
+def get_http_client():
+    """Return the shared plain httpx client (OpenAI-compatible backends), with the same pool and timing hooks."""
+    return _shared(("http",), _build_http_client)
+
+
+@contextmanager
+def track_call():
+    """
+    Time one API call made by the current thread.
+
+    Yields a dict filled on exit with connect_ms (TCP + TLS setup, 0 on a
+    reused keep-alive connection), model_ms (request sent -> response
+    headers), total_ms and new_connections.
+    """
+    timing = {"connect_ms": 0.0, "model_ms": 0.0, "total_ms": 0.0, "new_connections": 0}
+    _local.timing = timing
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing["total_ms"] = (time.perf_counter() - start) * 1000.0
+        timing.pop("_connect_started", None)
+        timing.pop("_sent", None)
+        _local.timing = None
+        with _stats_lock:
+            _stats["calls"] += 1
+            _stats["new_connections"] += timing["new_connections"]
+            _stats["connect_ms"] += timing["connect_ms"]
+            _stats["model_ms"] += timing["model_ms"]
+            _stats["total_ms"] += timing["total_ms"]
+
+
+def record_usage(timing, usage, prompt_version):
+    """
+    Add the token usage of a finished call to its timing dict and to the per-prompt-version totals.
+
+    Args:
+        timing: Dict yielded by track_call() (after the with block)
+        usage: CompletionUsage of the response (None when the provider did not send it,
+            e.g. a stream closed before its last chunk)
+        prompt_version: Prompt the call was made with
+    """
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None)
+    timing.update({"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "cached_tokens": cached_tokens})
+    with _stats_lock:
+        totals = _usage.setdefault(prompt_version, {
+            "calls": 0, "calls_with_usage": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "total_ms": 0.0
+        })
+        totals["calls"] += 1
+        totals["total_ms"] += timing["total_ms"]
+        if usage is not None:
+            totals["calls_with_usage"] += 1
+            totals["prompt_tokens"] += prompt_tokens or 0
+            totals["completion_tokens"] += completion_tokens or 0
+            totals["cached_tokens"] += cached_tokens or 0
+
+
+def usage_stats():
+    """Average tokens and latency per call for each prompt version."""
+    with _stats_lock:
+        stats = {}
+        for version, totals in _usage.items():
+            n = totals["calls_with_usage"]
+            stats[version] = {
+                "calls": totals["calls"],
+                "avg_prompt_tokens": totals["prompt_tokens"] / n if n else None,
+                "avg_completion_tokens": totals["completion_tokens"] / n if n else None,
+                "avg_cached_tokens": totals["cached_tokens"] / n if n else None,
+                "avg_total_ms": totals["total_ms"] / totals["calls"],
+            }
+        return stats
+
+
+def client_stats():
+    by_prompt = usage_stats()
+    with _stats_lock:
+        calls = _stats["calls"]
+        return {
+            "pool_size": POOL_SIZE,
+            "connect_timeout_s": CONNECT_TIMEOUT,
+            "read_timeout_s": READ_TIMEOUT,
+            "calls": calls,
+            "new_connections": _stats["new_connections"],
+            "reused_connections": max(0, calls - _stats["new_connections"]),
+            "avg_connect_ms": _stats["connect_ms"] / calls if calls else 0.0,
+            "avg_model_ms": _stats["model_ms"] / calls if calls else 0.0,
+            "avg_total_ms": _stats["total_ms"] / calls if calls else 0.0,
+            "by_prompt_version": by_prompt,
+        }
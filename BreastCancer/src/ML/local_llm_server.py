@@ -0,0 +1,134 @@
+"""
+OpenAI-compatible stand-in for the extraction LLM, backed by the local rule-based extractor.
+
+Lets the extraction pipeline (backend pool, hedging, streaming, bulk runs)
+be tested and benchmarked offline, without an API key or network access:
+
+    python local_llm_server.py --port 8800
+    python local_llm_server.py --port 8801 --latency-ms 400 --jitter-ms 300 --error-rate 0.05
+
+    EXTRACTION_BACKENDS='[{"name": "local", "kind": "openai", "base_url": "http://127.0.0.1:8800/v1", "model": "local-rules"}]'
+
+Serves POST /v1/chat/completions (also under /openai/v1 so it works as a
+"groq" backend base_url), with or without "stream": true, and GET /v1/models.
+The answer is the JSON object of the 30 features found in the last user
+message (null where nothing was found). Token counts are estimated (~4
+characters per token).
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+from feature_extractor import extract_features_locally
+from scoring import feature_cols
+
+app = Flask(__name__)
+
+# Simulated behaviour, set from the command line
+settings = {"latency_ms": 0.0, "jitter_ms": 0.0, "token_ms": 0.0, "error_rate": 0.0}
+
+LEGACY_TEXT_START = "TEXTE À ANALYSER :"
+LEGACY_TEXT_END = "CLÉS OBLIGATOIRES"
+
+
+def report_text(messages):
+    """Report text of a request: the last user message (unwrapped from the legacy single-message prompt)."""
+    text = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    if LEGACY_TEXT_START in text:
+        text = text.split(LEGACY_TEXT_START, 1)[1].split(LEGACY_TEXT_END, 1)[0]
+    return text.strip()
+
+
+def answer_for(text):
+    features, confidence = extract_features_locally(text)
+    answer = {col: features[col] if confidence[col] > 0 else None for col in feature_cols}
+    return json.dumps(answer)
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def simulate_latency():
+    delay = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+    if delay > 0:
+        time.sleep(delay / 1000.0)
+
+
+@app.route("/v1/models", methods=["GET"])
+@app.route("/openai/v1/models", methods=["GET"])
+def list_models():
+    return jsonify({"object": "list", "data": [{"id": "local-rules", "object": "model", "owned_by": "local"}]})
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+@app.route("/openai/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    body = request.get_json(silent=True) or {}
+    messages = body.get("messages") or []
+    model = body.get("model", "local-rules")
+
+    simulate_latency()
+    if random.random() < settings["error_rate"]:
+        return jsonify({"error": {"message": "Simulated upstream error", "type": "server_error"}}), 503
+
+    content = answer_for(report_text(messages))
+    usage = {
+        "prompt_tokens": sum(estimate_tokens(m.get("content") or "") for m in messages),
+        "completion_tokens": estimate_tokens(content),
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": usage
+        })
+
+    def chunk(delta, finish_reason=None, with_usage=False):
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        if with_usage:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    def generate():
+        yield chunk({"role": "assistant", "content": ""})
+        for i in range(0, len(content), 16):
+            if settings["token_ms"]:
+                time.sleep(settings["token_ms"] / 1000.0)
+            yield chunk({"content": content[i:i + 16]})
+        yield chunk({}, finish_reason="stop", with_usage=True)
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible local stand-in for the extraction LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed delay before each answer")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay (uniform 0..jitter)")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    args = parser.parse_args()
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, token_ms=args.token_ms, error_rate=args.error_rate)
+
+    print(f"🚀 Local LLM stand-in on http://{args.host}:{args.port}/v1 ({settings})")
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,278 @@
+"""
+Versioned schema migrations for breast_cancer_db.
+
+The schema is created and upgraded by this script, run once per deployment
+before (re)starting the server, never by the server itself:
+
+    python migrations.py             # create the database if needed, apply pending migrations
+    python migrations.py --status    # show the current and latest versions
+    python migrations.py --to 2      # apply migrations up to version 2 only
+
+Applied versions are recorded in the `schema_version` table. The server only
+reads MAX(version) once per worker process (Repository.check_schema in
+storage.py) and refuses to serve database requests against an older schema.
+
+Each migration is a function of a cursor, appended to MIGRATIONS with the
+next version number; never edit one that has shipped. MySQL commits DDL
+implicitly, so migrations are written to be re-runnable (IF NOT EXISTS,
+information_schema checks): a migration interrupted halfway is simply
+applied again on the next run. A named lock keeps concurrent runs apart.
+
+With STORAGE_BACKEND=sqlite the same command migrates the embedded
+database instead (SQLITE_PATH, see sqlite_storage.py).
+"""
+import argparse
+import sys
+
+import patient_queries
+import storage
+from storage import SchemaOutdated
+
+DB_NAME = 'breast_cancer_db'
+DB_CONFIG = {
+    'host': '127.0.0.1',  # Use IP instead of localhost
+    'port': 3306,
+    'user': 'root',
+    'password': '',  # Default XAMPP password
+}
+
+DEFAULT_DOCTOR = {'nom': 'Smith', 'prenom': 'John', 'username': '166JMT8965', 'password': 'admin123'}
+
+LOCK_NAME = f"{DB_NAME}.migrations"
+LOCK_TIMEOUT = 60
+
+
+# =====================
+# Helpers
+# =====================
+def _index_exists(cursor, table, name):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, name)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _create_index(cursor, table, name, columns):
+    if not _index_exists(cursor, table, name):
+        print(f"   Creating index {name} on {table}({columns})...")
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+# =====================
+# Migrations
+# =====================
+def _initial_schema(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS medecin (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nom VARCHAR(100) NOT NULL,
+        prenom VARCHAR(100) NOT NULL,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS patient (
+        id_patient VARCHAR(50) PRIMARY KEY,
+        nom VARCHAR(100) NOT NULL,
+        age INT NOT NULL
+    )
+    """)
+    # Consultation (Many-to-Many relationship)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS consultation (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        medecin_id INT,
+        patient_id VARCHAR(50),
+        description TEXT,
+        image_path VARCHAR(255),
+        prediction_status VARCHAR(20),
+        risk_level VARCHAR(20),
+        confidence FLOAT,
+        date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (medecin_id) REFERENCES medecin(id),
+        FOREIGN KEY (patient_id) REFERENCES patient(id_patient)
+    )
+    """)
+    cursor.execute(
+        "INSERT IGNORE INTO medecin (nom, prenom, username, password) VALUES (%(nom)s, %(prenom)s, %(username)s, %(password)s)",
+        DEFAULT_DOCTOR
+    )
+
+
+def _latest_consultation(cursor):
+    # One row per patient for the dashboard list (see patient_queries.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS patient_latest_consultation (
+        patient_id VARCHAR(50) PRIMARY KEY,
+        consultation_id INT NOT NULL,
+        medecin_id INT,
+        date TIMESTAMP NULL,
+        prediction_status VARCHAR(20),
+        risk_level VARCHAR(20),
+        confidence FLOAT,
+        description TEXT,
+        FOREIGN KEY (patient_id) REFERENCES patient(id_patient)
+    )
+    """)
+    _create_index(cursor, "consultation", "idx_consultation_patient_date", "patient_id, date")
+    _create_index(cursor, "patient_latest_consultation", "idx_latest_medecin_patient", "medecin_id, patient_id")
+    _create_index(cursor, "patient_latest_consultation", "idx_latest_risk_patient", "risk_level, patient_id")
+    rows = patient_queries.backfill_latest_consultations(cursor)
+    if rows:
+        print(f"   Backfilled patient_latest_consultation ({rows} rows affected)")
+
+
+def _change_log(cursor):
+    # Change feed of the patient list: a locked counter row orders the sequence numbers
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS change_counter (
+        id TINYINT PRIMARY KEY,
+        seq BIGINT NOT NULL,
+        pruned_through BIGINT NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq BIGINT PRIMARY KEY,
+        patient_id VARCHAR(50) NOT NULL,
+        consultation_id INT,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("INSERT IGNORE INTO change_counter (id, seq) VALUES (1, 0)")
+    _create_index(cursor, "change_log", "idx_change_log_changed_at", "changed_at")
+
+
+def _consultation_write_id(cursor):
+    # Idempotency key of batched / write-behind / imported consultation writes
+    if not _column_exists(cursor, "consultation", "write_id"):
+        cursor.execute("ALTER TABLE consultation ADD COLUMN write_id CHAR(32) NULL")
+    if not _index_exists(cursor, "consultation", "uq_consultation_write_id"):
+        cursor.execute("ALTER TABLE consultation ADD UNIQUE KEY uq_consultation_write_id (write_id)")
+
+
+# (version, description, function) in order
+MIGRATIONS = [
+    (1, "Initial schema: medecin, patient, consultation, default doctor", _initial_schema),
+    (2, "Latest consultation per patient and patient list indexes", _latest_consultation),
+    (3, "Change log for the patient change feed", _change_log),
+    (4, "Consultation write_id idempotency key", _consultation_write_id),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# =====================
+# Runner
+# =====================
+def schema_version(cursor):
+    """Highest applied migration (0 for a database that predates schema_version or is empty)."""
+    import mysql.connector
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+    except mysql.connector.ProgrammingError:
+        return 0  # table does not exist
+    row = cursor.fetchone()
+    value = next(iter(row.values())) if isinstance(row, dict) else row[0]
+    return value or 0
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """
+    Apply pending migrations up to `target` on a connection to the server.
+
+    Creates the database if needed.
+
+    Returns:
+        List of applied versions
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
+    conn.database = DB_NAME
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError(f"Another migration run holds the lock {LOCK_NAME!r}")
+    try:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        current = schema_version(cursor)
+        applied = []
+        for version, description, apply in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+            print(f"🔄 Migration {version}: {description}")
+            apply(cursor)
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (version, description))
+            conn.commit()
+            applied.append(version)
+        return applied
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchone()
+        cursor.close()
+
+
+def connect(database=None, **overrides):
+    """Connection to the MySQL server (optionally selecting `database`)."""
+    import mysql.connector
+    config = dict(DB_CONFIG, **overrides)
+    if database:
+        config['database'] = database
+    return mysql.connector.connect(**config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply breast_cancer_db schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only show the schema version")
+    parser.add_argument("--to", type=int, help="Target version (default: latest)")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], help="Storage backend (default: STORAGE_BACKEND)")
+    parser.add_argument("--prune-change-log-days", type=int,
+                        help="Also delete change feed entries older than this many days")
+    args = parser.parse_args()
+
+    repo = storage.get_repository(args.backend)
+    driver_errors = ()
+    if repo.name == "mysql":
+        import mysql.connector
+        driver_errors = (mysql.connector.Error,)
+    try:
+        if args.status:
+            try:
+                current = repo.schema_version()
+            except SchemaOutdated:
+                current = 0  # the database does not exist yet
+            print(f"Schema version {current} (latest {repo.latest_version}, {repo.name})")
+            for version, description in repo.schema_migrations:
+                print(f"   {'✅' if version <= current else '⏳'} {version}: {description}")
+            return
+
+        applied = repo.migrate(args.to)
+        print(f"✅ Schema up to date (version {repo.schema_version()}, {len(applied)} migration(s) applied)")
+
+        if args.prune_change_log_days is not None:
+            pruned = repo.prune_change_log(args.prune_change_log_days)
+            print(f"🧹 Pruned {pruned} change log entries older than {args.prune_change_log_days} days")
+    except (storage.StorageError, *driver_errors) as err:
+        print(f"❌ Database Error: {err}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Versioned, hot-reloadable registry for the ML model artifacts.
+
+A model version is a directory produced by compile_models.py holding the
+fused kernels (softmax_dso2_fused/, mlp_dso3_fused/, logistic_fused/), the
+source artifacts they were compiled from, and a manifest.json with the
+version name and a sha256 checksum of every file.
+
+    model_versions/
+        CURRENT                 <- name of the active version
+        20260101-120000/
+            manifest.json
+            softmax_dso2_fused/ ...
+
+Each worker polls CURRENT. When it changes, the new version is loaded in a
+background thread (or on a later poll, if another load is still running), verified against its manifest, warmed with a dummy
+batch and then swapped in atomically. Requests already running keep the
+ModelSet they started with, so no request is dropped during a swap.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from fused_models import load_fused_model
+
+MANIFEST_FILE = "manifest.json"
+SOFTMAX_KERNEL = "softmax_dso2_fused"
+MLP_KERNEL = "mlp_dso3_fused"
+LOGISTIC_KERNEL = "logistic_fused"
+
+N_FEATURES = 30
+
+
+class ReloadInProgress(RuntimeError):
+    """A model version is already being loaded in this process."""
+
+
+def _artifact_files(path):
+    """All files of a version directory (relative paths), manifest excluded."""
+    files = []
+    for kernel in (SOFTMAX_KERNEL, MLP_KERNEL, LOGISTIC_KERNEL):
+        kernel_dir = os.path.join(path, kernel)
+        if os.path.isdir(kernel_dir):
+            files.extend(os.path.join(kernel, name) for name in sorted(os.listdir(kernel_dir)))
+    return files
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_checksums(path, extra_files=()):
+    """
+    Compute sha256 checksums for a version directory.
+
+    Returns:
+        (files, checksum): per-file checksums and one combined checksum
+    """
+    files = {rel: _sha256(os.path.join(path, rel)) for rel in list(_artifact_files(path)) + list(extra_files)}
+    combined = hashlib.sha256()
+    for rel in sorted(files):
+        combined.update(f"{rel}:{files[rel]}\n".encode("utf-8"))
+    return files, combined.hexdigest()
+
+
+def write_manifest(path, version=None, source_files=()):
+    """
+    Write manifest.json for a compiled version directory.
+
+    Args:
+        path: Version directory
+        version: Version name (defaults to the first 12 hex chars of the checksum)
+        source_files: Extra files in the directory (source .joblib/.pth) to checksum
+
+    Returns:
+        The manifest dict
+    """
+    files, checksum = compute_checksums(path, source_files)
+    manifest = {
+        "version": version or checksum[:12],
+        "checksum": checksum,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "files": files,
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class ModelSet:
+    """One immutable, fully loaded model version."""
+
+    def __init__(self, version, checksum, path, softmax, mlp, logistic):
+        self.version = version
+        self.checksum = checksum
+        self.path = path
+        self.softmax = softmax
+        self.mlp = mlp
+        self.logistic = logistic
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+
+    def info(self):
+        return {
+            "version": self.version,
+            "checksum": self.checksum,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "models": [name for name, model in
+                       (("softmax_dso2", self.softmax), ("mlp_dso3", self.mlp), ("logistic", self.logistic))
+                       if model is not None],
+        }
+
+
+def load_model_set(path):
+    """
+    Load, verify and warm the model version stored in `path`.
+
+    Raises:
+        ValueError: If a file does not match the checksum in manifest.json
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        files, checksum = compute_checksums(path, [rel for rel in manifest["files"] if rel not in _artifact_files(path)])
+        if checksum != manifest["checksum"]:
+            bad = sorted(rel for rel in set(files) | set(manifest["files"])
+                         if files.get(rel) != manifest["files"].get(rel))
+            raise ValueError(f"Checksum mismatch for model version in {path}: {bad}")
+        version = manifest["version"]
+    else:
+        _, checksum = compute_checksums(path)
+        version = checksum[:12]
+
+    logistic_dir = os.path.join(path, LOGISTIC_KERNEL)
+    model_set = ModelSet(
+        version=version,
+        checksum=checksum,
+        path=path,
+        softmax=load_fused_model(os.path.join(path, SOFTMAX_KERNEL)),
+        mlp=load_fused_model(os.path.join(path, MLP_KERNEL)),
+        logistic=load_fused_model(logistic_dir) if os.path.isdir(logistic_dir) else None,
+    )
+
+    # Warm up: touch every weight page and check the outputs are sane
+    dummy = np.ones((8, N_FEATURES), dtype=np.float32)
+    for model in (model_set.softmax, model_set.mlp, model_set.logistic):
+        if model is None:
+            continue
+        proba = model.predict_proba(dummy)
+        if proba.shape != (8, 2) or not np.all(np.isfinite(proba)):
+            raise ValueError(f"Model warm-up failed for version {version}")
+    return model_set
+
+
+class ModelRegistry:
+    """
+    Holds the active ModelSet and swaps in new versions without downtime.
+
+    Args:
+        default_path: Version directory used when no CURRENT pointer exists
+        versions_dir: Directory holding versions and the CURRENT pointer
+        poll_interval: Seconds between checks of the CURRENT pointer
+    """
+
+    def __init__(self, default_path=".", versions_dir="model_versions", poll_interval=5.0):
+        self.default_path = default_path
+        self.versions_dir = versions_dir
+        self.poll_interval = poll_interval
+        self.pointer_file = os.path.join(versions_dir, "CURRENT")
+        self._current = None
+        self._lock = threading.Lock()
+        self._loading = None
+        self._last_error = None
+        self._pointer_seen = None
+        self._watcher = None
+        self._pid = None
+
+    # ---------- Serving ----------
+    def current(self):
+        """Return the active ModelSet (a plain reference read, safe under concurrency)."""
+        if self._pid != os.getpid():
+            self._start_watcher()
+        return self._current
+
+    # ---------- Loading ----------
+    def _resolve(self, version=None):
+        if version is None:
+            version = self._read_pointer()
+        if not version:
+            return self.default_path
+        path = os.path.join(self.versions_dir, version)
+        if os.path.dirname(os.path.normpath(path)) != os.path.normpath(self.versions_dir) or not os.path.isdir(path):
+            raise ValueError(f"Unknown model version '{version}'")
+        return path
+
+    def _read_pointer(self):
+        try:
+            with open(self.pointer_file, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load_initial(self):
+        """Synchronously load the version named by CURRENT (or the default path)."""
+        self._pointer_seen = self._read_pointer()
+        self._swap(load_model_set(self._resolve(self._pointer_seen)))
+        self._pid = None
+        return self._current
+
+    def _swap(self, model_set):
+        with self._lock:
+            previous = self._current
+            self._current = model_set
+        if previous is not None:
+            print(f"🔄 Model version {previous.version} -> {model_set.version}")
+        return model_set
+
+    def reload_async(self, version=None):
+        """
+        Load a version in a background thread, then swap it in.
+
+        Returns:
+            False if a reload is already running, True otherwise
+        """
+        path = self._resolve(version)
+        if not self._claim(path):
+            return False
+        self._start_load(path)
+        return True
+
+    def activate(self, version):
+        """
+        Point CURRENT at `version` (all workers follow) and reload this worker now.
+
+        Raises:
+            ValueError: If the version does not exist
+            ReloadInProgress: If this worker is still loading another version
+                (CURRENT is left unchanged)
+        """
+        path = self._resolve(version)
+        if not self._claim(path):
+            raise ReloadInProgress(f"Model version {self._loading} is still loading, retry shortly")
+        try:
+            os.makedirs(self.versions_dir, exist_ok=True)
+            tmp = self.pointer_file + f".{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(tmp, self.pointer_file)
+        except OSError:
+            self._release()
+            raise
+        self._pointer_seen = version
+        self._start_load(path)
+
+    def _claim(self, path):
+        with self._lock:
+            if self._loading is not None:
+                return False
+            self._loading = path
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._loading = None
+
+    def _start_load(self, path):
+        def run():
+            try:
+                start = time.perf_counter()
+                model_set = load_model_set(path)
+                self._swap(model_set)
+                self._last_error = None
+                print(f"✅ Model version {model_set.version} loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+            except Exception as e:
+                self._last_error = f"{path}: {e}"
+                print(f"⚠️ Model reload failed, keeping {self._current.version if self._current else None}: {e}")
+            finally:
+                self._release()
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+
+    # ---------- Watching ----------
+    def _start_watcher(self):
+        # Threads do not survive fork(): start one watcher per process
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._loading = None
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            pointer = self._read_pointer()
+            if pointer == self._pointer_seen:
+                continue
+            try:
+                # While another load runs the change stays unseen and is picked up on a later poll
+                if self.reload_async(pointer):
+                    self._pointer_seen = pointer
+            except ValueError as e:
+                self._last_error = str(e)
+
+    def status(self):
+        current = self._current
+        return {
+            "current": current.info() if current else None,
+            "loading": self._loading,
+            "last_error": self._last_error,
+            "available": sorted(
+                name for name in (os.listdir(self.versions_dir) if os.path.isdir(self.versions_dir) else [])
+                if os.path.isdir(os.path.join(self.versions_dir, name))
+            ),
+        }
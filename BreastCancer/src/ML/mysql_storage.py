@@ -0,0 +1,230 @@
+"""
+MySQL storage backend (STORAGE_BACKEND=mysql).
+
+Connections are pooled per worker process (see db_pool.py). Size the pool
+to the worker's request threads; MySQL then sees at most
+GUNICORN_WORKERS x DB_POOL_SIZE connections. The schema is created and
+upgraded by migrations.py, run as a separate deployment step: the
+repository never runs DDL on its own and does not touch MySQL until the
+first query.
+"""
+import os
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errorcode
+
+import migrations
+import patient_queries
+from db_pool import ConnectionPool
+from storage import Repository, RejectedData, SchemaOutdated, StorageUnavailable
+
+PATIENT_UPSERT = """
+    INSERT INTO patient (id_patient, nom, age) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE nom = VALUES(nom), age = VALUES(age)
+"""
+
+# A replayed write_id matches the unique key and is left untouched
+CONSULTATION_INSERT = """
+    INSERT INTO consultation
+        (write_id, medecin_id, patient_id, description, image_path, prediction_status, risk_level, confidence, date)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE id = id
+"""
+
+
+def write_consultations(cursor, records):
+    """
+    Write validated consultations in the caller's transaction (the caller commits).
+
+    It makes a fixed number of round trips however large the batch is:
+    patients are upserted with INSERT ... ON DUPLICATE KEY UPDATE,
+    consultations are inserted with executemany, and the latest-consultation
+    table and change log are updated (see patient_queries.py).
+
+    Records whose write_id is already stored (a replayed batch) are not
+    written again: their patient is not updated and no change is logged,
+    so a replay never overwrites newer data or bumps the change sequence.
+
+    Args:
+        cursor: Plain (tuple) MySQL cursor
+        records: Records from validate_consultation, in save order
+
+    Returns:
+        dict mapping write_id to consultation id (new and already stored)
+    """
+    if not records:
+        return {}
+    write_ids = list(dict.fromkeys(r["write_id"] for r in records))
+    # Locks the existing rows and the key gaps: a concurrent replay of the same
+    # write_ids waits here (or deadlocks and retries) instead of logging them twice
+    cursor.execute(
+        f"SELECT write_id, id FROM consultation WHERE write_id IN ({', '.join(['%s'] * len(write_ids))}) FOR UPDATE",
+        write_ids
+    )
+    saved = dict(cursor.fetchall())
+    fresh = {}
+    for r in records:
+        if r["write_id"] not in saved:
+            fresh.setdefault(r["write_id"], r)
+    new = list(fresh.values())
+    if not new:
+        return saved
+
+    # Last save wins for a patient saved several times in the batch
+    patients = {r["patient_id"]: (r["patient_id"], r["patient_name"], r["patient_age"]) for r in new}
+    cursor.executemany(PATIENT_UPSERT, list(patients.values()))
+    cursor.executemany(CONSULTATION_INSERT, [
+        (r["write_id"], r["doctor_id"], r["patient_id"], r["description"], r["image_path"],
+         r["prediction_status"], r["risk_level"], r["confidence"], r["date"])
+        for r in new
+    ])
+
+    new_ids = [r["write_id"] for r in new]
+    cursor.execute(
+        f"SELECT write_id, id, patient_id FROM consultation WHERE write_id IN ({', '.join(['%s'] * len(new_ids))})",
+        new_ids
+    )
+    rows = sorted(cursor.fetchall(), key=lambda row: row[1])
+    patient_queries.record_latest_consultations(cursor, [row[1] for row in rows])
+    patient_queries.record_changes(cursor, [(row[2], row[1]) for row in rows])
+    saved.update((row[0], row[1]) for row in rows)
+    return saved
+
+
+class MySQLRepository(Repository):
+    """
+    Repository on a MySQL server through a ConnectionPool.
+
+    Args:
+        pool: ConnectionPool of connections to breast_cancer_db
+    """
+
+    name = "mysql"
+    schema_migrations = [(version, description) for version, description, _ in migrations.MIGRATIONS]
+
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+
+    @classmethod
+    def from_env(cls):
+        return cls(ConnectionPool(
+            migrations.DB_NAME,
+            dict(
+                migrations.DB_CONFIG,
+                database=migrations.DB_NAME,
+                connection_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+            ),
+            size=int(os.getenv("DB_POOL_SIZE", os.getenv("GUNICORN_THREADS", "8"))),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            max_wait_ms=float(os.getenv("DB_POOL_MAX_WAIT_MS", "2000")),
+            max_waiters=int(os.getenv("DB_POOL_MAX_WAITERS", "16")),
+            validate_after=float(os.getenv("DB_POOL_VALIDATE_AFTER", "5"))
+        ))
+
+    @contextmanager
+    def _cursor(self, dictionary=True, commit=False, check=True):
+        """
+        Cursor on a pooled connection, returned to the pool on exit (uncommitted work is rolled back).
+
+        Raises:
+            PoolExhausted: If every connection stays busy past the wait budget
+            StorageUnavailable: If MySQL cannot be reached
+            RejectedData: If MySQL rejects the data (IntegrityError, DataError)
+        """
+        if check:
+            self.check_schema()
+        try:
+            conn = self.pool.connection()
+        except mysql.connector.Error as err:
+            if err.errno == errorcode.ER_BAD_DB_ERROR:
+                raise SchemaOutdated(f"Database {migrations.DB_NAME} does not exist: run 'python migrations.py'")
+            raise StorageUnavailable(f"MySQL connection failed: {err}") from err
+        try:
+            cursor = conn.cursor(dictionary=dictionary)
+            yield cursor
+            if commit:
+                conn.commit()
+            cursor.close()
+        except (mysql.connector.IntegrityError, mysql.connector.DataError) as err:
+            raise RejectedData(str(err)) from err
+        except (mysql.connector.InterfaceError, mysql.connector.OperationalError) as err:
+            raise StorageUnavailable(f"MySQL error: {err}") from err
+        finally:
+            conn.close()
+
+    # ---------- Schema ----------
+    def schema_version(self):
+        with self._cursor(dictionary=False, check=False) as cursor:
+            return migrations.schema_version(cursor)
+
+    def migrate(self, target=None):
+        try:
+            conn = migrations.connect()
+        except mysql.connector.Error as err:
+            raise StorageUnavailable(f"MySQL connection failed: {err}") from err
+        try:
+            return migrations.migrate(conn, target or self.latest_version)
+        finally:
+            conn.close()
+
+    # ---------- Doctors ----------
+    def find_doctor(self, username):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM medecin WHERE username = %s", (username,))
+            return cursor.fetchone()
+
+    def list_doctors(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM medecin ORDER BY id")
+            return cursor.fetchall()
+
+    def reset_doctor(self, doctor):
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(
+                "INSERT INTO medecin (nom, prenom, username, password) "
+                "VALUES (%(nom)s, %(prenom)s, %(username)s, %(password)s) "
+                "ON DUPLICATE KEY UPDATE nom = VALUES(nom), prenom = VALUES(prenom), password = VALUES(password)",
+                doctor
+            )
+
+    # ---------- Patients and consultations ----------
+    def patient_exists(self, patient_id):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT 1 AS found FROM patient WHERE id_patient = %s", (patient_id,))
+            return cursor.fetchone() is not None
+
+    def list_patients(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM patient ORDER BY id_patient")
+            return cursor.fetchall()
+
+    def list_consultations(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM consultation ORDER BY id")
+            return cursor.fetchall()
+
+    def save_consultations(self, records):
+        with self._cursor(dictionary=False, commit=True) as cursor:
+            return write_consultations(cursor, records)
+
+    def patients_page(self, after=None, limit=patient_queries.DEFAULT_PAGE_SIZE, doctor_id=None, risk_level=None):
+        with self._cursor() as cursor:
+            return patient_queries.fetch_patients_page(cursor, after, limit, doctor_id, risk_level)
+
+    # ---------- Change feed ----------
+    def change_seq(self):
+        with self._cursor() as cursor:
+            return patient_queries.current_change_seq(cursor)
+
+    def changes(self, since, limit=patient_queries.MAX_CHANGES):
+        with self._cursor() as cursor:
+            return patient_queries.fetch_changes(cursor, since, limit)
+
+    def prune_change_log(self, keep_days):
+        with self._cursor(dictionary=False, commit=True) as cursor:
+            return patient_queries.prune_change_log(cursor, keep_days)
+
+    def stats(self):
+        return {"backend": self.name, **self.pool.stats()}
@@ -0,0 +1,256 @@
+"""
+Patient list queries backed by a maintained latest-consultation table.
+
+`patient_latest_consultation` holds one row per patient: a copy of that
+patient's most recent consultation. It is written in the same transaction
+as every consultation insert (record_latest_consultations), so the dashboard
+list never aggregates over the whole consultation history:
+
+    consultation (append-only history)  --upsert-->  patient_latest_consultation
+
+The list is served with keyset pagination on the patient id: each page is
+an index range scan starting after the previous page's last id, so its cost
+does not grow with the number of patients or consultations.
+
+Every write also appends to `change_log` under a monotonic sequence number
+(record_changes). Sequence numbers come from a single counter row that stays
+locked until the writing transaction commits, so they become visible in
+order: a client that has seen seq N can ask for "everything after N"
+(fetch_changes) without missing a slower concurrent write. The current
+sequence also versions the whole list (ETag).
+
+The tables are created by migrations.py (MySQL). The read queries are
+shared with the SQLite backend (sqlite_storage.py), which has its own
+versions of the writes.
+"""
+from storage import ResyncRequired
+
+LATEST_COLUMNS = "patient_id, consultation_id, medecin_id, date, prediction_status, risk_level, confidence, description"
+
+# Only move forward: an older consultation (e.g. back-dated sample data) never
+# replaces a newer one. The guard compares against the stored (date, id), so
+# those two are assigned last (MySQL evaluates assignments left to right).
+# Target columns are qualified: consultation has columns of the same names.
+_NEWER = ("(VALUES(date), VALUES(consultation_id)) >= "
+          "(patient_latest_consultation.date, patient_latest_consultation.consultation_id)")
+_GUARDED_ASSIGNMENTS = ",\n    ".join(
+    f"{col} = IF({_NEWER}, VALUES({col}), patient_latest_consultation.{col})"
+    for col in ["medecin_id", "prediction_status", "risk_level", "confidence", "description", "consultation_id", "date"]
+)
+_UPSERT_LATEST = f"""
+INSERT INTO patient_latest_consultation ({LATEST_COLUMNS})
+SELECT patient_id, id, medecin_id, date, prediction_status, risk_level, confidence, description
+FROM consultation
+{{where}}
+ON DUPLICATE KEY UPDATE
+    {_GUARDED_ASSIGNMENTS}
+"""
+
+_PATIENT_SELECT = """
+    SELECT
+        p.id_patient,
+        p.nom,
+        p.age,
+        l.date AS last_visit,
+        l.prediction_status,
+        l.risk_level,
+        l.confidence,
+        l.description
+"""
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+MAX_CHANGES = 1000
+
+
+def backfill_latest_consultations(cursor):
+    """Fill patient_latest_consultation from the whole consultation history (schema migration)."""
+    cursor.execute(_UPSERT_LATEST.format(where=""))
+    return cursor.rowcount
+
+
+def record_latest_consultations(cursor, consultation_ids):
+    """Fold newly inserted consultations into patient_latest_consultation, in one statement (same transaction as the insert)."""
+    if not consultation_ids:
+        return
+    ids = sorted(consultation_ids)
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(_UPSERT_LATEST.format(where=f"WHERE id IN ({placeholders}) ORDER BY id"), ids)
+
+
+def parse_page_args(args):
+    """
+    Read keyset pagination parameters from a request's query string.
+
+    Returns:
+        dict with after, limit, doctor_id and risk_level
+
+    Raises:
+        ValueError: If limit or doctor_id is not a valid integer
+    """
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    doctor_id = args.get("doctor_id")
+    return {
+        "after": args.get("cursor") or None,
+        "limit": min(limit, MAX_PAGE_SIZE),
+        "doctor_id": int(doctor_id) if doctor_id not in (None, "") else None,
+        "risk_level": args.get("risk_level") or None,
+    }
+
+
+def fetch_patients_page(cursor, after=None, limit=DEFAULT_PAGE_SIZE, doctor_id=None, risk_level=None):
+    """
+    One page of patients with their latest consultation, ordered by patient id.
+
+    Args:
+        cursor: Dictionary cursor
+        after: Return patients whose id sorts after this one (the previous page's next_cursor)
+        limit: Page size
+        doctor_id: Only patients whose latest consultation was with this doctor
+        risk_level: Only patients whose latest consultation has this risk level
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    filters, params = [], []
+    if doctor_id is not None:
+        filters.append("l.medecin_id = %s")
+        params.append(doctor_id)
+    if risk_level is not None:
+        filters.append("l.risk_level = %s")
+        params.append(risk_level)
+
+    if filters:
+        # Filtered lists are driven by the latest table's (filter, patient_id) indexes
+        key = "l.patient_id"
+        source = "patient_latest_consultation l JOIN patient p ON p.id_patient = l.patient_id"
+    else:
+        key = "p.id_patient"
+        source = "patient p LEFT JOIN patient_latest_consultation l ON l.patient_id = p.id_patient"
+    if after is not None:
+        filters.append(f"{key} > %s")
+        params.append(after)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    # One extra row tells whether another page follows
+    cursor.execute(f"""
+        {_PATIENT_SELECT}
+        FROM {source}
+        {where}
+        ORDER BY {key}
+        LIMIT %s
+    """, (*params, limit + 1))
+    rows = cursor.fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id_patient"]
+    return rows, None
+
+
+# =====================
+# Change feed
+# =====================
+def record_changes(cursor, changes):
+    """
+    Append changes, a list of (patient_id, consultation_id), to the change log with one counter update.
+
+    Call it last in the writing transaction: the counter row stays locked
+    until commit, which serializes writers for that short window.
+    """
+    if not changes:
+        return
+    cursor.execute("UPDATE change_counter SET seq = LAST_INSERT_ID(seq + %s) WHERE id = 1", (len(changes),))
+    cursor.execute("SELECT LAST_INSERT_ID()")
+    last = _scalar(cursor)
+    first = last - len(changes) + 1
+    cursor.executemany(
+        "INSERT INTO change_log (seq, patient_id, consultation_id) VALUES (%s, %s, %s)",
+        [(first + i, patient_id, consultation_id) for i, (patient_id, consultation_id) in enumerate(changes)]
+    )
+
+
+def _scalar(cursor):
+    # First column of the next row, for plain and dictionary cursors alike
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def current_change_seq(cursor):
+    """Sequence number of the last committed change (0 if none)."""
+    cursor.execute("SELECT seq FROM change_counter WHERE id = 1")
+    return _scalar(cursor) or 0
+
+
+def prune_change_log(cursor, keep_days):
+    """Delete change log entries older than keep_days; clients behind the pruned range must resync."""
+    cursor.execute("SELECT MAX(seq) FROM change_log WHERE changed_at < NOW() - INTERVAL %s DAY", (keep_days,))
+    pruned_through = _scalar(cursor)
+    if pruned_through is None:
+        return 0
+    cursor.execute("DELETE FROM change_log WHERE seq <= %s", (pruned_through,))
+    deleted = cursor.rowcount
+    cursor.execute("UPDATE change_counter SET pruned_through = GREATEST(pruned_through, %s) WHERE id = 1",
+                   (pruned_through,))
+    return deleted
+
+
+def fetch_changes(cursor, since, limit=MAX_CHANGES):
+    """
+    Patients and consultations changed after change sequence `since`.
+
+    Args:
+        cursor: Dictionary cursor
+        since: Last change sequence the client has applied
+        limit: Maximum change log entries to read
+
+    Returns:
+        dict with patients (current list rows of the changed patients),
+        consultations (the new or updated consultations), next_cursor (the
+        sequence to pass next time) and has_more
+
+    Raises:
+        ResyncRequired: If entries after `since` were already pruned
+    """
+    cursor.execute("SELECT seq, pruned_through FROM change_counter WHERE id = 1")
+    counter = cursor.fetchone() or {"seq": 0, "pruned_through": 0}
+    if since < counter["pruned_through"] or since > counter["seq"]:
+        raise ResyncRequired(f"Change cursor {since} is outside the retained log "
+                             f"({counter['pruned_through']}..{counter['seq']})")
+
+    cursor.execute(
+        "SELECT seq, patient_id, consultation_id FROM change_log WHERE seq > %s ORDER BY seq LIMIT %s",
+        (since, limit + 1)
+    )
+    entries = cursor.fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return {"patients": [], "consultations": [], "next_cursor": since, "has_more": False}
+
+    patient_ids = list(dict.fromkeys(e["patient_id"] for e in entries))
+    consultation_ids = list(dict.fromkeys(e["consultation_id"] for e in entries if e["consultation_id"] is not None))
+
+    cursor.execute(f"""
+        {_PATIENT_SELECT}
+        FROM patient p LEFT JOIN patient_latest_consultation l ON l.patient_id = p.id_patient
+        WHERE p.id_patient IN ({", ".join(["%s"] * len(patient_ids))})
+        ORDER BY p.id_patient
+    """, patient_ids)
+    patients = cursor.fetchall()
+
+    consultations = []
+    if consultation_ids:
+        cursor.execute(f"""
+            SELECT id, patient_id, medecin_id, date, prediction_status, risk_level, confidence, description
+            FROM consultation
+            WHERE id IN ({", ".join(["%s"] * len(consultation_ids))})
+            ORDER BY id
+        """, consultation_ids)
+        consultations = cursor.fetchall()
+
+    return {"patients": patients, "consultations": consultations,
+            "next_cursor": entries[-1]["seq"], "has_more": has_more}
@@ -0,0 +1,63 @@
+"""
+Process memory and startup timing helpers for the gunicorn serving mode.
+"""
+import os
+import time
+
+# Reset by gunicorn's post_fork hook so each worker measures from its own fork
+_process_started = time.perf_counter()
+_first_request_seen = False
+
+
+def mark_process_start():
+    """Restart the boot clock (called in each worker right after fork)."""
+    global _process_started, _first_request_seen
+    _process_started = time.perf_counter()
+    _first_request_seen = False
+
+
+def seconds_since_start():
+    return time.perf_counter() - _process_started
+
+
+def memory_usage():
+    """
+    Memory usage of the current process in MB.
+
+    On Linux, reads /proc/self/smaps_rollup, which splits resident memory into
+    pages private to this process (USS) and pages shared with others (for
+    example weights preloaded by the gunicorn master or memory-mapped .npy
+    files). Elsewhere, falls back to the peak RSS from getrusage when available.
+    """
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024.0
+        private = fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+        shared = fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0)
+        return {"rss_mb": fields.get("Rss", 0.0), "pss_mb": fields.get("Pss", 0.0),
+                "private_mb": private, "shared_mb": shared}
+    except OSError:
+        pass
+    try:
+        import resource  # Unix only
+        return {"rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+    except ImportError:
+        return {}
+
+
+def format_memory(usage):
+    return ", ".join(f"{k.replace('_mb', '')}={v:.1f}MB" for k, v in usage.items())
+
+
+def report_first_request():
+    """Print time-to-first-request and memory the first time a worker serves a request."""
+    global _first_request_seen
+    if _first_request_seen:
+        return
+    _first_request_seen = True
+    print(f"⏱️ [pid {os.getpid()}] first request after {seconds_since_start() * 1000:.1f} ms "
+          f"({format_memory(memory_usage())})")
@@ -55,3 +55,4 @@ joblib.dump(mlp, 'mlp_perfect_dso3_model.joblib')
 print("✅ mlp_perfect_dso3_model.joblib saved")
 
 print("\n✅ All models regenerated successfully!")
+print("ℹ️ Run 'python compile_models.py' to rebuild the fused serving kernels.")
@@ -1,45 +1,33 @@
-import mysql.connector
 import sys
 
+import migrations
+import storage
+
+doctor = migrations.DEFAULT_DOCTOR
+
 try:
+    # STORAGE_BACKEND selects MySQL (default) or the embedded SQLite database
     print("Connecting to DB...")
-    conn = mysql.connector.connect(
-        host='127.0.0.1',
-        port=3306,
-        user='root',
-        password='',
-        database='breast_cancer_db'
-    )
-    cursor = conn.cursor()
+    repo = storage.get_repository()
     
-    print("Resetting user '166JMT8965'...")
-    cursor.execute("DELETE FROM medecin WHERE username = '166JMT8965'")
-    conn.commit()
-    
-    print("Creating user with clean password...")
-    # Using explicit values, no extra spaces
-    cursor.execute("""
-        INSERT INTO medecin (nom, prenom, username, password) 
-        VALUES ('Smith', 'John', '166JMT8965', 'admin123')
-    """)
-    conn.commit()
+    print(f"Resetting user '{doctor['username']}' with clean password...")
+    # Update in place (consultations keep referencing the doctor) or create, using explicit values, no extra spaces
+    repo.reset_doctor(doctor)
     
     print("Verifying...")
-    cursor.execute("SELECT username, password FROM medecin WHERE username = '166JMT8965'")
-    row = cursor.fetchone()
+    row = repo.find_doctor(doctor['username'])
     if row:
-        u, p = row
+        u, p = row['username'], row['password']
         print(f"User in DB: '{u}'")
         print(f"Pass in DB: '{p}'")
         
-        if u == '166JMT8965' and p == 'admin123':
+        if u == doctor['username'] and p == doctor['password']:
              print("SUCCESS: Credentials verified perfectly.")
         else:
              print("WARNING: retrieved values do not match expected!")
     else:
         print("ERROR: User not found after insertion!")
 
-    conn.close()
-
 except Exception as e:
     print(f"Error: {e}")
+    sys.exit(1)
@@ -0,0 +1,67 @@
+"""
+Feature layout and prediction blocks shared by the API (app.py) and the
+offline pipelines (bulk_extract.py).
+"""
+import numpy as np
+
+# The 30 breast cancer features, in model input order
+feature_cols = [
+    'radius_mean', 'texture_mean', 'perimeter_mean', 'area_mean', 'smoothness_mean',
+    'compactness_mean', 'concavity_mean', 'concave points_mean', 'symmetry_mean', 'fractal_dimension_mean',
+    'radius_se', 'texture_se', 'perimeter_se', 'area_se', 'smoothness_se',
+    'compactness_se', 'concavity_se', 'concave points_se', 'symmetry_se', 'fractal_dimension_se',
+    'radius_worst', 'texture_worst', 'perimeter_worst', 'area_worst', 'smoothness_worst',
+    'compactness_worst', 'concavity_worst', 'concave points_worst', 'symmetry_worst', 'fractal_dimension_worst'
+]
+
+
+def features_to_matrix(feature_dicts):
+    """Convert extracted feature dicts into a raw (N, 30) matrix (missing features -> 0)."""
+    X = np.zeros((len(feature_dicts), len(feature_cols)), dtype=np.float32)
+    for i, features in enumerate(feature_dicts):
+        for j, col in enumerate(feature_cols):
+            value = features.get(col)
+            if value is not None:
+                X[i, j] = value
+    return X
+
+
+def get_risk_level(risk_score):
+    """Map an MLP malignancy score to (risk_level, french_level, recommendation, color)."""
+    if risk_score <= 0.3:
+        return "Low", "Faible risque", "Pas d'urgence – suivi standard recommandé", "green"
+    elif risk_score < 0.7:
+        return "Medium", "Risque intermédiaire", "Évaluation complémentaire conseillée rapidement", "orange"
+    else:
+        return "High", "Risque élevé", "Urgence – prise en charge rapide recommandée", "red"
+
+
+def softmax_prediction(proba):
+    """Prediction block of the Softmax (DSO2) extraction endpoints."""
+    pred_class = int(np.argmax(proba))
+    return {
+        "class": pred_class,
+        "diagnosis": "Benign" if pred_class == 0 else "Malignant",
+        "probability_class0": float(proba[0]),
+        "probability_class1": float(proba[1]),
+        "confidence": float(max(proba[0], proba[1]) * 100)
+    }
+
+
+def mlp_prediction(proba):
+    """Prediction block of the MLP (DSO3) extraction endpoints."""
+    pred = int(np.argmax(proba))
+    risk_score = proba[1]
+    risk_level, french_level, recommendation, color = get_risk_level(risk_score)
+    return {
+        "class": pred,
+        "diagnosis": "Benign" if pred == 0 else "Malignant",
+        "risk_score": float(risk_score),
+        "risk_level_en": risk_level,
+        "risk_level_fr": french_level,
+        "recommendation_fr": recommendation,
+        "color": color,
+        "probability_class0": float(proba[0]),
+        "probability_class1": float(proba[1]),
+        "confidence": float(max(proba[0], proba[1]) * 100)
+    }
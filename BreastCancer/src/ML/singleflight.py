@@ -0,0 +1,93 @@
+"""
+Single-flight execution: concurrent calls with the same key share one run.
+
+The first caller for a key (the leader) runs the work; callers arriving
+while it is in flight wait on the leader's Future and receive the same
+result (or exception) instead of repeating the work.
+"""
+import os
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work by key within a process.
+
+    Args:
+        name: Label used in stats
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._pid = os.getpid()
+        self.leaders = 0
+        self.shared = 0
+
+    def begin(self, key):
+        """
+        Join or start the flight for `key`.
+
+        Returns:
+            (future, is_leader). The leader must call finish(key, ...) exactly
+            once; other callers wait on future.result().
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Futures of the parent's threads never complete in a forked child
+                self._inflight = {}
+                self._pid = os.getpid()
+            future = self._inflight.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        """Publish the leader's result (or exception) to the waiting callers."""
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is None:
+            return
+        if error is not None and not isinstance(error, Exception):
+            # e.g. GeneratorExit when a streaming leader is closed: waiters get a plain error
+            error = RuntimeError(f"{self.name}: leading call was cancelled ({type(error).__name__})")
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Returns:
+            (result, shared) where shared is True if the result came from another caller's run
+        """
+        future, is_leader = self.begin(key)
+        if not is_leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result=result)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        calls = self.leaders + self.shared
+        return {
+            "name": self.name,
+            "inflight": inflight,
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "dedup_rate": self.shared / calls if calls else 0.0,
+        }
@@ -0,0 +1,415 @@
+"""
+Embedded SQLite storage backend (STORAGE_BACKEND=sqlite).
+
+The whole database is one local file in WAL mode: readers never block the
+writer and vice versa, every gunicorn worker opens it directly, and a query
+is a function call instead of a round trip to a MySQL server. Meant for
+single-clinic deployments and for running the server, load tests and CI
+fully offline.
+
+The schema mirrors migrations.py version for version (same tables, same
+indexes, same schema_version bookkeeping). The patient list and change
+feed reads are the very queries of patient_queries.py (written with %s
+placeholders, translated here); only the writes use SQLite's own upsert
+syntax. Writes take the database write lock up front (BEGIN IMMEDIATE),
+which also orders the change log sequence numbers.
+
+Requires SQLite 3.24+ (upsert), bundled with every supported Python.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import migrations
+import patient_queries
+from storage import Repository, RejectedData, StorageUnavailable
+
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+
+# Dates are stored as 'YYYY-MM-DD HH:MM:SS' text (which sorts chronologically)
+# and returned as datetime, like the MySQL driver does
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+_NOW = "(datetime('now', 'localtime'))"
+
+
+# =====================
+# Migrations (same versions as migrations.py)
+# =====================
+def _initial_schema(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS medecin (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom VARCHAR(100) NOT NULL,
+        prenom VARCHAR(100) NOT NULL,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS patient (
+        id_patient VARCHAR(50) PRIMARY KEY,
+        nom VARCHAR(100) NOT NULL,
+        age INT NOT NULL
+    )
+    """)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS consultation (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        medecin_id INT,
+        patient_id VARCHAR(50),
+        description TEXT,
+        image_path VARCHAR(255),
+        prediction_status VARCHAR(20),
+        risk_level VARCHAR(20),
+        confidence FLOAT,
+        date TIMESTAMP DEFAULT {_NOW},
+        FOREIGN KEY (medecin_id) REFERENCES medecin(id),
+        FOREIGN KEY (patient_id) REFERENCES patient(id_patient)
+    )
+    """)
+    cursor.execute(
+        "INSERT OR IGNORE INTO medecin (nom, prenom, username, password) VALUES (:nom, :prenom, :username, :password)",
+        migrations.DEFAULT_DOCTOR
+    )
+
+
+def _latest_consultation(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS patient_latest_consultation (
+        patient_id VARCHAR(50) PRIMARY KEY,
+        consultation_id INT NOT NULL,
+        medecin_id INT,
+        date TIMESTAMP NULL,
+        prediction_status VARCHAR(20),
+        risk_level VARCHAR(20),
+        confidence FLOAT,
+        description TEXT,
+        FOREIGN KEY (patient_id) REFERENCES patient(id_patient)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_consultation_patient_date ON consultation (patient_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_medecin_patient "
+                   "ON patient_latest_consultation (medecin_id, patient_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_latest_risk_patient "
+                   "ON patient_latest_consultation (risk_level, patient_id)")
+    cursor.execute(_UPSERT_LATEST.format(where="true"))
+
+
+def _change_log(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS change_counter (
+        id INTEGER PRIMARY KEY,
+        seq BIGINT NOT NULL,
+        pruned_through BIGINT NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY,
+        patient_id VARCHAR(50) NOT NULL,
+        consultation_id INT,
+        changed_at TIMESTAMP DEFAULT {_NOW}
+    )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO change_counter (id, seq) VALUES (1, 0)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log (changed_at)")
+
+
+def _consultation_write_id(cursor):
+    cursor.execute("ALTER TABLE consultation ADD COLUMN write_id CHAR(32) NULL")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_consultation_write_id ON consultation (write_id)")
+
+
+MIGRATIONS = [
+    (version, description, apply)
+    for (version, description, _), apply in zip(
+        migrations.MIGRATIONS, [_initial_schema, _latest_consultation, _change_log, _consultation_write_id]
+    )
+]
+
+
+# =====================
+# Writes
+# =====================
+# Same guard as patient_queries._UPSERT_LATEST: only move forward. The WHERE
+# clause of the SELECT is mandatory before ON CONFLICT (parser ambiguity).
+_UPSERT_LATEST = f"""
+INSERT INTO patient_latest_consultation ({patient_queries.LATEST_COLUMNS})
+SELECT patient_id, id, medecin_id, date, prediction_status, risk_level, confidence, description
+FROM consultation
+WHERE {{where}}
+ORDER BY id
+ON CONFLICT (patient_id) DO UPDATE SET
+    {", ".join(f"{col} = excluded.{col}" for col in patient_queries.LATEST_COLUMNS.split(", ")[1:])}
+WHERE (excluded.date, excluded.consultation_id) >=
+      (patient_latest_consultation.date, patient_latest_consultation.consultation_id)
+"""
+
+PATIENT_UPSERT = """
+    INSERT INTO patient (id_patient, nom, age) VALUES (?, ?, ?)
+    ON CONFLICT (id_patient) DO UPDATE SET nom = excluded.nom, age = excluded.age
+"""
+
+# A replayed write_id matches the unique index and is left untouched
+CONSULTATION_INSERT = """
+    INSERT INTO consultation
+        (write_id, medecin_id, patient_id, description, image_path, prediction_status, risk_level, confidence, date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (write_id) DO NOTHING
+"""
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class _Cursor:
+    """sqlite3 cursor that also accepts the %s placeholders of the shared queries (patient_queries.py)."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace("%s", "?"), params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(sql.replace("%s", "?"), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class SQLiteRepository(Repository):
+    """
+    Repository on an embedded SQLite database file.
+
+    Args:
+        path: Database file (created by migrate())
+        busy_timeout: Seconds a write waits for the write lock held by another thread or process
+    """
+
+    name = "sqlite"
+    schema_migrations = [(version, description) for version, description, _ in MIGRATIONS]
+
+    def __init__(self, path, busy_timeout=SQLITE_BUSY_TIMEOUT):
+        super().__init__()
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            try:
+                conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                       detect_types=sqlite3.PARSE_DECLTYPES)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA foreign_keys=ON")
+            except sqlite3.Error as err:
+                raise StorageUnavailable(f"Cannot open SQLite database {self.path}: {err}") from err
+            conn.row_factory = _dict_row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _cursor(self, write=False, check=True):
+        """
+        Cursor in a transaction, committed on exit (rolled back on error).
+
+        Reads run in one deferred transaction (a consistent snapshot); writes
+        take the write lock at BEGIN, so they never fail halfway on a lock upgrade.
+
+        Raises:
+            StorageUnavailable: If the database is locked past busy_timeout or cannot be opened
+            RejectedData: If a constraint rejects the data
+        """
+        if check:
+            self.check_schema()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield _Cursor(conn.cursor())
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        except sqlite3.IntegrityError as err:
+            raise RejectedData(str(err)) from err
+        except sqlite3.OperationalError as err:
+            raise StorageUnavailable(f"SQLite error: {err}") from err
+
+    # ---------- Schema ----------
+    def schema_version(self):
+        with self._cursor(check=False) as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+            if cursor.fetchone() is None:
+                return 0
+            cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+            return cursor.fetchone()["version"] or 0
+
+    def migrate(self, target=None):
+        """Apply pending migrations, each in its own transaction (SQLite DDL is transactional)."""
+        target = target or self.latest_version
+        applied = []
+        for version, description, apply in MIGRATIONS:
+            if version > target:
+                break
+            with self._cursor(write=True, check=False) as cursor:
+                cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT {_NOW}
+                )
+                """)
+                # Checked under the write lock: concurrent runs apply each migration once
+                cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+                if cursor.fetchone() is not None:
+                    continue
+                print(f"🔄 Migration {version}: {description}")
+                apply(cursor)
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                               (version, description))
+            applied.append(version)
+        return applied
+
+    # ---------- Doctors ----------
+    def find_doctor(self, username):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM medecin WHERE username = ?", (username,))
+            return cursor.fetchone()
+
+    def list_doctors(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM medecin ORDER BY id")
+            return cursor.fetchall()
+
+    def reset_doctor(self, doctor):
+        with self._cursor(write=True) as cursor:
+            cursor.execute(
+                "INSERT INTO medecin (nom, prenom, username, password) VALUES (:nom, :prenom, :username, :password) "
+                "ON CONFLICT (username) DO UPDATE SET "
+                "nom = excluded.nom, prenom = excluded.prenom, password = excluded.password",
+                doctor
+            )
+
+    # ---------- Patients and consultations ----------
+    def patient_exists(self, patient_id):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT 1 AS found FROM patient WHERE id_patient = ?", (patient_id,))
+            return cursor.fetchone() is not None
+
+    def list_patients(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM patient ORDER BY id_patient")
+            return cursor.fetchall()
+
+    def list_consultations(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM consultation ORDER BY id")
+            return cursor.fetchall()
+
+    def save_consultations(self, records):
+        if not records:
+            return {}
+        with self._cursor(write=True) as cursor:
+            # The write lock is held from BEGIN: replayed write_ids are settled before anything is written
+            write_ids = list(dict.fromkeys(r["write_id"] for r in records))
+            cursor.execute(
+                f"SELECT write_id, id FROM consultation WHERE write_id IN ({', '.join(['?'] * len(write_ids))})",
+                write_ids
+            )
+            saved = {row["write_id"]: row["id"] for row in cursor.fetchall()}
+            fresh = {}
+            for r in records:
+                if r["write_id"] not in saved:
+                    fresh.setdefault(r["write_id"], r)
+            new = list(fresh.values())
+            if not new:
+                return saved
+
+            # Last save wins for a patient saved several times in the batch
+            patients = {r["patient_id"]: (r["patient_id"], r["patient_name"], r["patient_age"]) for r in new}
+            cursor.executemany(PATIENT_UPSERT, list(patients.values()))
+            cursor.executemany(CONSULTATION_INSERT, [
+                (r["write_id"], r["doctor_id"], r["patient_id"], r["description"], r["image_path"],
+                 r["prediction_status"], r["risk_level"], r["confidence"], r["date"])
+                for r in new
+            ])
+
+            new_ids = [r["write_id"] for r in new]
+            cursor.execute(
+                f"SELECT write_id, id, patient_id FROM consultation WHERE write_id IN ({', '.join(['?'] * len(new_ids))}) "
+                "ORDER BY id",
+                new_ids
+            )
+            rows = cursor.fetchall()
+            ids = [row["id"] for row in rows]
+            cursor.execute(_UPSERT_LATEST.format(where=f"id IN ({', '.join(['?'] * len(ids))})"), ids)
+            self._record_changes(cursor, [(row["patient_id"], row["id"]) for row in rows])
+            saved.update((row["write_id"], row["id"]) for row in rows)
+            return saved
+
+    @staticmethod
+    def _record_changes(cursor, changes):
+        # The transaction holds the write lock: sequence numbers are handed out in commit order
+        cursor.execute("UPDATE change_counter SET seq = seq + ? WHERE id = 1", (len(changes),))
+        cursor.execute("SELECT seq FROM change_counter WHERE id = 1")
+        first = cursor.fetchone()["seq"] - len(changes) + 1
+        cursor.executemany(
+            "INSERT INTO change_log (seq, patient_id, consultation_id) VALUES (?, ?, ?)",
+            [(first + i, patient_id, consultation_id) for i, (patient_id, consultation_id) in enumerate(changes)]
+        )
+
+    def patients_page(self, after=None, limit=patient_queries.DEFAULT_PAGE_SIZE, doctor_id=None, risk_level=None):
+        with self._cursor() as cursor:
+            return patient_queries.fetch_patients_page(cursor, after, limit, doctor_id, risk_level)
+
+    # ---------- Change feed ----------
+    def change_seq(self):
+        with self._cursor() as cursor:
+            return patient_queries.current_change_seq(cursor)
+
+    def changes(self, since, limit=patient_queries.MAX_CHANGES):
+        with self._cursor() as cursor:
+            return patient_queries.fetch_changes(cursor, since, limit)
+
+    def prune_change_log(self, keep_days):
+        with self._cursor(write=True) as cursor:
+            cursor.execute("SELECT MAX(seq) AS seq FROM change_log WHERE changed_at < datetime('now', 'localtime', ?)",
+                           (f"-{int(keep_days)} days",))
+            pruned_through = cursor.fetchone()["seq"]
+            if pruned_through is None:
+                return 0
+            cursor.execute("DELETE FROM change_log WHERE seq <= ?", (pruned_through,))
+            deleted = cursor.rowcount
+            cursor.execute("UPDATE change_counter SET pruned_through = MAX(pruned_through, ?) WHERE id = 1",
+                           (pruned_through,))
+            return deleted
+
+    def stats(self):
+        def size(path):
+            return os.path.getsize(path) if os.path.exists(path) else 0
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "size_bytes": size(self.path),
+            "wal_bytes": size(self.path + "-wal"),
+            "busy_timeout_s": self.busy_timeout,
+        }
@@ -0,0 +1,182 @@
+"""
+Storage backends for doctors, patients and consultations.
+
+The server and the maintenance scripts go through a Repository instead of
+issuing SQL themselves. The backend is chosen by configuration:
+
+    STORAGE_BACKEND=mysql   MySQL server through the per-worker connection pool (mysql_storage.py, default)
+    STORAGE_BACKEND=sqlite  embedded SQLite database in WAL mode, SQLITE_PATH (sqlite_storage.py)
+
+Both backends have the same tables, indexes and migration versions, and
+run the same patient list / change feed queries (patient_queries.py), so
+results and their cost profile match. SQLite suits single-clinic
+deployments (no client/server round trip) and offline benchmarks or CI.
+
+Backend errors are reported with the exceptions below, whatever the driver.
+"""
+import abc
+import os
+import threading
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mysql")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "breast_cancer.sqlite3")
+
+
+class StorageError(RuntimeError):
+    """Base class of the storage errors."""
+
+
+class StorageUnavailable(StorageError):
+    """The database cannot be reached."""
+
+
+class RejectedData(StorageError):
+    """The database refused the data (constraint violation, invalid value)."""
+
+
+class SchemaOutdated(StorageError):
+    """The database schema is older than the code expects (run migrations.py)."""
+
+
+class ResyncRequired(StorageError):
+    """The requested change cursor is older than the retained change log."""
+
+
+class Repository(abc.ABC):
+    """
+    Persistence of doctors, patients and consultations.
+
+    Rows are returned as dicts with the column names of the schema (dates as datetime).
+    """
+
+    name = None
+    # (version, description) of the backend's migrations, in order
+    schema_migrations = []
+
+    def __init__(self):
+        self._schema_lock = threading.Lock()
+        self._schema_checked_pid = None
+
+    # ---------- Schema ----------
+    @abc.abstractmethod
+    def schema_version(self):
+        """Highest applied migration (0 for an empty database)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def migrate(self, target=None):
+        """Apply pending migrations up to `target` (default: all). Returns the applied versions."""
+        raise NotImplementedError
+
+    @property
+    def latest_version(self):
+        return self.schema_migrations[-1][0]
+
+    def check_schema(self):
+        """
+        Verify the schema version once per process (one cheap query, no DDL).
+
+        Raises:
+            SchemaOutdated: If migrations are pending
+        """
+        if self._schema_checked_pid == os.getpid():
+            return
+        with self._schema_lock:
+            if self._schema_checked_pid == os.getpid():
+                return
+            version = self.schema_version()
+            if version < self.latest_version:
+                raise SchemaOutdated(f"Database schema is at version {version}, the server needs "
+                                     f"{self.latest_version}: run 'python migrations.py'")
+            self._schema_checked_pid = os.getpid()
+            print(f"✅ Database schema version {version} ({self.name})")
+
+    # ---------- Doctors ----------
+    @abc.abstractmethod
+    def find_doctor(self, username):
+        """The medecin row with this username, or None."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list_doctors(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def reset_doctor(self, doctor):
+        """Reset the account `doctor` (nom, prenom, username, password), creating it if needed; its id is kept."""
+        raise NotImplementedError
+
+    # ---------- Patients and consultations ----------
+    @abc.abstractmethod
+    def patient_exists(self, patient_id):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list_patients(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list_consultations(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save_consultations(self, records):
+        """
+        Store validated consultations (consultation_store.validate_consultation) in one transaction.
+
+        Upserts the patients, inserts the consultations (a write_id already
+        stored is skipped), refreshes the latest consultations and appends to
+        the change log.
+
+        Returns:
+            dict mapping write_id to consultation id
+
+        Raises:
+            RejectedData: If the database rejects any record (nothing is stored)
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def patients_page(self, after=None, limit=100, doctor_id=None, risk_level=None):
+        """One keyset page of the patient list: (rows, next_cursor), see patient_queries.fetch_patients_page."""
+        raise NotImplementedError
+
+    # ---------- Change feed ----------
+    @abc.abstractmethod
+    def change_seq(self):
+        """Sequence number of the last committed change."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def changes(self, since, limit):
+        """
+        Patients and consultations changed after `since`, see patient_queries.fetch_changes.
+
+        Raises:
+            ResyncRequired: If `since` is outside the retained change log
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def prune_change_log(self, keep_days):
+        """Delete change log entries older than keep_days. Returns the number deleted."""
+        raise NotImplementedError
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+def get_repository(backend=None):
+    """
+    Repository for `backend` ("mysql" or "sqlite"; default: STORAGE_BACKEND).
+
+    Driver modules are imported only for the selected backend.
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend == "mysql":
+        from mysql_storage import MySQLRepository
+        return MySQLRepository.from_env()
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteRepository
+        return SQLiteRepository(SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected 'mysql' or 'sqlite')")
@@ -0,0 +1,117 @@
+"""
+Unit tests for token sessions and operator tokens (auth.py)
+
+    python -m pytest -q test_auth.py
+"""
+import time
+
+import jwt
+import pytest
+
+import auth
+
+SECRET = "test-secret-" + "x" * 64
+DOCTOR = {"id": 1, "nom": "Smith", "prenom": "John"}
+
+
+@pytest.fixture(autouse=True)
+def configured(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "revocations", auth.RevocationList())
+
+
+def claims(**overrides):
+    now = int(time.time())
+    return {"sub": "1", "name": "John Smith", "iat": now, "exp": now + 60, "jti": "abc", **overrides}
+
+
+def test_issued_token_verifies():
+    token, expires_at = auth.issue_token(DOCTOR)
+    doctor = auth.verify_token(token)
+    assert (doctor["id"], doctor["name"], doctor["exp"]) == (1, "John Smith", expires_at)
+
+
+def test_expired_token_is_rejected():
+    past = int(time.time()) - 3600
+    token = jwt.encode(claims(iat=past, exp=past + 60), SECRET, algorithm="HS256")
+    with pytest.raises(auth.AuthError, match="expired"):
+        auth.verify_token(token)
+
+
+def test_revoked_token_is_rejected():
+    token, _ = auth.issue_token(DOCTOR)
+    auth.revoke(auth.verify_token(token))
+    with pytest.raises(auth.AuthError, match="revoked"):
+        auth.verify_token(token)
+
+
+@pytest.mark.parametrize("algorithm", ["HS512", "none"])
+def test_other_algorithms_are_rejected(algorithm):
+    token = jwt.encode(claims(), SECRET if algorithm != "none" else None, algorithm=algorithm)
+    with pytest.raises(auth.AuthError, match="Invalid token"):
+        auth.verify_token(token)
+
+
+def test_wrong_secret_and_missing_claims_are_rejected():
+    with pytest.raises(auth.AuthError):
+        auth.verify_token(jwt.encode(claims(), "another-secret-" + "y" * 32, algorithm="HS256"))
+    incomplete = claims()
+    del incomplete["jti"]
+    with pytest.raises(auth.AuthError):
+        auth.verify_token(jwt.encode(incomplete, SECRET, algorithm="HS256"))
+    with pytest.raises(auth.AuthError):
+        auth.verify_token(None)
+
+
+def test_bearer_header_parsing():
+    assert auth.bearer_token("Bearer abc ") == "abc"
+    assert auth.bearer_token("Basic abc") is None
+    assert auth.bearer_token(None) is None
+
+
+def test_full_revocation_list_refuses_instead_of_forgetting():
+    revocations = auth.RevocationList(max_entries=2)
+    now = time.time()
+    revocations.revoke("t0", now + 30)
+    revocations.revoke("t1", now + 10)
+    with pytest.raises(auth.RevocationListFull):
+        revocations.revoke("t2", now + 20)
+    assert [revocations.is_revoked(f"t{i}") for i in range(3)] == [True, True, False]
+    revocations.revoke("t1", now + 10)  # revoking again needs no room
+    assert revocations.stats()["refused"] == 1
+
+
+def test_expired_revocations_are_pruned_on_every_revoke():
+    revocations = auth.RevocationList(max_entries=10)
+    past = time.time() - auth.JWT_LEEWAY_SECONDS - 1
+    revocations.revoke("old", past)
+    revocations.revoke("new", time.time() + 60)
+    assert not revocations.is_revoked("old")
+    assert revocations.stats()["entries"] == 1
+
+
+def test_server_refuses_to_start_without_a_shared_secret(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", None)
+    monkeypatch.setattr(auth, "AUTH_DEV_MODE", False)
+    with pytest.raises(RuntimeError, match="JWT_SECRET"):
+        auth.check_secret(auth_enabled=True)
+    auth.check_secret(auth_enabled=False)
+    assert auth.JWT_SECRET
+
+
+def test_dev_mode_allows_a_random_secret(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", None)
+    monkeypatch.setattr(auth, "AUTH_DEV_MODE", True)
+    auth.check_secret(auth_enabled=True)
+    assert len(auth.JWT_SECRET) == 64
+
+
+def test_operator_token(monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", None)
+    with pytest.raises(auth.AdminDisabled):
+        auth.verify_admin_token("anything")
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "operator")
+    auth.verify_admin_token("operator")
+    for token in ("doctor", "", None):
+        with pytest.raises(auth.AuthError):
+            auth.verify_admin_token(token)
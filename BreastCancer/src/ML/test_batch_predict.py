@@ -0,0 +1,42 @@
+"""
+Test script for the batch scoring endpoints (/predict2_batch and /predict3_batch)
+"""
+import requests
+import json
+import time
+
+from scoring import feature_cols
+
+# Malignant case from the Wisconsin dataset
+malignant = dict(zip(feature_cols, [
+    17.99, 10.38, 122.8, 1001.0, 0.1184, 0.2776, 0.3001, 0.1471, 0.2419, 0.07871,
+    1.095, 0.9053, 8.589, 153.4, 0.006399, 0.04904, 0.05373, 0.01587, 0.03003, 0.006193,
+    25.38, 17.33, 184.6, 2019.0, 0.1622, 0.6656, 0.7119, 0.2654, 0.4601, 0.1189
+]))
+
+print("=" * 70)
+print("Testing Batch Scoring Endpoints")
+print("=" * 70)
+
+# Test 1: records payload with one invalid row
+print("\n1. /predict2_batch with records (row 1 is invalid)...")
+records = [malignant, {"radius_mean": "abc"}, malignant]
+response = requests.post('http://localhost:5000/predict2_batch', json=records, timeout=30)
+print(f"Status: {response.status_code}")
+print(json.dumps(response.json(), indent=2))
+
+# Test 2: column-oriented payload
+print("\n2. /predict3_batch with a column-oriented payload...")
+columns = {col: [value] * 3 for col, value in malignant.items()}
+response = requests.post('http://localhost:5000/predict3_batch', json=columns, timeout=30)
+print(f"Status: {response.status_code}")
+print(f"Scored: {response.json().get('scored')}/{response.json().get('count')}")
+
+# Test 3: throughput versus row-by-row calls
+for batch_size in [1, 100, 1000, 5000]:
+    start = time.perf_counter()
+    response = requests.post('http://localhost:5000/predict2_batch', json=[malignant] * batch_size, timeout=60)
+    elapsed = time.perf_counter() - start
+    print(f"   batch={batch_size:5d}  {elapsed * 1000:8.1f} ms  {batch_size / elapsed:10.0f} rows/s")
+
+print("\n" + "=" * 70)
@@ -0,0 +1,67 @@
+"""
+Unit tests for the request coalescer (batching.py)
+
+    python -m pytest -q test_batching.py
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from batching import BatchTimeout, MicroBatcher
+
+
+def test_concurrent_rows_are_scored_together():
+    batch_sizes = []
+
+    def score(X):
+        batch_sizes.append(len(X))
+        return X.sum(axis=1)
+
+    batcher = MicroBatcher("sum", score, max_batch_size=4, max_wait_ms=2000)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(batcher.submit, [[i, 1.0] for i in range(4)]))
+    assert results == [1.0, 2.0, 3.0, 4.0]
+    assert batch_sizes == [4]
+    assert batcher.stats()["batch_size"]["count"] == 1
+
+
+def test_scoring_error_reaches_every_caller():
+    def score(X):
+        raise ValueError("bad batch")
+
+    batcher = MicroBatcher("failing", score, max_wait_ms=0)
+    with pytest.raises(ValueError, match="bad batch"):
+        batcher.submit([1.0])
+
+
+def test_slow_batch_times_out():
+    release = threading.Event()
+
+    def score(X):
+        release.wait(5)
+        return X
+
+    batcher = MicroBatcher("slow", score, max_wait_ms=0, timeout_ms=50)
+    with pytest.raises(BatchTimeout, match="slow"):
+        batcher.submit([1.0])
+    release.set()
+
+
+def test_rows_queued_for_a_dead_dispatcher_are_failed():
+    batcher = MicroBatcher("dead", lambda X: X)
+    # A dispatcher that stopped (or was left behind by fork) with rows still queued
+    stopped = threading.Thread(target=lambda: None)
+    stopped.start()
+    stopped.join()
+    batcher._thread, batcher._pid = stopped, os.getpid()
+    orphans = [Future() for _ in range(2)]
+    batcher._pending.extend((np.array([1.0]), 0.0, future) for future in orphans)
+
+    fresh = batcher.submit_async([2.0])
+    for future in orphans:
+        with pytest.raises(RuntimeError, match="dispatcher stopped"):
+            future.result(timeout=1)
+    assert fresh.result(timeout=5) == 2.0
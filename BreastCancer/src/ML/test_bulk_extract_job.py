@@ -0,0 +1,41 @@
+"""
+Unit tests for /bulk_extract, which queues the batch as a job instead of running it in the request
+(the concurrent extraction itself is replaced by a stub finishing out of order)
+
+    python -m pytest -q test_bulk_extract_job.py
+"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def extract(pairs, write_records, model_registry=None):
+        write_records([{"id": report_id, "text": text} for report_id, text in reversed(pairs)])
+        return {"total": len(pairs), "ok": len(pairs), "failed": 0, "scored": model_registry is not None}
+
+    monkeypatch.setattr(app_module, "FEATURE_EXTRACTION_AVAILABLE", True)
+    monkeypatch.setattr(app_module, "run_bulk_extraction", extract)
+    return app_module.app.test_client()
+
+
+def test_batch_is_queued_and_polled(client):
+    reports = [{"id": "a", "report_description": "one"}, {"report_description": "two"}]
+    response = client.post("/bulk_extract", json={"reports": reports, "score": False})
+    assert response.status_code == 202
+    queued = response.get_json()
+    assert (queued["status"], queued["reports"]) == ("queued", 2)
+
+    job = client.get(f"{queued['poll_url']}?wait=5").get_json()
+    assert (job["kind"], job["status"]) == ("bulk_extract", "done")
+    result = job["result"]
+    assert (result["total"], result["scored"]) == (2, False)
+    assert [record["id"] for record in result["results"]] == ["a", "1"]
+
+
+def test_invalid_batches_are_refused(client, monkeypatch):
+    monkeypatch.setattr(app_module, "BULK_MAX_REPORTS", 1)
+    for payload in ({}, {"reports": []}, {"reports": ["text"]},
+                    {"reports": [{"report_description": "x"}, {"report_description": "y"}]}):
+        assert client.post("/bulk_extract", json=payload).status_code == 400
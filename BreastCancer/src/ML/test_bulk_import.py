@@ -0,0 +1,91 @@
+"""
+Unit tests for the bulk consultation import (bulk_import.py) into an embedded SQLite repository
+
+    python -m pytest -q test_bulk_import.py
+"""
+import io
+import json
+import os
+
+from bulk_import import iter_rows, iter_text_lines, run_import
+from scoring import feature_cols
+
+CSV = (
+    "﻿patient_id,patient_name,patient_age,risk_level,date\n"
+    "P1,Dupont,54,High,2026-01-05\n"
+    "P2,Martin,abc,Low,2026-01-06\n"
+    "P3,Durand,61,,2026-01-07,extra\n"
+    "P4,Bernard,47,Low,2026-01-08\n"
+)
+
+
+def csv_rows(text=CSV):
+    return iter_rows(iter_text_lines(io.BytesIO(text.encode("utf-8"))), "csv")
+
+
+def test_csv_import_rejects_bad_rows_with_their_line(repo):
+    summary = run_import(csv_rows(), repo.save_consultations, batch_size=2)
+    assert (summary["rows"], summary["imported"], summary["rejected"]) == (4, 2, 2)
+    assert [(r["line"], r["patient_id"]) for r in summary["rejects"]] == [(3, "P2"), (4, None)]
+    assert [c["patient_id"] for c in repo.list_consultations()] == ["P1", "P4"]
+
+
+def test_importing_the_same_file_twice_does_not_duplicate(repo):
+    run_import(csv_rows(), repo.save_consultations)
+    seq = repo.change_seq()
+    summary = run_import(csv_rows(), repo.save_consultations)
+    assert summary["imported"] == 2
+    assert len(repo.list_consultations()) == 2
+    assert repo.change_seq() == seq  # nothing new: list ETags stay valid
+
+
+def test_database_rejects_are_isolated_within_a_batch(repo):
+    lines = [
+        {"patient_id": "P1", "patient_name": "Dupont", "patient_age": 54},
+        {"patient_id": "P2", "patient_name": "Martin", "patient_age": 60, "doctor_id": 999},
+        {"patient_id": "P3", "patient_name": "Durand", "patient_age": 61},
+    ]
+    rows = iter_rows(io.StringIO("\n".join(json.dumps(line) for line in lines) + "\n\nnot json\n"), "jsonl")
+    summary = run_import(rows, repo.save_consultations, batch_size=10)
+    assert (summary["imported"], summary["rejected"], summary["batches"]) == (2, 2, 1)
+    rejects = {r["line"]: r["error"] for r in summary["rejects"]}
+    assert rejects[2].startswith("Rejected by the database")
+    assert rejects[5].startswith("Invalid JSON")
+
+
+def test_import_on_behalf_of_a_doctor(repo):
+    repo.reset_doctor({"nom": "Curie", "prenom": "Marie", "username": "mcurie", "password": "secret"})
+    doctor_id = repo.find_doctor("mcurie")["id"]
+    lines = [
+        {"patient_id": "P1", "patient_name": "Dupont", "patient_age": 54},
+        {"patient_id": "P2", "patient_name": "Martin", "patient_age": 60, "doctor_id": 1},
+        {"patient_id": "P3", "patient_name": "Durand", "patient_age": 61, "doctor_id": str(doctor_id)},
+    ]
+    jsonl = "\n".join(json.dumps(line) for line in lines)
+    summary = run_import(iter_rows(io.StringIO(jsonl), "jsonl"), repo.save_consultations, doctor_id=doctor_id)
+    assert [(r["line"], r["error"]) for r in summary["rejects"]] == [
+        (2, "doctor_id does not match the authenticated doctor")]
+    assert [(c["patient_id"], c["medecin_id"]) for c in repo.list_consultations()] == [
+        ("P1", doctor_id), ("P3", doctor_id)]
+    # Another doctor importing the same file gets their own rows, not a replay of the first import
+    run_import(iter_rows(io.StringIO(json.dumps(lines[0])), "jsonl"), repo.save_consultations, doctor_id=1)
+    assert sorted(c["medecin_id"] for c in repo.list_consultations() if c["patient_id"] == "P1") == [1, doctor_id]
+
+
+def test_rows_with_features_are_scored(repo, tmp_path):
+    from model_registry import ModelRegistry
+    registry = ModelRegistry(default_path=os.path.dirname(os.path.abspath(__file__)),
+                             versions_dir=str(tmp_path / "versions"))
+    registry.load_initial()
+    features = dict(zip(feature_cols, [
+        17.99, 10.38, 122.8, 1001.0, 0.1184, 0.2776, 0.3001, 0.1471, 0.2419, 0.07871,
+        1.095, 0.9053, 8.589, 153.4, 0.006399, 0.04904, 0.05373, 0.01587, 0.03003, 0.006193,
+        25.38, 17.33, 184.6, 2019.0, 0.1622, 0.6656, 0.7119, 0.2654, 0.4601, 0.1189
+    ]))
+    rows = [(1, {"patient_id": "P1", "patient_name": "Dupont", "patient_age": 54, "features": features}, None),
+            (2, {"patient_id": "P2", "patient_name": "Martin", "patient_age": 60, "risk_level": "Low"}, None)]
+    summary = run_import(rows, repo.save_consultations, model_registry=registry)
+    assert summary["scored"] == 1
+    scored, unscored = repo.list_consultations()
+    assert scored["prediction_status"] and scored["confidence"] is not None and scored["risk_level"]
+    assert (unscored["prediction_status"], unscored["risk_level"]) == (None, "Low")
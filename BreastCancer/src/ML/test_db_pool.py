@@ -0,0 +1,90 @@
+"""
+Unit tests for the bounded connection pool (db_pool.py), over in-memory
+stand-ins for MySQL connections
+
+    python -m pytest -q test_db_pool.py
+"""
+import pytest
+
+from db_pool import ConnectionPool, PoolExhausted
+
+
+class Connection:
+    def __init__(self):
+        self.in_transaction = False
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("MySQL server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class Pool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__("test", {}, **kwargs)
+        self.connections = []
+
+    def _connect(self):
+        self.connections.append(Connection())
+        return self.connections[-1]
+
+
+def test_returned_connections_are_reused():
+    pool = Pool(size=2)
+    first = pool.connection()
+    conn = first._conn
+    first.close()
+    second = pool.connection()
+    assert second._conn is conn and first.closed
+    second.close()
+    stats = pool.stats()
+    assert (stats["created"], stats["checkouts"], stats["idle"], stats["in_use"]) == (1, 2, 1, 0)
+
+
+def test_checkout_waits_a_bounded_time():
+    pool = Pool(size=1, max_wait_ms=20)
+    held = pool.connection()
+    with pytest.raises(PoolExhausted, match="no connection free"):
+        pool.connection()
+    held.close()
+    pool.connection().close()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_callers_beyond_max_waiters_are_rejected_at_once():
+    pool = Pool(size=1, max_waiters=0)
+    held = pool.connection()
+    with pytest.raises(PoolExhausted, match="already waiting"):
+        pool.connection()
+    held.close()
+    assert pool.stats()["rejected"] == 1
+
+
+def test_unfinished_transaction_is_rolled_back_on_return():
+    pool = Pool(size=1)
+    conn = pool.connection()
+    underlying = conn._conn
+    underlying.in_transaction = True  # an endpoint raised before commit
+    conn.close()
+    assert underlying.rollbacks == 1
+    assert not pool.connection().in_transaction
+
+
+def test_dead_idle_connection_is_replaced():
+    pool = Pool(size=1, validate_after=0)
+    conn = pool.connection()
+    dead = conn._conn
+    conn.close()
+    dead.alive = False  # MySQL restarted, or wait_timeout expired
+    fresh = pool.connection()
+    assert fresh._conn is not dead and dead.closed
+    assert (pool.stats()["broken"], pool.stats()["created"]) == (1, 2)
@@ -0,0 +1,60 @@
+"""
+Unit tests for /extract_and_predict_all: one extraction per report, scored by several models
+(the LLM extraction is replaced by a canned feature dict)
+
+    python -m pytest -q test_extract_and_predict_all.py
+"""
+import pytest
+
+import app as app_module
+from scoring import feature_cols, features_to_matrix, mlp_prediction, softmax_prediction
+
+FEATURES = dict(zip(feature_cols, [
+    17.99, 10.38, 122.8, 1001.0, 0.1184, 0.2776, 0.3001, 0.1471, 0.2419, 0.07871,
+    1.095, 0.9053, 8.589, 153.4, 0.006399, 0.04904, 0.05373, 0.01587, 0.03003, 0.006193,
+    25.38, 17.33, 184.6, 2019.0, 0.1622, 0.6656, 0.7119, 0.2654, 0.4601, 0.1189
+]))
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    calls = []
+
+    def extract(report_text, details=None):
+        calls.append(report_text)
+        details.update({"resolved_locally": 0, "llm_called": True, "deduplicated": False,
+                        "timing": {}, "confidence": {}, "source": "test"})
+        return dict(FEATURES)
+
+    monkeypatch.setattr(app_module, "FEATURE_EXTRACTION_AVAILABLE", True)
+    monkeypatch.setattr(app_module, "extract_features_from_text", extract)
+    return calls
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_one_extraction_scores_every_model(client, extractions):
+    response = client.post("/extract_and_predict_all", json={"report_description": "Mass of 18 mm"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert extractions == ["Mass of 18 mm"]
+    X = features_to_matrix([FEATURES])
+    assert body["predictions"] == {
+        "softmax": softmax_prediction(app_module.softmax_proba(X)[0][0]),
+        "mlp": mlp_prediction(app_module.mlp_proba(X)[0][0]),
+    }
+    assert body["model_version"] == app_module.model_registry.current().version
+    assert body["extraction"]["features_extracted"] == 30
+
+
+def test_model_selection(client, extractions):
+    body = client.post("/extract_and_predict_all",
+                       json={"report_description": "Mass", "models": "mlp"}).get_json()
+    assert list(body["predictions"]) == ["mlp"]
+    response = client.post("/extract_and_predict_all", json={"report_description": "Mass", "models": ["svm"]})
+    assert response.status_code == 400 and "svm" in response.get_json()["error"]
+    assert client.post("/extract_and_predict_all", json={"report_description": " "}).status_code == 400
+    assert len(extractions) == 1
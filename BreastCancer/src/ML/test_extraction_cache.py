@@ -0,0 +1,66 @@
+"""
+Unit tests for the persistent extraction cache (extraction_cache.py)
+
+    python -m pytest -q test_extraction_cache.py
+"""
+import time
+
+import pytest
+
+from extraction_cache import ExtractionCache, make_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExtractionCache(str(tmp_path / "cache.sqlite3"), max_entries=3, ttl_seconds=3600)
+
+
+def test_key_normalizes_text_and_tracks_prompt_and_backends():
+    key = make_cache_key("Rayon  moyen:\n17,99 ", "v2", "abc")
+    assert key == make_cache_key("Rayon moyen: 17,99", "v2", "abc")
+    assert key != make_cache_key("Rayon moyen: 17,99", "v1", "abc")
+    assert key != make_cache_key("Rayon moyen: 17,99", "v2", "def")
+
+
+def test_hit_and_miss(cache):
+    assert cache.get("k") is None
+    cache.put("k", {"radius_mean": 17.99}, "model", "v2")
+    assert cache.get("k") == {"radius_mean": 17.99}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key}, "model", "v2")
+        time.sleep(0.01)
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("d", {"key": "d"}, "model", "v2")
+    assert cache.get("b") is None
+    assert [cache.get(key)["key"] for key in ("a", "c", "d")] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss_and_purged(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0.05)
+    cache.put("old", {"radius_mean": 1.0}, "model", "v2")
+    time.sleep(0.1)
+    assert cache.get("old") is None
+    assert cache.stats()["entries"] == 0
+    cache.put("a", {}, "model", "v2")
+    time.sleep(0.1)
+    cache.put("b", {}, "model", "v2")  # purges the expired "a" on the way
+    assert cache.stats()["entries"] == 1
+
+
+def test_claims_are_exclusive_until_released(cache):
+    assert cache.claim("k")
+    assert not cache.claim("k")
+    cache.release("k")
+    assert cache.claim("k")
+
+
+def test_wait_for_returns_the_claimed_result(cache):
+    assert cache.claim("k")
+    cache.put("k", {"radius_mean": 17.99}, "model", "v2")
+    assert cache.wait_for("k", timeout=1) == {"radius_mean": 17.99}
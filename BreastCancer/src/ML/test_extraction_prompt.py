@@ -0,0 +1,45 @@
+"""
+Unit tests for the compact extraction prompt (feature_extractor.py) and its
+token accounting (llm_client.py)
+
+    python -m pytest -q test_extraction_prompt.py
+"""
+from types import SimpleNamespace
+
+import feature_extractor
+import llm_client
+from scoring import feature_cols
+
+
+def test_compact_prompt_keeps_a_static_prefix(monkeypatch):
+    monkeypatch.setattr(feature_extractor, "PROMPT_STYLE", "compact")
+    first = feature_extractor._completion_request("Rayon moyen : 17,99")
+    second = feature_extractor._completion_request("Texture moyenne : 10,38")
+    # Only the last message varies between reports: the prefix can be served from the prompt cache
+    assert first["messages"][:-1] == second["messages"][:-1]
+    assert first["messages"][-1] == {"role": "user", "content": "Rayon moyen : 17,99"}
+    system = first["messages"][0]["content"]
+    assert all(col in system for col in feature_cols)
+    assert first["max_completion_tokens"] == feature_extractor.MAX_COMPLETION_TOKENS
+
+
+def test_legacy_prompt_is_still_available(monkeypatch):
+    monkeypatch.setattr(feature_extractor, "PROMPT_STYLE", "legacy")
+    request = feature_extractor._completion_request("Rayon moyen : 17,99")
+    assert [m["role"] for m in request["messages"]] == ["user"]
+    assert "Rayon moyen : 17,99" in request["messages"][0]["content"]
+
+
+def test_token_usage_is_averaged_per_prompt_version():
+    def usage(prompt, completion, cached):
+        return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion,
+                               prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+
+    for call_usage in (usage(300, 120, 256), usage(340, 100, 0), None):
+        timing = {"total_ms": 100.0}
+        llm_client.record_usage(timing, call_usage, "test-prompt")
+    assert timing["prompt_tokens"] is None  # a stream closed before its usage chunk
+    stats = llm_client.usage_stats()["test-prompt"]
+    assert stats["calls"] == 3
+    assert (stats["avg_prompt_tokens"], stats["avg_completion_tokens"], stats["avg_cached_tokens"]) == (320, 110, 128)
+    assert stats["avg_total_ms"] == 100.0
@@ -0,0 +1,70 @@
+"""
+Unit tests for the fused NumPy kernels (fused_models.py), checked against the
+original scikit-learn and torch models they were compiled from
+
+    python -m pytest -q test_fused_models.py
+"""
+import joblib
+import numpy as np
+import pytest
+from sklearn.datasets import load_breast_cancer
+
+from fused_models import FusedMLP, load_fused_model, save_fused_model
+from model_registry import LOGISTIC_KERNEL, MLP_KERNEL, SOFTMAX_KERNEL
+
+# Same bound as compile_models.TOLERANCE
+TOLERANCE = 1e-5
+
+
+@pytest.fixture(scope="module")
+def X():
+    data = load_breast_cancer().data
+    rng = np.random.default_rng(0)
+    return np.vstack([data, data * rng.uniform(0.5, 1.5, size=data.shape)]).astype(np.float32)
+
+
+def test_mlp_kernel_matches_the_sklearn_model(X):
+    scaler, mlp = joblib.load("scaler_dso3.joblib"), joblib.load("mlp_perfect_dso3_model.joblib")
+    expected = mlp.predict_proba(scaler.transform(X))
+    np.testing.assert_allclose(load_fused_model(MLP_KERNEL).predict_proba(X), expected, atol=TOLERANCE)
+
+
+def test_logistic_kernel_matches_the_sklearn_pipeline(X):
+    pipeline = joblib.load("logistic_regression_pipeline.joblib")
+    expected = pipeline["model"].predict_proba(pipeline["scaler"].transform(X))
+    np.testing.assert_allclose(load_fused_model(LOGISTIC_KERNEL).predict_proba(X), expected, atol=TOLERANCE)
+
+
+def test_softmax_kernel_matches_the_torch_model(X):
+    torch = pytest.importorskip("torch")
+    state = torch.load("softmax_regression_dso2.pth", map_location="cpu", weights_only=False)
+    scaled = torch.tensor(joblib.load("scaler_dso2.joblib").transform(X), dtype=torch.float32)
+    expected = torch.softmax(scaled @ state["linear.weight"].T + state["linear.bias"], dim=1).numpy()
+    np.testing.assert_allclose(load_fused_model(SOFTMAX_KERNEL).predict_proba(X), expected, atol=TOLERANCE)
+
+
+def test_probabilities_are_normalized_for_extreme_inputs():
+    mlp = FusedMLP([np.array([[1.0, -1.0]], dtype=np.float32)], [np.zeros(2, dtype=np.float32)],
+                   out_activation="softmax")
+    proba = mlp.predict_proba([[1e6], [-1e6], [0.0]])
+    assert np.all(np.isfinite(proba))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+
+
+def test_weights_are_memory_mapped_read_only(X):
+    kernel = load_fused_model(MLP_KERNEL)
+    assert all(isinstance(W, np.memmap) and not W.flags.writeable for W in kernel.weights)
+    before = [np.array(W) for W in kernel.weights]
+    kernel.predict_proba(X)  # the in-place activations must not touch the shared pages
+    assert all(np.array_equal(W, b) for W, b in zip(kernel.weights, before))
+
+
+def test_saved_kernel_round_trips(tmp_path, X):
+    rng = np.random.default_rng(1)
+    arrays = {"W0": rng.normal(size=(30, 8)).astype(np.float32), "b0": np.zeros(8, dtype=np.float32),
+              "W1": rng.normal(size=(8, 1)).astype(np.float32), "b1": np.zeros(1, dtype=np.float32)}
+    save_fused_model(str(tmp_path / "k"), "mlp", arrays, n_layers=2, hidden_activation="relu",
+                     out_activation="logistic")
+    mapped, private = load_fused_model(str(tmp_path / "k")), load_fused_model(str(tmp_path / "k"), mmap_mode=None)
+    assert not isinstance(private.weights[0], np.memmap)
+    np.testing.assert_array_equal(mapped.predict_proba(X), private.predict_proba(X))
@@ -0,0 +1,90 @@
+"""
+Unit tests for mammogram preprocessing (image_inference.py), checked against the
+crop_breast_region and inference_transform of Breast_Cancer_computer_vision.ipynb
+
+    python -m pytest -q test_image_preprocess.py
+"""
+import io
+
+import numpy as np
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+from PIL import ImageOps  # noqa: E402
+
+import image_inference  # noqa: E402
+from image_inference import ImageClassifier, ImageModelUnavailable, InvalidImage, crop_breast_region, preprocess  # noqa: E402
+
+
+def notebook_crop_breast_region(img):
+    """The notebook's version, verbatim apart from the comments."""
+    gray = ImageOps.grayscale(img)
+    arr = np.array(gray)
+    mask = arr > 10
+    if mask.sum() == 0:
+        return img
+    coords = np.column_stack(np.where(mask))
+    y_min, x_min = coords.min(axis=0)
+    y_max, x_max = coords.max(axis=0)
+    return img.crop((x_min, y_min, x_max, y_max))
+
+
+def mammogram(width=300, height=420, mode="L", seed=0):
+    """A textured half-ellipse on a black background, offset from the borders."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    breast = (((xx - 20) / (0.7 * width)) ** 2 + ((yy - height / 2) / (0.4 * height)) ** 2) < 1
+    breast &= xx >= 20
+    pixels = np.where(breast, rng.normal(140, 35, (height, width)), rng.normal(3, 2, (height, width)))
+    img = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "L")
+    return img if mode == "L" else img.convert(mode)
+
+
+def encoded(img, fmt="PNG"):
+    buffer = io.BytesIO()
+    img.save(buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+def test_crop_matches_the_notebook(mode):
+    img = mammogram(mode=mode)
+    ours, theirs = crop_breast_region(img), notebook_crop_breast_region(img)
+    assert ours.size == theirs.size
+    assert np.array_equal(np.asarray(ours), np.asarray(theirs))
+
+
+def test_blank_image_is_not_cropped():
+    img = Image.new("L", (64, 64), 0)
+    assert crop_breast_region(img).size == (64, 64)
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+def test_preprocess_matches_the_notebook_transform(mode):
+    transforms = pytest.importorskip("torchvision.transforms")
+    size = image_inference.IMAGE_SIZE
+    inference_transform = transforms.Compose([
+        transforms.Resize((size, size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.499, 0.499, 0.499], std=[0.240, 0.240, 0.240]),
+    ])
+    img = mammogram(mode=mode)
+    expected = inference_transform(notebook_crop_breast_region(img.convert("RGB"))).numpy()
+    pixels = preprocess(encoded(img))
+    assert pixels.shape == (size, size, 3) and pixels.dtype == np.float32
+    np.testing.assert_allclose(pixels.transpose(2, 0, 1), expected, atol=1e-5)
+
+
+def test_unreadable_upload_is_an_invalid_image():
+    with pytest.raises(InvalidImage):
+        preprocess(io.BytesIO(b"%PDF-1.4 not an image"))
+    with pytest.raises(InvalidImage):
+        preprocess(io.BytesIO(encoded(mammogram()).getvalue()[:200]))
+
+
+def test_serving_needs_an_exported_graph(tmp_path):
+    classifier = ImageClassifier(str(tmp_path / "model.pth"), str(tmp_path / "model.torchscript.pt"))
+    assert not classifier.available
+    with pytest.raises(ImageModelUnavailable, match="python image_inference.py"):
+        classifier.model()
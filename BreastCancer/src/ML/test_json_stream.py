@@ -0,0 +1,60 @@
+"""
+Unit tests for the streamed-completion JSON parser (json_stream.py)
+
+    python -m pytest -q test_json_stream.py
+"""
+import pytest
+
+from json_stream import JSONObjectStreamParser, parse_json_object
+
+
+def feed_in_chunks(text, size):
+    parser = JSONObjectStreamParser()
+    pairs = []
+    for i in range(0, len(text), size):
+        pairs.extend(parser.feed(text[i:i + size]))
+    return parser, pairs
+
+
+def test_skips_think_block_with_braces():
+    text = '<think>maybe {"radius_mean": 1} or {?</think>\n{"radius_mean": 17.99, "texture_mean": null}'
+    assert parse_json_object(text) == {"radius_mean": 17.99, "texture_mean": None}
+
+
+def test_braces_and_quotes_inside_strings():
+    text = '{"note": "a } b { c \\" d,", "area_mean": 1001.0}'
+    assert parse_json_object(text) == {"note": 'a } b { c " d,', "area_mean": 1001.0}
+
+
+def test_nested_values_are_one_member():
+    assert parse_json_object('{"a": {"b": [1, 2]}, "c": 3}') == {"a": {"b": [1, 2]}, "c": 3}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_tags_and_members_split_across_chunks(size):
+    text = '<think>{"x": 1}</think>{"radius_mean": 17.99, "note": "}{", "area_mean": 1001.0} trailing'
+    parser, pairs = feed_in_chunks(text, size)
+    assert parser.done
+    assert pairs == [("radius_mean", 17.99), ("note", "}{"), ("area_mean", 1001.0)]
+    assert parser.close() == dict(pairs)
+
+
+def test_pairs_reported_before_object_closes():
+    parser = JSONObjectStreamParser()
+    assert parser.feed('{"radius_mean": 17.99, "are') == [("radius_mean", 17.99)]
+    assert not parser.done
+    assert parser.feed('a_mean": 1001.0}') == [("area_mean", 1001.0)]
+    assert parser.done
+    assert parser.feed('{"ignored": 1}') == []
+
+
+def test_unfinished_object_raises_on_close():
+    parser = JSONObjectStreamParser()
+    parser.feed('<think>no answer</think>{"radius_mean": 1')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_invalid_member_raises():
+    with pytest.raises(ValueError):
+        parse_json_object('{"radius_mean": 17.99, oops}')
@@ -0,0 +1,128 @@
+"""
+Unit tests for the extraction backend pool (llm_backends.py): circuit
+breakers, failover, hedging and per-backend request options. No network:
+the backends below answer from memory.
+
+    python -m pytest -q test_llm_backends.py
+"""
+import time
+
+import pytest
+
+from llm_backends import Backend, BackendPool, CircuitBreaker, NoBackendAvailable
+
+REQUEST = {"messages": [{"role": "user", "content": "rayon moyen 17,99"}]}
+
+
+class FakeBackend(Backend):
+    """Backend answering `content` after `delay` seconds, or raising `error`."""
+
+    def __init__(self, name, content="{}", delay=0.0, error=None, model="fake-model", options=None):
+        super().__init__(name, "openai", model, base_url="http://fake/v1", options=options)
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.requests = []
+
+    def complete(self, request):
+        self.requests.append(self._request(request))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.content, None
+
+    def stream(self, request):
+        self.requests.append(self._request(request, stream=True))
+        if self.error is not None:
+            raise self.error
+        yield self.content, None
+
+
+def test_breaker_opens_after_consecutive_failures_then_lets_one_trial_through():
+    breaker = CircuitBreaker("b", failures=2, cooldown=0.05)
+    breaker.failure()
+    assert breaker.acquire()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.acquire()
+    time.sleep(0.06)
+    assert breaker.acquire()  # half-open: one trial call
+    assert not breaker.acquire()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.acquire()
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker("b", failures=1, cooldown=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.acquire()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.acquire()
+
+
+def test_failover_to_a_healthy_backend():
+    broken = FakeBackend("broken", error=ConnectionError("down"), options={})
+    healthy = FakeBackend("healthy", content='{"radius_mean": 17.99}', options={})
+    broken.weight, healthy.weight = 1000.0, 0.001  # the broken one is tried first
+    pool = BackendPool([broken, healthy], hedge_delay_ms=0)
+    content, timing = pool.complete(REQUEST, "test")
+    assert content == '{"radius_mean": 17.99}'
+    assert timing["backend"] == "healthy" and not timing["hedged"]
+    assert pool.failovers == 1 and broken.failures == 1
+
+
+def test_all_backends_failing_raises_the_last_error():
+    pool = BackendPool([FakeBackend("a", error=ConnectionError("a down")),
+                        FakeBackend("b", error=ConnectionError("b down"))])
+    with pytest.raises(ConnectionError):
+        pool.complete(REQUEST, "test")
+
+
+def test_open_breakers_are_skipped():
+    backend = FakeBackend("a")
+    for _ in range(backend.breaker.max_failures):
+        backend.breaker.failure()
+    with pytest.raises(NoBackendAvailable):
+        BackendPool([backend]).choose()
+
+
+def test_slow_backend_is_hedged_and_the_fast_answer_wins():
+    slow = FakeBackend("slow", content="slow", delay=0.5, options={})
+    fast = FakeBackend("fast", content="fast", options={})
+    slow.weight, fast.weight = 1000.0, 0.001
+    pool = BackendPool([slow, fast], hedge_delay_ms=20)
+    started = time.perf_counter()
+    content, timing = pool.complete(REQUEST, "test")
+    assert content == "fast" and timing["hedged"]
+    assert time.perf_counter() - started < 0.4
+    assert (pool.hedges, pool.hedge_wins) == (1, 1)
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    broken = FakeBackend("broken", error=ConnectionError("down"))
+    healthy = FakeBackend("healthy", content="chunk")
+    broken.weight, healthy.weight = 1000.0, 0.001
+    info = {}
+    assert list(BackendPool([broken, healthy]).stream(REQUEST, info)) == [("chunk", None)]
+    assert info["backend"] == "healthy"
+
+
+def test_options_come_from_the_model_and_skip_json_mode_when_streaming():
+    qwen = FakeBackend("qwen", model="qwen/qwen3-32b")
+    llama = FakeBackend("llama", model="llama-3.3-70b-versatile")
+    qwen.complete(REQUEST)
+    list(qwen.stream(REQUEST))
+    llama.complete(REQUEST)
+    assert qwen.requests[0]["reasoning_effort"] == "none"
+    assert qwen.requests[0]["response_format"] == {"type": "json_object"}
+    assert "response_format" not in qwen.requests[1]
+    assert llama.requests[0] == REQUEST
+
+
+def test_signature_tracks_models_and_options_but_not_names_or_keys():
+    a = BackendPool([FakeBackend("a", model="qwen/qwen3-32b")])
+    b = BackendPool([FakeBackend("renamed", model="qwen/qwen3-32b")])
+    b.backends[0].api_key = "another key"
+    assert a.signature == b.signature
+    assert a.signature != BackendPool([FakeBackend("a", model="qwen/qwen3-32b", options={})]).signature
+    assert a.signature != BackendPool([FakeBackend("a", model="llama-3.3-70b-versatile")]).signature
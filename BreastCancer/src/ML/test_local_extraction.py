@@ -0,0 +1,53 @@
+"""
+Unit tests for the rule-based fast path of feature extraction (no LLM call)
+
+    python -m pytest -q test_local_extraction.py
+"""
+from feature_extractor import FEATURE_COLS, extract_features_from_text, extract_features_locally
+from scoring import feature_cols
+
+
+def resolved(text):
+    features, confidence = extract_features_locally(text)
+    return {col: (value, confidence[col]) for col, value in features.items() if value is not None}
+
+
+def test_feature_order_comes_from_scoring():
+    assert FEATURE_COLS is feature_cols
+
+
+def test_explicit_pairs_and_decimal_commas():
+    assert resolved("radius_mean : 19.8\nmean texture = 21,5") == {
+        "radius_mean": (19.8, 1.0),
+        "texture_mean": (21.5, 1.0),
+    }
+
+
+def test_explicit_pair_wins_over_prose():
+    text = "radius_mean: 19.8\nLe rayon moyen de la masse est estimé à 18,5 mm."
+    assert resolved(text)["radius_mean"] == (19.8, 1.0)
+
+
+def test_french_prose_sections_and_respectively():
+    text = ("Valeurs moyennes\n"
+            "Le périmètre et la surface sont respectivement de 120,5 et 1001,0.\n"
+            "Écarts-types\n"
+            "Le rayon est de 1,2.")
+    assert resolved(text) == {
+        "perimeter_mean": (120.5, 0.8),
+        "area_mean": (1001.0, 0.8),
+        "radius_se": (1.2, 0.9),
+    }
+
+
+def test_unrelated_numbers_are_ignored():
+    assert resolved("Patiente âgée de 54 ans, vue le 12/03, pas d'antécédents.") == {}
+
+
+def test_fully_resolved_report_skips_the_llm():
+    text = "\n".join(f"{col}: {i + 0.5}" for i, col in enumerate(feature_cols))
+    details = {}
+    features = extract_features_from_text(text, api_key="unused", use_cache=False, details=details)
+    assert features == {col: i + 0.5 for i, col in enumerate(feature_cols)}
+    assert not details["llm_called"]
+    assert set(details["source"].values()) == {"local"}
@@ -0,0 +1,42 @@
+"""
+Unit tests for the versioned schema migrations (migrations.py), run against
+the embedded SQLite backend
+
+    python -m pytest -q test_migrations.py
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sqlite_storage import SQLiteRepository
+from storage import SchemaOutdated
+
+
+def test_migrations_apply_in_steps_and_once(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "db.sqlite3"))
+    assert repo.schema_version() == 0
+    assert repo.migrate(2) == [1, 2]
+    with pytest.raises(SchemaOutdated):
+        repo.check_schema()
+    assert repo.migrate() == list(range(3, repo.latest_version + 1))
+    assert repo.migrate() == []
+    repo.check_schema()
+    assert repo.find_doctor("166JMT8965")["nom"] == "Smith"
+
+
+def test_server_refuses_an_unmigrated_database(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "db.sqlite3"))
+    with pytest.raises(SchemaOutdated):
+        repo.list_patients()
+    assert repo.schema_version() == 0  # queries never create the schema themselves
+
+
+def test_migrations_command_needs_no_mysql_driver(tmp_path):
+    env = dict(os.environ, STORAGE_BACKEND="sqlite", SQLITE_PATH=str(tmp_path / "cli.sqlite3"))
+    script = "import sys, migrations; sys.argv = ['migrations.py']; migrations.main(); print('mysql' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().endswith("False")
+    assert "Schema up to date" in result.stdout
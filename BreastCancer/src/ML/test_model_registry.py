@@ -0,0 +1,94 @@
+"""
+Unit tests for the versioned, hot-reloadable model registry (model_registry.py)
+
+    python -m pytest -q test_model_registry.py
+"""
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import model_registry
+from model_registry import (LOGISTIC_KERNEL, MLP_KERNEL, SOFTMAX_KERNEL, ModelRegistry, ReloadInProgress,
+                            write_manifest)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def publish(versions_dir, version):
+    path = os.path.join(versions_dir, version)
+    for kernel in (SOFTMAX_KERNEL, MLP_KERNEL, LOGISTIC_KERNEL):
+        shutil.copytree(os.path.join(HERE, kernel), os.path.join(path, kernel))
+    write_manifest(path, version)
+    return path
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def registry(tmp_path):
+    versions_dir = str(tmp_path / "versions")
+    for version in ("v1", "v2", "v3"):
+        publish(versions_dir, version)
+    registry = ModelRegistry(default_path=HERE, versions_dir=versions_dir, poll_interval=0.01)
+    registry.load_initial()
+    return registry
+
+
+@pytest.fixture
+def slow_loads(monkeypatch):
+    """Make loads wait until the test releases them."""
+    release = threading.Event()
+    load = model_registry.load_model_set
+
+    def blocked(path):
+        release.wait(5)
+        return load(path)
+
+    monkeypatch.setattr(model_registry, "load_model_set", blocked)
+    yield release
+    release.set()
+
+
+def test_activate_swaps_the_version_in(registry):
+    registry.activate("v2")
+    assert wait_for(lambda: registry.current().version == "v2")
+    assert registry.status()["available"] == ["v1", "v2", "v3"]
+    with pytest.raises(ValueError):
+        registry.activate("../v1")
+
+
+def test_activate_during_a_load_fails_without_moving_the_pointer(registry, slow_loads):
+    registry.activate("v1")
+    with pytest.raises(ReloadInProgress):
+        registry.activate("v2")
+    assert registry._read_pointer() == "v1"
+    slow_loads.set()
+    assert wait_for(lambda: registry.current().version == "v1" and registry.status()["loading"] is None)
+
+
+def test_pointer_change_during_a_load_is_not_lost(registry, slow_loads):
+    registry.current()  # starts the watcher
+    assert registry.reload_async("v1")
+    with open(registry.pointer_file, "w", encoding="utf-8") as f:
+        f.write("v2")
+    time.sleep(0.1)  # several polls while v1 is still loading
+    slow_loads.set()
+    assert wait_for(lambda: registry.current().version == "v2")
+
+
+def test_corrupt_version_is_refused_and_the_current_one_kept(registry):
+    with open(os.path.join(registry.versions_dir, "v3", MLP_KERNEL, "b0.npy"), "ab") as f:
+        f.write(b"\0")
+    before = registry.current().version
+    assert registry.reload_async("v3")
+    assert wait_for(lambda: registry.status()["last_error"] is not None)
+    assert "Checksum mismatch" in registry.status()["last_error"]
+    assert registry.current().version == before
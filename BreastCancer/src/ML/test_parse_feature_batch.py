@@ -0,0 +1,56 @@
+"""
+Unit tests for the batch payload parsing of /predict2_batch and /predict3_batch
+(no server needed, unlike test_batch_predict.py)
+
+    python -m pytest -q test_parse_feature_batch.py
+"""
+import numpy as np
+import pytest
+
+from app import merge_batch_results, parse_feature_batch
+from scoring import feature_cols
+
+ROW = {col: float(i + 1) for i, col in enumerate(feature_cols)}
+
+
+def test_records_and_wrapped_records():
+    for payload in ([ROW, ROW], {"records": [ROW, ROW]}):
+        X, rows, errors = parse_feature_batch(payload)
+        assert X.shape == (2, 30) and X.dtype == np.float32
+        assert np.array_equal(X[0], np.arange(1, 31, dtype=np.float32))
+        assert rows == [0, 1] and errors == []
+
+
+def test_column_oriented_payload():
+    X, rows, errors = parse_feature_batch({col: [value, value * 2] for col, value in ROW.items()})
+    assert np.array_equal(X[1], 2 * np.arange(1, 31, dtype=np.float32))
+    assert rows == [0, 1] and errors == []
+
+
+def test_ragged_columns_are_rejected():
+    payload = {col: [value] for col, value in ROW.items()}
+    payload["radius_mean"] = [1.0, 2.0]
+    with pytest.raises(ValueError):
+        parse_feature_batch(payload)
+
+
+def test_missing_features_filled_or_rejected():
+    X, rows, errors = parse_feature_batch([{"radius_mean": 17.99}])
+    assert X[0, 0] == np.float32(17.99) and not X[0, 1:].any()
+    X, rows, errors = parse_feature_batch([{"radius_mean": 17.99}], fill_missing=False)
+    assert len(X) == 0 and rows == []
+    assert errors == [{"index": 0, "error": "missing field 'texture_mean'"}]
+
+
+def test_invalid_rows_keep_their_input_position():
+    X, rows, errors = parse_feature_batch([ROW, {"radius_mean": "abc"}, "row", ROW])
+    assert rows == [0, 3]
+    assert [e["index"] for e in errors] == [1, 2]
+    results = merge_batch_results(4, rows, [{"p": 0}, {"p": 3}], errors)
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[3]["p"] == 3 and "error" in results[1]
+
+
+def test_unknown_payload_shape():
+    with pytest.raises(ValueError):
+        parse_feature_batch({"foo": [1]})
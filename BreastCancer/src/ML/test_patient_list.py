@@ -0,0 +1,103 @@
+"""
+Unit tests for the paginated patient list (/get_patients) and its change feed
+(/patients/changes), served from an embedded SQLite repository
+
+    python -m pytest -q test_patient_list.py
+"""
+import sqlite3
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(monkeypatch, repo):
+    monkeypatch.setattr(app_module, "repo", repo)
+    return app_module.app.test_client()
+
+
+def all_pages(client, **params):
+    ids, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        page = client.get("/get_patients", query_string=query).get_json()
+        ids.extend(p["id"] for p in page["patients"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_keyset_pages_cover_every_patient_once(client, repo, consultation):
+    repo.save_consultations([consultation(f"P{i}", risk_level="High" if i % 2 else "Low", doctor_id=1 if i < 3 else None)
+                             for i in range(7)])
+    assert all_pages(client, limit=3) == [f"P{i}" for i in range(7)]
+    assert all_pages(client, limit=2, risk_level="High") == ["P1", "P3", "P5"]
+    assert all_pages(client, limit=1, doctor_id=1) == ["P0", "P1", "P2"]
+
+
+def test_each_patient_shows_its_latest_consultation(client, repo, consultation):
+    repo.save_consultations([consultation("P1", risk_level="Low", date="2026-01-01 10:00:00"),
+                             consultation("P1", risk_level="High", date="2026-03-01 10:00:00"),
+                             consultation("P1", risk_level="Medium", date="2026-02-01 10:00:00")])
+    [patient] = client.get("/get_patients").get_json()["patients"]
+    assert (patient["riskLevel"], patient["lastVisit"]) == ("High", "2026-03-01")
+
+
+def test_unchanged_list_answers_304(client, repo, consultation):
+    repo.save_consultations([consultation("P1")])
+    first = client.get("/get_patients", query_string={"limit": 10})
+    etag = first.headers["ETag"]
+    assert client.get("/get_patients", query_string={"limit": 10},
+                      headers={"If-None-Match": etag}).status_code == 304
+    # Another page of the same list has its own tag
+    assert client.get("/get_patients", query_string={"limit": 5},
+                      headers={"If-None-Match": etag}).status_code == 200
+    repo.save_consultations([consultation("P2")])
+    assert client.get("/get_patients", query_string={"limit": 10},
+                      headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_invalid_page_parameters_are_refused(client):
+    for query in ({"limit": 0}, {"limit": "ten"}, {"doctor_id": "x"}):
+        assert client.get("/get_patients", query_string=query).status_code == 400
+
+
+def backdate_change_log(repo, days):
+    with sqlite3.connect(repo.path) as conn:
+        conn.execute("UPDATE change_log SET changed_at = datetime('now', 'localtime', ?)", (f"-{days} days",))
+
+
+def test_change_feed_sends_only_what_changed(client, repo, consultation):
+    repo.save_consultations([consultation("P1"), consultation("P2")])
+    since = client.get("/get_patients").get_json()["change_seq"]
+    assert client.get("/patients/changes", query_string={"since": since}).status_code == 204
+
+    repo.save_consultations([consultation("P2", risk_level="High"), consultation("P3")])
+    changes = client.get("/patients/changes", query_string={"since": since}).get_json()
+    assert [p["id"] for p in changes["patients"]] == ["P2", "P3"]
+    assert [(c["patientId"], c["riskLevel"]) for c in changes["consultations"]] == [("P2", "High"), ("P3", None)]
+    assert (changes["next_cursor"], changes["has_more"]) == (since + 2, False)
+
+
+def test_change_feed_pages_with_its_cursor(client, repo, consultation):
+    repo.save_consultations([consultation(f"P{i}") for i in range(5)])
+    first = client.get("/patients/changes", query_string={"since": 0, "limit": 3}).get_json()
+    assert first["has_more"] and [p["id"] for p in first["patients"]] == ["P0", "P1", "P2"]
+    rest = client.get("/patients/changes", query_string={"since": first["next_cursor"]}).get_json()
+    assert not rest["has_more"] and [p["id"] for p in rest["patients"]] == ["P3", "P4"]
+
+
+def test_cursor_outside_the_retained_log_must_resync(client, repo, consultation):
+    repo.save_consultations([consultation("P1")])
+    backdate_change_log(repo, 10)
+    repo.save_consultations([consultation("P2")])
+    assert repo.prune_change_log(keep_days=7) == 1
+
+    stale = client.get("/patients/changes", query_string={"since": 0})
+    assert stale.status_code == 410 and stale.get_json()["resync"]
+    # From the pruned point on, the feed still works
+    assert [p["id"] for p in client.get("/patients/changes", query_string={"since": 1}).get_json()["patients"]] == ["P2"]
+    # A cursor from the future (e.g. another database) is refused as well
+    assert client.get("/patients/changes", query_string={"since": 99}).status_code == 410
+    assert client.get("/patients/changes", query_string={"since": -1}).status_code == 400
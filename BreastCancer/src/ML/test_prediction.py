@@ -1,9 +1,14 @@
+"""
+Score a feature set with /predict2 on a running server.
+
+    echo "Rapport..." | python feature_extractor.py | python test_prediction.py
+"""
 import requests
 import json
+import sys
 
-# Load the extracted features
-with open('extracted_features.json', 'r', encoding='utf-8') as f:
-    features = json.load(f)
+# Load the extracted features (the JSON printed by feature_extractor.py)
+features = json.load(sys.stdin)
 
 print("Testing prediction with extracted features...")
 print(f"Features loaded: {len(features)} features")
@@ -0,0 +1,62 @@
+"""
+Unit tests for single-flight deduplication (singleflight.py)
+
+    python -m pytest -q test_singleflight.py
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"radius_mean": 17.99}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "report", work) for _ in range(8)]
+        while flight.stats()["shared"] < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert len(calls) == 1
+    assert all(result == {"radius_mean": 17.99} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flight.stats()["inflight"] == 0
+
+
+def test_error_reaches_every_waiter_and_next_call_runs_again():
+    flight = SingleFlight("test")
+    future, leader = flight.begin("report")
+    waiter, is_leader = flight.begin("report")
+    assert leader and not is_leader
+    flight.finish("report", error=ValueError("LLM down"))
+    with pytest.raises(ValueError):
+        waiter.result(1)
+    assert flight.do("report", lambda: 42) == (42, False)
+
+
+def test_cancelled_leader_gives_waiters_a_plain_error():
+    flight = SingleFlight("test")
+    flight.begin("report")
+    waiter, _ = flight.begin("report")
+    flight.finish("report", error=GeneratorExit())
+    with pytest.raises(RuntimeError, match="cancelled"):
+        waiter.result(1)
+
+
+def test_different_keys_do_not_share():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.stats()["leaders"] == 2
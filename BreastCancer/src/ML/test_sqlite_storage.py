@@ -0,0 +1,71 @@
+"""
+Unit tests for the embedded SQLite repository (sqlite_storage.py)
+
+    python -m pytest -q test_sqlite_storage.py
+"""
+import sqlite3
+
+import pytest
+
+from storage import Repository
+
+
+def change_log_size(repo):
+    with sqlite3.connect(repo.path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+
+
+def test_repository_is_abstract():
+    class Incomplete(Repository):
+        def schema_version(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_save_is_idempotent_by_write_id(repo, consultation):
+    record = consultation(risk_level="High")
+    first = repo.save_consultations([record])
+    assert repo.save_consultations([record]) == first
+    assert len(repo.list_consultations()) == 1
+    assert repo.patient_exists("P1")
+
+
+def test_replay_logs_no_change_and_keeps_newer_patient_data(repo, consultation):
+    old = consultation(patient_age="54")
+    repo.save_consultations([old])
+    renamed = consultation(patient_name="Dupont-Martin", patient_age="55")
+    repo.save_consultations([renamed])
+    seq, logged = repo.change_seq(), change_log_size(repo)
+
+    # A write-behind drain replays the first batch, with one new record
+    mapping = repo.save_consultations([old, consultation("P2")])
+    assert set(mapping) == {old["write_id"], repo.list_consultations()[-1]["write_id"]}
+    assert (repo.change_seq(), change_log_size(repo)) == (seq + 1, logged + 1)
+    [patient] = [p for p in repo.list_patients() if p["id_patient"] == "P1"]
+    assert (patient["nom"], patient["age"]) == ("Dupont-Martin", 55)
+
+    repo.save_consultations([old, renamed])
+    assert (repo.change_seq(), change_log_size(repo)) == (seq + 1, logged + 1)
+
+
+def test_patient_page_shows_the_latest_consultation(repo, consultation):
+    repo.save_consultations([consultation(risk_level="High", date="2026-02-01 10:00:00")])
+    # Imported history: saved later, but older than the consultation above
+    repo.save_consultations([consultation(risk_level="Low", date="2026-01-01 10:00:00"), consultation("P2")])
+    patients, next_cursor = repo.patients_page(limit=1)
+    assert [p["id_patient"] for p in patients] == ["P1"]
+    assert patients[0]["risk_level"] == "High"
+    patients, _ = repo.patients_page(after=next_cursor, limit=10)
+    assert [p["id_patient"] for p in patients] == ["P2"]
+
+
+def test_change_feed_returns_only_newer_changes(repo, consultation):
+    repo.save_consultations([consultation("P1")])
+    since = repo.change_seq()
+    repo.save_consultations([consultation("P2")])
+    changes = repo.changes(since, 10)
+    assert [p["id_patient"] for p in changes["patients"]] == ["P2"]
+    assert changes["next_cursor"] == repo.change_seq()
+
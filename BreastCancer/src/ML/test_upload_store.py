@@ -0,0 +1,108 @@
+"""
+Unit tests for content-addressed uploads (upload_store.py) and their signed URLs (auth.py)
+
+    python -m pytest -q test_upload_store.py
+"""
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import auth
+from upload_store import ThumbnailWorker, UploadStore, sniff_mimetype
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def save(store, data, filename="scan.png"):
+    file = FileStorage(stream=io.BytesIO(data), filename=filename)
+    try:
+        return store.store(file)
+    finally:
+        file.close()  # as at the end of a request: removes the spool, the stored link stays
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / "uploads"), max_bytes=1024)
+
+
+def stored_files(store):
+    return sorted(name for directory, _, names in os.walk(store.root) for name in names
+                  if directory != store.tmp_dir)
+
+
+def test_identical_uploads_are_stored_once(store):
+    digest, created = save(store, PNG, "a.png")
+    again, created_again = save(store, PNG, "renamed.png")
+    assert digest == again == hashlib.sha256(PNG).hexdigest()
+    assert (created, created_again) == (True, False)
+    assert stored_files(store) == [digest]
+    assert os.listdir(store.tmp_dir) == []
+    stats = store.stats()
+    assert (stats["stored"], stats["duplicates"], stats["bytes_deduplicated"]) == (1, 1, len(PNG))
+
+
+def test_spooled_uploads_are_linked_into_place(store):
+    spool = store.spool()
+    for i in range(0, len(PNG), 10):
+        spool.write(PNG[i:i + 10])
+    digest, created = store.store(FileStorage(stream=spool, filename="a.png"))
+    assert created and digest == hashlib.sha256(PNG).hexdigest()
+    with open(store.path_for(digest), "rb") as f:
+        assert f.read() == PNG
+    spool.close()
+    assert os.path.exists(store.path_for(digest))
+
+
+def test_same_name_different_content_does_not_overwrite(store):
+    first, _ = save(store, PNG, "scan.png")
+    second, _ = save(store, PNG + b"\x01", "scan.png")
+    assert first != second
+    assert len(stored_files(store)) == 2
+
+
+def test_oversized_upload_is_refused(store):
+    with pytest.raises(RequestEntityTooLarge):
+        save(store, b"\xff\xd8\xff" + b"\x00" * 2048, "big.jpg")
+    assert stored_files(store) == []
+
+
+def test_digest_is_validated_and_type_sniffed(store):
+    with pytest.raises(ValueError):
+        store.path_for("../../etc/passwd")
+    digest, _ = save(store, PNG)
+    assert sniff_mimetype(store.path_for(digest)) == "image/png"
+
+
+def test_thumbnail_is_made_in_the_background(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("L", (800, 400), 128).save(buffer, "PNG")
+    store = UploadStore(str(tmp_path / "uploads"), thumbnails=ThumbnailWorker(size=64, max_workers=1))
+    digest, _ = save(store, buffer.getvalue())
+    thumbnail = ThumbnailWorker.thumbnail_path(store.path_for(digest))
+    deadline = time.monotonic() + 5
+    while not os.path.exists(thumbnail) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    with Image.open(thumbnail) as img:
+        assert img.format == "JPEG" and max(img.size) == 64
+
+
+def test_signed_urls_are_bound_to_resource_and_expire(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", "test-secret")
+    params = auth.sign_url("get_upload/abc")
+    auth.verify_signed_url("get_upload/abc", str(params["expires"]), params["sig"])
+    with pytest.raises(auth.AuthError):
+        auth.verify_signed_url("get_upload_thumbnail/abc", params["expires"], params["sig"])
+    with pytest.raises(auth.AuthError):
+        auth.verify_signed_url("get_upload/abc", params["expires"] + 1, params["sig"])
+    with pytest.raises(auth.AuthError):
+        auth.verify_signed_url("get_upload/abc", "soon", params["sig"])
+    expired = auth.sign_url("get_upload/abc", ttl=-1)
+    with pytest.raises(auth.AuthError, match="expired"):
+        auth.verify_signed_url("get_upload/abc", expired["expires"], expired["sig"])
@@ -0,0 +1,60 @@
+"""
+Unit tests for the write-behind consultation queue (consultation_store.py),
+drained into an embedded SQLite repository
+
+    python -m pytest -q test_write_behind.py
+"""
+import pytest
+
+from consultation_store import WriteBehindQueue
+from storage import StorageUnavailable
+
+
+@pytest.fixture(autouse=True)
+def no_drainer_thread(monkeypatch):
+    # The tests drain with flush() / drain_once() themselves
+    monkeypatch.setattr(WriteBehindQueue, "ensure_started", lambda self: None)
+
+
+def test_queue_fsyncs_every_commit(tmp_path, repo):
+    queue = WriteBehindQueue(str(tmp_path / "queue.sqlite3"), repo.save_consultations)
+    assert queue._connect().execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+
+
+def test_queued_saves_are_replayed_after_a_restart(tmp_path, repo, consultation):
+    def database_down(records):
+        raise StorageUnavailable("MySQL unreachable")
+
+    path = str(tmp_path / "queue.sqlite3")
+    queue = WriteBehindQueue(path, database_down)
+    queue.enqueue(consultation("P1"))
+    queue.enqueue(consultation("P2"))
+    with pytest.raises(StorageUnavailable):
+        queue.drain_once()
+    assert queue.stats()["max_attempts"] == 1
+
+    restarted = WriteBehindQueue(path, repo.save_consultations)
+    assert restarted.pending() == 2
+    assert restarted.flush()
+    assert [c["patient_id"] for c in repo.list_consultations()] == ["P1", "P2"]
+
+
+def test_replaying_an_already_written_batch_does_not_duplicate(tmp_path, repo, consultation):
+    queue = WriteBehindQueue(str(tmp_path / "queue.sqlite3"), repo.save_consultations)
+    record = consultation()
+    queue.enqueue(record)
+    # A previous drain committed the batch, then stopped before removing it from the queue
+    repo.save_consultations([record])
+    assert queue.flush()
+    assert len(repo.list_consultations()) == 1
+
+
+def test_rejected_record_is_set_aside_and_the_rest_written(tmp_path, repo, consultation):
+    queue = WriteBehindQueue(str(tmp_path / "queue.sqlite3"), repo.save_consultations)
+    queue.enqueue(consultation("P1"))
+    queue.enqueue(consultation("P2", doctor_id="999"))  # unknown doctor: foreign key violation
+    queue.enqueue(consultation("P3"))
+    assert queue.flush()
+    assert [c["patient_id"] for c in repo.list_consultations()] == ["P1", "P3"]
+    stats = queue.stats()
+    assert (stats["failed"], stats["dead"], stats["drained"]) == (1, 1, 2)
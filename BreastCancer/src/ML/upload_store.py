@@ -0,0 +1,316 @@
+"""
+Content-addressed storage of consultation images.
+
+Uploads are streamed to disk while the multipart body is parsed:
+UploadRequest (the Flask request class) gives the parser a SpooledUpload,
+which writes each chunk to a temporary file under UPLOAD_DIR/tmp and feeds
+it to SHA-256 on the way. When the view runs, the file is already on disk
+and hashed; UploadStore.store() only links it into place under its digest:
+
+    UPLOAD_DIR/ab/cd/abcd0123...   (sha256 hex digest, two shard levels)
+
+An identical image already has that name, so it is not stored twice, and
+different images never overwrite each other whatever their filenames.
+consultation.image_path holds the digest; GET /uploads/<digest> serves it.
+
+Thumbnails are made after the request by a small background pool
+(ThumbnailWorker) when Pillow is installed, next to the original as
+<digest>.thumb.jpg.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+# Temporary files older than this are leftovers of crashed workers
+STALE_TMP_SECONDS = 3600
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes of the formats the frontend accepts
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"%PDF", "application/pdf"),
+]
+
+
+def is_digest(value):
+    return bool(_DIGEST_RE.match(value or ""))
+
+
+def sniff_mimetype(path):
+    """MIME type of a stored file from its first bytes (stored files have no extension)."""
+    with open(path, "rb") as f:
+        head = f.read(16)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    return "application/octet-stream"
+
+
+class SpooledUpload:
+    """
+    Temporary upload file that hashes everything written to it.
+
+    Readable and seekable like the file it wraps; the temporary file is
+    removed on close() (a stored copy is a separate hard link).
+
+    Raises:
+        RequestEntityTooLarge: From write() once the upload exceeds max_bytes
+    """
+
+    def __init__(self, tmp_dir, max_bytes=None):
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=tmp_dir, prefix="upload-")
+        self._file = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            # The parser drops this stream without closing it
+            self.close()
+            raise RequestEntityTooLarge(f"Upload larger than {self.max_bytes} bytes")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush, fileno...
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadRequest(Request):
+    """Flask request class spooling the file uploads of `upload_endpoints` into `upload_store`."""
+
+    upload_store = None
+    upload_endpoints = frozenset()
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_store is not None and self.endpoint in self.upload_endpoints:
+            return self.upload_store.spool()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+class ThumbnailWorker:
+    """
+    Background pool making JPEG thumbnails of stored images.
+
+    Args:
+        size: Maximum width and height in pixels
+        max_workers: Thumbnails made at once in this process
+    """
+
+    def __init__(self, size=256, max_workers=2):
+        self.size = size
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+        self.made = 0
+        self.skipped = 0
+        self.failed = 0
+
+    @property
+    def available(self):
+        return Image is not None
+
+    @staticmethod
+    def thumbnail_path(path):
+        return path + ".thumb.jpg"
+
+    def _pool(self):
+        # Threads do not survive fork(): one executor per process
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="thumbnail")
+            self._pid = os.getpid()
+            self._pending = set()
+        return self._executor
+
+    def submit(self, path):
+        """
+        Schedule the thumbnail of the stored file `path` unless it exists or is already scheduled.
+
+        Returns:
+            True if a thumbnail job was scheduled
+        """
+        if not self.available or os.path.exists(self.thumbnail_path(path)):
+            return False
+        with self._lock:
+            executor = self._pool()
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+        executor.submit(self._run, path)
+        return True
+
+    def _run(self, path):
+        target = self.thumbnail_path(path)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(path) as image:
+                image.thumbnail((self.size, self.size))
+                image.convert("RGB").save(tmp, "JPEG", quality=85)
+            os.replace(tmp, target)
+            with self._lock:
+                self.made += 1
+        except Image.UnidentifiedImageError:
+            # PDFs and other non-image uploads have no thumbnail
+            with self._lock:
+                self.skipped += 1
+        except Exception as e:
+            print(f"⚠️ Thumbnail of {os.path.basename(path)} failed: {type(e).__name__}: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            with self._lock:
+                self._pending.discard(path)
+
+    def stats(self):
+        with self._lock:
+            return {"available": self.available, "size": self.size, "max_workers": self.max_workers,
+                    "pending": len(self._pending), "made": self.made, "skipped": self.skipped,
+                    "failed": self.failed}
+
+
+class UploadStore:
+    """
+    Uploaded files stored once under their SHA-256 digest.
+
+    Args:
+        root: Upload directory
+        max_bytes: Largest accepted upload (None = unlimited)
+        thumbnails: ThumbnailWorker given every stored file lacking a thumbnail (None = no thumbnails)
+    """
+
+    def __init__(self, root, max_bytes=None, thumbnails=None):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.max_bytes = max_bytes
+        self.thumbnails = thumbnails
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.duplicates = 0
+        self.bytes_stored = 0
+        self.bytes_deduplicated = 0
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._sweep_tmp()
+
+    def _sweep_tmp(self):
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass  # removed by another worker
+
+    def spool(self):
+        """New SpooledUpload in this store's temporary directory (same filesystem as the store)."""
+        return SpooledUpload(self.tmp_dir, self.max_bytes)
+
+    def path_for(self, digest):
+        """
+        Path of the file stored under `digest`.
+
+        Raises:
+            ValueError: If digest is not a SHA-256 hex digest
+        """
+        if not is_digest(digest):
+            raise ValueError(f"Invalid upload digest {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def store(self, upload):
+        """
+        Store an uploaded file (werkzeug FileStorage) under its content hash.
+
+        Uploads parsed by UploadRequest are already spooled and hashed; any
+        other stream is copied through a spool first.
+
+        Returns:
+            (digest, created) where created is False for a duplicate
+
+        Raises:
+            RequestEntityTooLarge: If the upload exceeds max_bytes
+        """
+        spool = upload.stream
+        if not isinstance(spool, SpooledUpload):
+            spool = self.spool()
+            try:
+                shutil.copyfileobj(upload.stream, spool, CHUNK_SIZE)
+            except BaseException:
+                spool.close()
+                raise
+            upload.stream = spool  # closed with the upload
+        digest = spool.digest
+        path = self.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        spool.flush()
+        if not os.path.exists(path):
+            os.fsync(spool.fileno())  # on disk before it becomes visible under its final name
+        try:
+            # Atomic create-if-absent: concurrent uploads of the same image store it once
+            os.link(spool.path, path)
+            created = True
+        except FileExistsError:
+            created = False
+
+        with self._lock:
+            if created:
+                self.stored += 1
+                self.bytes_stored += spool.size
+            else:
+                self.duplicates += 1
+                self.bytes_deduplicated += spool.size
+        if self.thumbnails is not None:
+            self.thumbnails.submit(path)
+        return digest, created
+
+    def stats(self):
+        with self._lock:
+            stats = {"root": self.root, "max_bytes": self.max_bytes, "stored": self.stored,
+                     "duplicates": self.duplicates, "bytes_stored": self.bytes_stored,
+                     "bytes_deduplicated": self.bytes_deduplicated}
+        if self.thumbnails is not None:
+            stats["thumbnails"] = self.thumbnails.stats()
+        return stats
@@ -0,0 +1,52 @@
+// Session token issued by /login, sent as a bearer token on every API call
+const API_BASE_URL = 'http://localhost:5000';
+const TOKEN_KEY = 'token';
+
+export const getToken = (): string | null => localStorage.getItem(TOKEN_KEY);
+
+export const setSession = (token: string, doctor: unknown) => {
+  localStorage.setItem(TOKEN_KEY, token);
+  localStorage.setItem('doctor', JSON.stringify(doctor));
+};
+
+export const clearSession = () => {
+  localStorage.removeItem(TOKEN_KEY);
+  localStorage.removeItem('doctor');
+};
+
+// fetch() with the Authorization header; an expired or revoked session goes back to the login page
+export const authFetch = async (input: RequestInfo | URL, init: RequestInit = {}): Promise<Response> => {
+  const headers = new Headers(init.headers);
+  const token = getToken();
+  if (token) headers.set('Authorization', `Bearer ${token}`);
+
+  const response = await fetch(input, { ...init, headers });
+  if (response.status === 401) {
+    clearSession();
+    if (window.location.pathname !== '/') window.location.assign('/');
+  }
+  return response;
+};
+
+export const logout = async () => {
+  try {
+    await authFetch(`${API_BASE_URL}/logout`, { method: 'POST' });
+  } catch (err) {
+    console.error('Logout error:', err);
+  } finally {
+    clearSession();
+  }
+};
+
+// <img src> cannot send the Authorization header: uploaded images are loaded
+// through short-lived signed URLs minted by the backend
+export const uploadUrls = async (digest: string) => {
+  const response = await authFetch(`${API_BASE_URL}/uploads/${digest}/urls`);
+  if (!response.ok) throw new Error(`Upload ${digest}: HTTP ${response.status}`);
+  const urls = await response.json();
+  return {
+    url: `${API_BASE_URL}${urls.url}`,
+    thumbnailUrl: `${API_BASE_URL}${urls.thumbnail_url}`,
+    expiresAt: urls.expires_at as number,
+  };
+};
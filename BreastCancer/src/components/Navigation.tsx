@@ -1,7 +1,14 @@
-import { Link, useLocation } from 'react-router-dom';
+import { Link, useLocation, useNavigate } from 'react-router-dom';
+import { logout } from '../auth';
 
 const Navigation = () => {
     const location = useLocation();
+    const navigate = useNavigate();
+
+    const handleLogout = async () => {
+        await logout();
+        navigate('/');
+    };
 
     const isActive = (path: string) => {
         return location.pathname === path;
@@ -49,6 +56,16 @@ const Navigation = () => {
                         </div>
                         <span className="text-sm font-bold text-gray-700">3 Modèles IA Actifs</span>
                     </div>
+
+                    <button
+                        onClick={handleLogout}
+                        className="flex items-center space-x-2 px-4 py-2 rounded-xl font-bold bg-white text-gray-700 hover:bg-purple-50 border-2 border-purple-200 hover:border-purple-400 transition-all duration-300"
+                    >
+                        <svg className="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
+                            <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M17 16l4-4m0 0l-4-4m4 4H7m6 4v1a3 3 0 01-3 3H6a3 3 0 01-3-3V7a3 3 0 013-3h4a3 3 0 013 3v1" />
+                        </svg>
+                        <span>Déconnexion</span>
+                    </button>
                 </nav>
             </div>
         </div>
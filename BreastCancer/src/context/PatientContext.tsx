@@ -1,4 +1,5 @@
-import { createContext, useContext, useState, useEffect, type ReactNode } from 'react';
+import { createContext, useContext, useState, useEffect, useRef, type ReactNode } from 'react';
+import { authFetch, getToken } from '../auth';
 
 export interface Patient {
     id: string;
@@ -37,30 +38,92 @@ interface PatientContextType {
 const PatientContext = createContext<PatientContextType | undefined>(undefined);
 
 const API_BASE_URL = 'http://localhost:5000';
+// Patients per /get_patients page (the server caps it at 500)
+const PATIENTS_PAGE_SIZE = 200;
+// Background refresh of the list through the change feed
+const PATIENTS_POLL_MS = 30000;
+
+// Replace changed patients in place (keeping their local reports), append new ones
+const mergePatients = (current: Patient[], changed: Patient[]): Patient[] => {
+    const byId = new Map(current.map(p => [p.id, p]));
+    for (const patient of changed) {
+        const existing = byId.get(patient.id);
+        byId.set(patient.id, { ...existing, ...patient, reports: existing?.reports || [] });
+    }
+    return Array.from(byId.values()).sort((a, b) => (a.id < b.id ? -1 : a.id > b.id ? 1 : 0));
+};
 
 export const PatientProvider = ({ children }: { children: ReactNode }) => {
     const [patients, setPatients] = useState<Patient[]>([]);
 
-    // Fetch patients from the API
-    const refreshPatients = async () => {
-        try {
-            const response = await fetch(`${API_BASE_URL}/get_patients`);
+    // Change sequence the local list is up to date with (null until the first full load)
+    const changeSeq = useRef<number | null>(null);
+
+    // Fetch the full list from the API, following the keyset pagination cursor
+    const loadAllPatients = async () => {
+        const loaded: Patient[] = [];
+        let cursor: string | null = null;
+        let seq: number | null = null;
+        do {
+            const params = new URLSearchParams({ limit: String(PATIENTS_PAGE_SIZE) });
+            if (cursor) params.set('cursor', cursor);
+            const response = await authFetch(`${API_BASE_URL}/get_patients?${params}`);
             const data = await response.json();
 
-            if (data.success && data.patients) {
-                setPatients(data.patients.map((p: any) => ({
-                    ...p,
-                    reports: []
-                })));
+            if (!data.success || !data.patients) return;
+            loaded.push(...data.patients);
+            // The first page's sequence: later changes are replayed by the feed (merging is idempotent)
+            seq = seq ?? data.change_seq ?? null;
+            cursor = data.next_cursor ?? null;
+        } while (cursor);
+
+        changeSeq.current = seq;
+        setPatients(prev => {
+            const reports = new Map(prev.map(p => [p.id, p.reports]));
+            return loaded.map(p => ({ ...p, reports: reports.get(p.id) || [] }));
+        });
+    };
+
+    // Apply only what changed since the last load; an unchanged list costs one empty 204 response
+    const refreshPatients = async () => {
+        // Nothing to show before login (the login page calls this once signed in)
+        if (!getToken()) return;
+        try {
+            if (changeSeq.current === null) {
+                await loadAllPatients();
+                return;
+            }
+            let hasMore = true;
+            while (hasMore) {
+                const response = await authFetch(`${API_BASE_URL}/patients/changes?since=${changeSeq.current}`);
+                if (response.status === 204) return;
+                if (response.status === 410) {
+                    // Too far behind the retained change log
+                    changeSeq.current = null;
+                    await loadAllPatients();
+                    return;
+                }
+                const data = await response.json();
+                if (!data.success) return;
+
+                setPatients(prev => mergePatients(prev, data.patients));
+                changeSeq.current = data.next_cursor;
+                hasMore = data.has_more;
             }
         } catch (error) {
             console.error('Error fetching patients:', error);
         }
     };
 
-    // Fetch patients on mount
+    // Fetch patients on mount, then keep the list fresh in the background
     useEffect(() => {
         refreshPatients();
+        const timer = window.setInterval(refreshPatients, PATIENTS_POLL_MS);
+        window.addEventListener('focus', refreshPatients);
+        return () => {
+            window.clearInterval(timer);
+            window.removeEventListener('focus', refreshPatients);
+        };
     }, []);
 
     const addPatient = (patient: Patient) => {
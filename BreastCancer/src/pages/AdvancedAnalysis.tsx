@@ -4,6 +4,7 @@ import { useNavigate } from 'react-router-dom';
 import Sidebar from '../components/Sidebar';
 import Navigation from '../components/Navigation';
 import { usePatients } from '../context/PatientContext';
+import { authFetch } from '../auth';
 
 interface FormData {
     patientName: string;
@@ -110,7 +111,7 @@ const AdvancedAnalysis = () => {
             // Softmax Model (DSO2)
             if (formData.selectedModel === 'softmax' || formData.selectedModel === 'both') {
                 try {
-                    const response = await fetch('http://localhost:5000/extract_and_predict', {
+                    const response = await authFetch('http://localhost:5000/extract_and_predict', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify({ report_description: formData.reportDescription }),
@@ -130,7 +131,7 @@ const AdvancedAnalysis = () => {
             // MLP Model (DSO3)
             if (formData.selectedModel === 'mlp' || formData.selectedModel === 'both') {
                 try {
-                    const response = await fetch('http://localhost:5000/extract_and_predict_mlp', {
+                    const response = await authFetch('http://localhost:5000/extract_and_predict_mlp', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify({ report_description: formData.reportDescription }),
@@ -4,6 +4,37 @@ import { useNavigate } from 'react-router-dom';
 import Sidebar from '../components/Sidebar';
 import Navigation from '../components/Navigation';
 import { usePatients } from '../context/PatientContext';
+import { authFetch } from '../auth';
+
+// Read a Server-Sent Events response body and call onEvent for each complete event
+const readEventStream = async (
+  response: Response,
+  onEvent: (event: string, data: any) => void
+) => {
+  const reader = response.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+};
 
 interface FormData {
   patientName: string;
@@ -25,6 +56,7 @@ const Home = () => {
   });
   const [imagePreview, setImagePreview] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [featuresFound, setFeaturesFound] = useState(0);
   const [errors, setErrors] = useState<{ [key: string]: string }>({});
 
   const handleInputChange = (e: ChangeEvent<HTMLInputElement | HTMLTextAreaElement>) => {
@@ -96,6 +128,7 @@ const Home = () => {
     }
 
     setLoading(true);
+    setFeaturesFound(0);
 
     try {
       // Check if patient exists, if not add them
@@ -117,30 +150,46 @@ const Home = () => {
       let extractedFeatures = null;
 
       try {
-        // Call the new automatic endpoint that does BOTH extraction and prediction
-        const response = await fetch('http://localhost:5000/extract_and_predict', {
+        // Single streamed call: features arrive as they are extracted, then both Softmax and MLP scores
+        const response = await authFetch('http://localhost:5000/extract_and_predict_stream', {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
           },
           body: JSON.stringify({
-            report_description: formData.reportDescription
+            report_description: formData.reportDescription,
+            models: ['softmax', 'mlp']
           }),
         });
 
         if (response.ok) {
-          const result = await response.json();
+          let result: any = null;
+          await readEventStream(response, (event, data) => {
+            if (event === 'feature' && data.value !== null) {
+              setFeaturesFound((count) => count + 1);
+            } else if (event === 'result') {
+              result = data;
+            } else if (event === 'error') {
+              result = { status: 'error', error: data.error };
+            }
+          });
+
+          if (!result) {
+            throw new Error('Extraction stream ended without a result');
+          }
 
           if (result.status === 'success') {
+            const softmaxPrediction = result.predictions.softmax;
+
             // Extract prediction data
-            prediction = result.prediction.diagnosis;
-            confidence = result.prediction.confidence;
+            prediction = softmaxPrediction.diagnosis;
+            confidence = softmaxPrediction.confidence;
 
             // Store API response for Results page
             apiResponse = {
-              prediction: result.prediction.class,
-              probability_class0: result.prediction.probability_class0,
-              probability_class1: result.prediction.probability_class1
+              prediction: softmaxPrediction.class,
+              probability_class0: softmaxPrediction.probability_class0,
+              probability_class1: softmaxPrediction.probability_class1
             };
 
             // Store extracted features for reference
@@ -150,26 +199,15 @@ const Home = () => {
             console.log(`Features extracted: ${result.extraction.features_extracted}/${result.extraction.total_features}`);
             console.log(`Diagnosis: ${prediction} (${confidence.toFixed(1)}%)`);
 
-            // NEW: If Malignant (class 1), call MLP for Risk Stratification
-            if (result.prediction.class === 1) {
-              console.log('⚠️ Malignant detected. Initiating Risk Stratification (MLP)...');
-              try {
-                const mlpRes = await fetch('http://localhost:5000/extract_and_predict_mlp', {
-                  method: 'POST',
-                  headers: { 'Content-Type': 'application/json' },
-                  body: JSON.stringify({ report_description: formData.reportDescription }),
-                });
-
-                if (mlpRes.ok) {
-                  const mlpResult = await mlpRes.json();
-                  if (mlpResult.status === 'success') {
-                    mlpResponse = mlpResult;
-                    console.log('✅ MLP Risk Stratification successful!');
-                  }
-                }
-              } catch (mlpErr) {
-                console.error('Error calling MLP model:', mlpErr);
-              }
+            // If Malignant (class 1), show the MLP Risk Stratification scored in the same call
+            if (softmaxPrediction.class === 1 && result.predictions.mlp) {
+              console.log('⚠️ Malignant detected. Risk Stratification (MLP) included.');
+              mlpResponse = {
+                status: 'success',
+                model: 'MLP (DSO3)',
+                model_version: result.model_version,
+                prediction: result.predictions.mlp
+              };
             }
           } else {
             throw new Error(result.error || 'Unknown error');
@@ -182,36 +220,51 @@ const Home = () => {
       } catch (err) {
         console.error('Error calling automatic extraction API:', err);
 
-        // Fallback: Try manual workflow
-        console.log('Falling back to manual workflow...');
+        // Fallback: queue an extraction job and long-poll for its result
+        console.log('Falling back to the extraction job API...');
 
         try {
-          // Save report
-          await fetch('http://localhost:5000/save_report', {
+          const jobResponse = await authFetch('http://localhost:5000/jobs', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ report_description: formData.reportDescription }),
+            body: JSON.stringify({
+              report_description: formData.reportDescription,
+              models: ['softmax', 'mlp']
+            }),
           });
+          if (!jobResponse.ok) {
+            throw new Error('Job submission failed');
+          }
+          const { job_id } = await jobResponse.json();
 
-          // Load features
-          const featuresResponse = await fetch('/src/ML/extracted_features.json');
-          const featuresData = await featuresResponse.json();
-
-          // Predict
-          const predictResponse = await fetch('http://localhost:5000/predict2', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(featuresData),
-          });
+          let job: any = null;
+          for (let attempt = 0; attempt < 10; attempt++) {
+            const pollResponse = await authFetch(`http://localhost:5000/jobs/${job_id}?wait=25`);
+            job = await pollResponse.json();
+            if (!pollResponse.ok || job.status === 'done' || job.status === 'error') break;
+          }
 
-          if (predictResponse.ok) {
-            apiResponse = await predictResponse.json();
-            prediction = apiResponse.prediction === 1 ? 'Malignant' : 'Benign';
-            confidence = apiResponse.prediction === 1
-              ? apiResponse.probability_class1 * 100
-              : apiResponse.probability_class0 * 100;
+          if (job?.status === 'done') {
+            const softmaxPrediction = job.result.predictions.softmax;
+            prediction = softmaxPrediction.diagnosis;
+            confidence = softmaxPrediction.confidence;
+            apiResponse = {
+              prediction: softmaxPrediction.class,
+              probability_class0: softmaxPrediction.probability_class0,
+              probability_class1: softmaxPrediction.probability_class1
+            };
+            extractedFeatures = job.result.extraction.features;
+
+            if (softmaxPrediction.class === 1 && job.result.predictions.mlp) {
+              mlpResponse = {
+                status: 'success',
+                model: 'MLP (DSO3)',
+                model_version: job.result.model_version,
+                prediction: job.result.predictions.mlp
+              };
+            }
           } else {
-            throw new Error('Manual prediction failed');
+            throw new Error(job?.error || 'Extraction job did not complete');
           }
         } catch (fallbackErr) {
           console.error('Fallback also failed:', fallbackErr);
@@ -238,11 +291,8 @@ const Home = () => {
 
       // SAVE TO DATABASE
       try {
-        const doctorData = localStorage.getItem('doctor');
-        const doctorId = doctorData ? JSON.parse(doctorData).id : 1; // Default to 1 if not found
-
+        // The server saves the consultation under the doctor of the session token
         const dbFormData = new FormData();
-        dbFormData.append('doctor_id', doctorId);
         dbFormData.append('patient_id', formData.patientId);
         dbFormData.append('patient_name', formData.patientName);
         dbFormData.append('patient_age', formData.patientAge);
@@ -255,7 +305,7 @@ const Home = () => {
           dbFormData.append('image', formData.image);
         }
 
-        await fetch('http://localhost:5000/save_consultation', {
+        await authFetch('http://localhost:5000/save_consultation', {
           method: 'POST',
           body: dbFormData // Standard fetch handles multipart boundaries automatically
         });
@@ -520,7 +570,7 @@ const Home = () => {
                         <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
                         <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
                       </svg>
-                      <span>Processing...</span>
+                      <span>{featuresFound > 0 ? `Extracting features... ${featuresFound}/30` : 'Processing...'}</span>
                     </>
                   ) : (
                     <>
@@ -2,9 +2,12 @@ import { useState } from 'react';
 import type { FormEvent } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Logo from '../components/Logo';
+import { setSession } from '../auth';
+import { usePatients } from '../context/PatientContext';
 
 const Login = () => {
   const navigate = useNavigate();
+  const { refreshPatients } = usePatients();
   const [doctorCode, setDoctorCode] = useState('');
   const [password, setPassword] = useState('');
   const [errors, setErrors] = useState({ doctorCode: '', password: '' });
@@ -52,8 +55,9 @@ const Login = () => {
         const data = await response.json();
 
         if (data.success) {
-          // Store doctor info in localStorage
-          localStorage.setItem('doctor', JSON.stringify(data.doctor));
+          // Store the session token and doctor info in localStorage
+          setSession(data.token, data.doctor);
+          refreshPatients();
           navigate('/home');
         } else {
           setErrors(prev => ({ ...prev, doctorCode: data.message || 'Authentification échouée' }));